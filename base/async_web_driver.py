@@ -0,0 +1,439 @@
+__author__ = "sarvesh.singh"
+
+import os
+import time
+import socket
+import base64
+import asyncio
+import aiohttp
+from selenium import webdriver as seleniumwebdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.errorhandler import ErrorHandler
+from selenium.webdriver.remote.webdriver import _make_w3c_caps
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from base.common import basic_logging
+from base.driver_cache import DriverResolver
+from base.locators import to_by
+from base.profiles import get_profile, apply_profile
+from base.waits import WaitPolicy, TRANSIENT_EXCEPTIONS
+from base.attachments import get_attachment_pipeline
+from base import instrumentation
+import distro
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+# W3C endpoints only know css/xpath/link text strategies, the others are expressed as css like selenium does
+W3C_STRATEGIES = {
+    By.ID: lambda value: ("css selector", f'[id="{value}"]'),
+    By.NAME: lambda value: ("css selector", f'[name="{value}"]'),
+    By.CLASS_NAME: lambda value: ("css selector", f".{value}"),
+    By.TAG_NAME: lambda value: ("css selector", value),
+}
+
+
+def get_free_port():
+    """
+    Get a free local tcp port
+    :return:
+    """
+    with socket.socket() as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        return _socket.getsockname()[1]
+
+
+class AsyncWebElement:
+    """
+    Class for a web element of an AsyncWebDriver session
+    """
+
+    __slots__ = ("parent", "id")
+
+    def __init__(self, parent, element_id):
+        """
+        Init Class
+        :param parent: AsyncWebDriver
+        :param element_id:
+        """
+        self.parent = parent
+        self.id = element_id
+
+    async def click(self):
+        await self.parent.execute("POST", f"/element/{self.id}/click", {})
+
+    async def clear(self):
+        await self.parent.execute("POST", f"/element/{self.id}/clear", {})
+
+    async def send_keys(self, text):
+        text = str(text)
+        await self.parent.execute("POST", f"/element/{self.id}/value", {"text": text, "value": list(text)})
+
+    async def text(self):
+        return await self.parent.execute("GET", f"/element/{self.id}/text")
+
+    async def get_property(self, name):
+        return await self.parent.execute("GET", f"/element/{self.id}/property/{name}")
+
+    async def is_enabled(self):
+        return await self.parent.execute("GET", f"/element/{self.id}/enabled")
+
+    async def is_selected(self):
+        return await self.parent.execute("GET", f"/element/{self.id}/selected")
+
+    async def find_elements(self, element, locator_type=None):
+        using, value = AsyncWebDriver.get_w3c_locator(element, locator_type)
+        return await self.parent.execute("POST", f"/element/{self.id}/elements", {"using": using, "value": value})
+
+
+class AsyncWebDriver:
+    """
+    Class to drive a browser session with asyncio, all commands of all sessions share one HTTP client so that one
+    process can drive many browsers concurrently:
+
+        async with aiohttp.ClientSession() as http:
+            drivers = [AsyncWebDriver("chrome", remote=grid, http=http) for _ in range(20)]
+            await asyncio.gather(*(driver.start() for driver in drivers))
+    """
+
+    def __init__(self, browser, remote=None, port='4444', http=None, download_path=None, screenshot_path=None,
+                 wait_policy=None, profile=None):
+        """
+        Init Class, nothing is started till start() (or async with) is awaited
+        :param browser: chrome, firefox
+        :param remote: host of grid / driver server, a local driver server is started when None
+        :param port:
+        :param http: shared aiohttp.ClientSession, a private one is created (and closed on quit) when None
+        :param download_path:
+        :param screenshot_path:
+        :param wait_policy: WaitPolicy used by all the waits of this driver
+        :param profile: session profile, see base/profiles.py
+        """
+        self.browser = str(browser).lower()
+        if self.browser not in ("chrome", "firefox"):
+            raise Exception(f'{self.browser} is a non-supported async web-driver !!')
+        self.remote = remote
+        self.port = port
+        self.http = http
+        self._own_http = http is None
+        self.download_path = download_path or os.getcwd() + '/downloaded_files/'
+        self.screenshot_path = screenshot_path or f"{os.getcwd()}/screenshots"
+        self.wait_policy = wait_policy or WaitPolicy()
+        self.profile = get_profile(profile)
+        self.logger = basic_logging(name="ASYNC_DRIVER", level='DEBUG')
+        self.executor_url = None
+        self.session_id = None
+        self.capabilities = None
+        self._service = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.quit()
+
+    def get_capabilities(self):
+        """
+        Capabilities of new session, same options as WebDriver gives to the browser
+        :return:
+        """
+        if self.browser == 'chrome':
+            options = seleniumwebdriver.ChromeOptions()
+            options.add_argument("--no-sandbox")
+            options.add_argument("--privileged")
+            options.add_experimental_option('prefs', {'download.default_directory': self.download_path})
+        else:
+            options = seleniumwebdriver.FirefoxOptions()
+        options.set_capability('acceptInsecureCerts', True)
+        return apply_profile(options, self.profile, self.browser).to_capabilities()
+
+    async def start(self):
+        """
+        Start the local driver server (when not remote) and a new browser session
+        Whatever was started is stopped again when a step fails, as __aexit__ does not run when __aenter__ raised
+        :return:
+        """
+        if self.http is None:
+            self.http = aiohttp.ClientSession()
+        try:
+            if self.remote is None:
+                await self._start_service()
+            else:
+                self.executor_url = f"http://{self.remote}:{self.port}/wd/hub"
+
+            capabilities = self.get_capabilities()
+            response = await self._request("POST", f"{self.executor_url}/session", {
+                "capabilities": _make_w3c_caps(capabilities), "desiredCapabilities": capabilities})
+            self.session_id, self.capabilities = response["sessionId"], response.get("capabilities", {})
+            await self.set_implicit_wait(0)
+            if self.profile.block_urls and self.browser == 'chrome':
+                await self.execute_cdp("Network.enable", {})
+                await self.execute_cdp("Network.setBlockedURLs", {"urls": list(self.profile.block_urls)})
+        except BaseException:
+            try:
+                await self.quit()
+            except Exception as exp:
+                self.logger.debug(f"Ignoring error while cleaning up failed start: {exp}")
+            raise
+        self.logger.debug(f"Started {self.browser} session {self.session_id}")
+        return self
+
+    async def _start_service(self):
+        """
+        Start chromedriver/geckodriver on a free port and wait till it answers
+        """
+        port = get_free_port()
+        path = DriverResolver(os_name=distro.name().lower()).resolve(self.browser)
+        self._service = await asyncio.create_subprocess_exec(
+            path, f"--port={port}", stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        self.executor_url = f"http://127.0.0.1:{port}"
+        for interval in self.wait_policy.budget(30).intervals():
+            try:
+                await self._request("GET", f"{self.executor_url}/status")
+                return
+            except (aiohttp.ClientError, OSError):
+                await asyncio.sleep(interval)
+        raise Exception(f"{path} did not start listening on port {port} !!")
+
+    async def quit(self):
+        """
+        End the browser session, stop local driver server and close private HTTP client
+        """
+        try:
+            if self.session_id is not None:
+                await self._request("DELETE", f"{self.executor_url}/session/{self.session_id}")
+        finally:
+            self.session_id = None
+            if self._service is not None:
+                if self._service.returncode is None:
+                    self._service.terminate()
+                await self._service.wait()
+                self._service = None
+            if self._own_http and self.http is not None:
+                await self.http.close()
+                self.http = None
+
+    async def _request(self, method, url, payload=None):
+        """
+        Send a command and return value of its response, W3C errors raise the same exceptions as selenium does
+        :param method:
+        :param url:
+        :param payload:
+        :return:
+        """
+        async with self.http.request(method, url, json=payload) as response:
+            body = await response.text()
+            if response.status >= 400:
+                ErrorHandler().check_response({"status": response.status, "value": body})
+                raise WebDriverException(f"{method} {url} failed with {response.status}: {body}")
+            return self._unwrap((await response.json(content_type=None) or {}).get("value"))
+
+    def _unwrap(self, value):
+        """
+        Turn element references of a response into AsyncWebElement
+        :param value:
+        :return:
+        """
+        if isinstance(value, dict):
+            if ELEMENT_KEY in value:
+                return AsyncWebElement(self, value[ELEMENT_KEY])
+            return {key: self._unwrap(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._unwrap(item) for item in value]
+        return value
+
+    def _wrap(self, value):
+        """
+        Turn AsyncWebElement arguments into element references
+        :param value:
+        :return:
+        """
+        if isinstance(value, AsyncWebElement):
+            return {ELEMENT_KEY: value.id, "ELEMENT": value.id}
+        if isinstance(value, (list, tuple)):
+            return [self._wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._wrap(item) for key, item in value.items()}
+        return value
+
+    async def execute(self, method, path, payload=None):
+        """
+        Send a command of this session, its latency is recorded like WebDriver's commands
+        :param method:
+        :param path: endpoint under /session/<id>
+        :param payload:
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            return await self._request(method, f"{self.executor_url}/session/{self.session_id}{path}", payload)
+        finally:
+            instrumentation.record(instrumentation.COMMAND, f"async {method} {path.split('/')[1]}",
+                                   time.perf_counter() - start)
+
+    async def execute_cdp(self, cmd, params):
+        """
+        Run a chrome devtools protocol command
+        :param cmd:
+        :param params:
+        :return:
+        """
+        return await self.execute("POST", "/goog/cdp/execute", {"cmd": cmd, "params": params})
+
+    async def set_implicit_wait(self, seconds):
+        """
+        Set implicit wait of the session
+        :param seconds:
+        """
+        await self.execute("POST", "/timeouts", {"implicit": int(seconds * 1000)})
+
+    async def wait_until(self, condition, timeout=None, message=""):
+        """
+        Await condition (coroutine function without arguments) till it returns a truthy value, polling with
+        backoff of the wait policy without blocking other sessions
+        :param condition:
+        :param timeout:
+        :param message:
+        :return:
+        """
+        policy = self.wait_policy.budget(timeout)
+        last_exp = None
+        intervals = policy.intervals()
+        while True:
+            try:
+                value = await condition()
+                if value:
+                    return value
+            except TRANSIENT_EXCEPTIONS as exp:
+                last_exp = exp
+            interval = next(intervals, None)
+            if interval is None:
+                break
+            await asyncio.sleep(interval)
+        raise TimeoutException(message or f"Condition not met within {policy.timeout} seconds", None,
+                               getattr(last_exp, "stacktrace", None))
+
+    async def wait_for_page_ready(self, timeout=None):
+        """
+        Wait till document of current page has finished loading (only till DOM is parsed with eager/none profiles)
+        :param timeout:
+        """
+        expected = ("complete",) if self.profile.page_load_strategy == "normal" else ("interactive", "complete")
+
+        async def _ready():
+            return await self.execute_script("return document.readyState") in expected
+
+        await self.wait_until(_ready, timeout=timeout, message="Page did not finish loading")
+
+    async def open_website(self, url, timeout=None):
+        """
+        Open the website in browser
+        :param url:
+        :param timeout:
+        """
+        await self.execute("POST", "/url", {"url": url})
+        await self.wait_for_page_ready(timeout=timeout)
+
+    async def current_url(self):
+        return await self.execute("GET", "/url")
+
+    @staticmethod
+    def get_w3c_locator(element, locator_type=None):
+        """
+        (using, value) of a Locator or of a locator value with its type, as understood by W3C endpoints
+        :param element:
+        :param locator_type:
+        :return:
+        """
+        by, value = to_by(element, locator_type)
+        return W3C_STRATEGIES[by](value) if by in W3C_STRATEGIES else (by, value)
+
+    async def get_web_element(self, element, locator_type=None):
+        """
+        Find the element
+        :param element: Locator or locator value
+        :param locator_type: type of locator value, not needed for a Locator
+        :return: AsyncWebElement
+        """
+        using, value = self.get_w3c_locator(element, locator_type)
+        return await self.execute("POST", "/element", {"using": using, "value": value})
+
+    async def get_elements(self, element, locator_type=None):
+        """
+        Find all elements matching the locator
+        :param element: Locator or locator value
+        :param locator_type: type of locator value, not needed for a Locator
+        :return: [AsyncWebElement]
+        """
+        using, value = self.get_w3c_locator(element, locator_type)
+        return await self.execute("POST", "/elements", {"using": using, "value": value})
+
+    async def click(self, element, locator_type=None, timeout=None):
+        """
+        Click the element, retried (missing/stale/intercepted/not interactable) till it goes through or timeout
+        :param element:
+        :param locator_type:
+        :param timeout:
+        """
+
+        async def _click():
+            await (await self.get_web_element(element, locator_type)).click()
+            return True
+
+        await self.wait_until(_click, timeout=timeout, message=f"Unable to click {element}")
+
+    async def set_text(self, element, locator_type=None, text=''):
+        """
+        Enter text in a text box
+        :param element:
+        :param locator_type:
+        :param text:
+        """
+        await (await self.get_web_element(element, locator_type)).send_keys(text)
+
+    async def get_text(self, element, locator_type=None):
+        """
+        Get visible text of the element
+        :param element:
+        :param locator_type:
+        :return:
+        """
+        return await (await self.get_web_element(element, locator_type)).text()
+
+    async def execute_script(self, script, *args):
+        """
+        Run javascript in current page and return its result
+        :param script:
+        :param args:
+        :return:
+        """
+        return await self.execute("POST", "/execute/sync", {"script": script, "args": self._wrap(list(args))})
+
+    async def get_screenshot_as_base64(self):
+        return await self.execute("GET", "/screenshot")
+
+    async def screen_shot(self, file_name):
+        """
+        Capture the screen shot of the page, file is written off the event loop
+        :param file_name:
+        :return: path of the screenshot
+        """
+        png = base64.b64decode(await self.get_screenshot_as_base64())
+        os.makedirs(self.screenshot_path, exist_ok=True)
+        ss_path = f"{self.screenshot_path}/{file_name}.png"
+
+        def _write():
+            with open(ss_path, "wb") as _fp:
+                _fp.write(png)
+
+        await asyncio.get_running_loop().run_in_executor(None, _write)
+        return ss_path
+
+    async def allure_attach_jpeg(self, file_name, image_format=None, max_width=None):
+        """
+        Capture the screen shot and attach it to allure report through the attachment pipeline
+        :param file_name:
+        :param image_format: jpeg, webp or png, defaults to the pipeline's format
+        :param max_width: downscale wider screenshots to this width
+        """
+        get_attachment_pipeline().attach_screenshot(await self.get_screenshot_as_base64(), name=file_name,
+                                                    save_path=self.screenshot_path, image_format=image_format,
+                                                    max_width=max_width)
@@ -0,0 +1,170 @@
+__author__ = "sarvesh.singh"
+
+import io
+import os
+import base64
+import queue
+import threading
+import allure
+from base.common import basic_logging
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# format name: (allure attachment type or mime type, file extension, Pillow format)
+IMAGE_FORMATS = {
+    "png": (allure.attachment_type.PNG, "png", "PNG"),
+    "jpeg": (allure.attachment_type.JPG, "jpg", "JPEG"),
+    "webp": ("image/webp", "webp", "WEBP"),
+}
+
+
+def encode_image(png_bytes, image_format="png", max_width=None, quality=80):
+    """
+    Downscale and re-encode a PNG screenshot, PNG is returned as it is when Pillow is not installed
+    :param png_bytes:
+    :param image_format: png, jpeg or webp
+    :param max_width: downscale keeping aspect ratio when image is wider than this
+    :param quality: quality for jpeg/webp
+    :return: (bytes, format actually used)
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise Exception(f"Image format {image_format} is not supported !!")
+    if Image is None or (image_format == "png" and not max_width):
+        return png_bytes, "png"
+
+    image = Image.open(io.BytesIO(png_bytes))
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)))
+    if image_format == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=IMAGE_FORMATS[image_format][2], quality=quality)
+    return output.getvalue(), image_format
+
+
+class AttachmentPipeline:
+    """
+    Class to encode screenshots on a background worker, so the test thread only pays for the capture
+    Encoded screenshots are attached on flush, from the test's own thread, as allure keeps the running test per thread
+    """
+
+    def __init__(self, image_format="png", max_width=None, quality=80, save_to_disk=False, max_queue=16):
+        """
+        Init Class with encoding settings, worker thread starts on first submit
+        :param image_format: png, jpeg or webp
+        :param max_width:
+        :param quality:
+        :param save_to_disk: also write every attachment to the driver's screenshot folder
+        :param max_queue: jobs allowed to wait, submit blocks once queue is full
+        """
+        self.logger = basic_logging(name="ATTACHMENTS", level="INFO")
+        self.image_format, self.max_width, self.quality, self.save_to_disk = "png", None, quality, save_to_disk
+        self.configure(image_format=image_format, max_width=max_width)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        self._lock = threading.Lock()
+        self._encoded = []
+        self.errors = []
+
+    def configure(self, image_format=None, max_width=None, quality=None, save_to_disk=None):
+        """
+        Change encoding settings of attachments submitted from now on
+        :param image_format:
+        :param max_width:
+        :param quality:
+        :param save_to_disk:
+        """
+        if image_format is not None:
+            if image_format not in IMAGE_FORMATS:
+                raise Exception(f"Image format {image_format} is not supported !!")
+            self.image_format = image_format
+        if max_width is not None:
+            self.max_width = max_width or None
+        if quality is not None:
+            self.quality = quality
+        if save_to_disk is not None:
+            self.save_to_disk = save_to_disk
+
+    def submit(self, job, *args):
+        """
+        Queue a job for the background worker
+        :param job: callable
+        :param args:
+        """
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="attachment-pipeline", daemon=True)
+                self._worker.start()
+        self._queue.put((job, args))
+
+    def attach_screenshot(self, screenshot, name, save_path=None, image_format=None, max_width=None):
+        """
+        Queue a screenshot to be decoded and encoded in background, it is attached to allure report on next flush
+        :param screenshot: base64 PNG as returned by get_screenshot_as_base64
+        :param name: attachment name without extension
+        :param save_path: folder to also save the file in, when save_to_disk is set
+        :param image_format: overrides pipeline's format for this attachment
+        :param max_width: overrides pipeline's max width for this attachment
+        """
+        self.submit(self._encode_screenshot, screenshot, name, save_path if self.save_to_disk else None,
+                    image_format or self.image_format, max_width or self.max_width, self.quality)
+
+    def _encode_screenshot(self, screenshot, name, save_path, image_format, max_width, quality):
+        """
+        Worker side of attach_screenshot, encoded screenshot waits for flush to be attached
+        """
+        body, image_format = encode_image(base64.b64decode(screenshot), image_format=image_format,
+                                          max_width=max_width, quality=quality)
+        attachment_type, extension, _ = IMAGE_FORMATS[image_format]
+        if save_path:
+            os.makedirs(save_path, exist_ok=True)
+            with open(os.path.join(save_path, f"{name}.{extension}"), "wb") as _fp:
+                _fp.write(body)
+        with self._lock:
+            self._encoded.append((body, f"{name}.{extension}", attachment_type, extension))
+
+    def _run(self):
+        """
+        Worker loop, a failing job is logged and never stops the pipeline
+        """
+        while True:
+            job, args = self._queue.get()
+            try:
+                job(*args)
+            except Exception as exp:
+                self.errors.append(exp)
+                self.logger.error(f"Attachment job failed: {exp}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Block till every queued job is done and attach encoded screenshots to the test running on calling thread,
+        called after each test so attachments land on the right test
+        """
+        if self._worker is None:
+            return
+        self._queue.join()
+        with self._lock:
+            encoded, self._encoded = self._encoded, []
+        for body, name, attachment_type, extension in encoded:
+            allure.attach(body, name=name, attachment_type=attachment_type, extension=extension)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_attachment_pipeline():
+    """
+    Get the attachment pipeline shared by all drivers of this process
+    :return:
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = AttachmentPipeline()
+        return _pipeline
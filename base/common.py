@@ -2,11 +2,8 @@ __author__ = "sarvesh.singh"
 
 import os
 import logging
-import sys
 from urllib.parse import urlparse, urlunparse
 import re
-import subprocess
-from collections import namedtuple
 from pathlib import Path
 from json import (
     dumps as json_dumps,
@@ -15,12 +12,13 @@ from json import (
 )
 from types import SimpleNamespace as Namespace
 import allure
-import logging.handlers
+from base.logs import configure_logging
 
 
 def basic_logging(name="BASIC", level=None):
     """
-    Basic Logger to log in a file
+    Basic Logger, records go through the shared queue to console and per test JSON lines files (see base/logs.py)
+    Safe to call any number of times, the logger gets the shared handler only once
     :param name
     :param level
     """
@@ -28,11 +26,9 @@ def basic_logging(name="BASIC", level=None):
         level = os.environ.get("LOG_LEVEL", "INFO")
     root = logging.getLogger(name=name)
     root.setLevel(getattr(logging, level))
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(getattr(logging, level))
-    formatter = logging.Formatter("%(levelname)s :: %(message)s")
-    handler.setFormatter(formatter)
-    root.addHandler(handler)
+    handler = configure_logging()
+    if handler not in root.handlers:
+        root.addHandler(handler)
     return root
 
 
@@ -108,24 +104,30 @@ def save_allure(data, name, save_dump=True):
             return dump
 
 
-def run_cmd(cmd, wait=True):
+def run_cmd(cmd, wait=True, timeout=None):
     """
     Run an external command, wait and display it's output and return back it's output as well
-    :param cmd:
-    :param wait:
-    :return:
+    :param cmd: str runs through the shell (pipes, globs, && and $VARS work), list runs without one
+    :param wait: False to start it in background
+    :param timeout: seconds after which command is killed, None to wait till it finishes
+    :return: CmdResponse, or tracked ManagedProcess when not waiting (see base/processes.py)
     """
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    CmdResponse = namedtuple("RestResponse", ["cmd", "status", "output", "error"])
+    from base.processes import get_process_manager
 
+    shell = isinstance(cmd, str)
     if wait:
-        (output, err) = p.communicate()
-        status = p.wait()
-        return CmdResponse(cmd=cmd, status=status, output=output.decode(), error=err.decode())
-    else:
-        return
+        return get_process_manager().run(cmd, timeout=timeout, shell=shell)
+    return get_process_manager().start(cmd, shell=shell)
+
+
+def parse_adb_devices(output):
+    """
+    Serials of devices ready for use in `adb devices` output
+    :param output:
+    :return:
+    """
+    return re.findall(r"^(.*?)\s+device$", str(output).strip(), re.I | re.M)
 
 
 def get_adb_device():
-    devices = str(run_cmd("adb devices").output).strip()
-    return re.findall(r"^(.*?)\s+device$", devices, re.I | re.M)
+    return parse_adb_devices(run_cmd(["adb", "devices"]).output)
@@ -0,0 +1,233 @@
+__author__ = "sarvesh.singh"
+
+import os
+import getpass
+import threading
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+from base.common import basic_logging, parse_adb_devices
+from base.processes import get_process_manager, get_host_value, start_appium, wait_for_appium, APPIUM_PORT
+
+# Properties read once per device build, the rest of the capabilities is derived from the device index
+DEVICE_PROPERTIES = {
+    "platform_version": "ro.build.version.release",
+    "model": "ro.product.model",
+}
+
+# Read on every discovery, cached properties of a serial are queried again when its build changed (reflashed)
+FINGERPRINT_PROPERTY = "ro.build.fingerprint"
+
+_device_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_android_env():
+    """
+    Environment adb and appium need on this host: android sdk (macOS default location) on PATH, and JAVA_HOME
+    :return: dict
+    """
+    sdk = os.environ.get("ANDROID_HOME") or f"/Users/{getpass.getuser()}/Library/Android/sdk"
+    os_path = list(set(os.environ.get("PATH", "").split(":")))
+    os_path += [f"{sdk}/tools", f"{sdk}/platform-tools"]
+    return {
+        "PATH": ":".join(os_path),
+        "ANDROID_HOME": sdk,
+        "JAVA_HOME": os.environ.get("JAVA_HOME") or get_host_value("java_home", ["/usr/libexec/java_home"]),
+    }
+
+
+class AndroidDevice(namedtuple("AndroidDevice", ["serial", "platform_version", "model", "appium_port",
+                                                 "system_port", "chromedriver_port"])):
+    """
+    Class for an attached device with the ports of its own Appium server, UiAutomator2 server and chromedriver
+    """
+
+    __slots__ = ()
+
+    @property
+    def appium_url(self):
+        """
+        Url of the Appium server of this device
+        :return:
+        """
+        return f"http://127.0.0.1:{self.appium_port}/wd/hub"
+
+    def capabilities(self, **extra):
+        """
+        Desired capabilities pinning the session to this device and its ports
+        :param extra: app capabilities
+        :return:
+        """
+        return {
+            'platformName': 'Android',
+            'platformVersion': self.platform_version,
+            'deviceName': self.serial,
+            'udid': self.serial,
+            'systemPort': self.system_port,
+            'chromedriverPort': self.chromedriver_port,
+            **extra,
+        }
+
+
+class DeviceFarm:
+    """
+    Class to discover all attached Android devices and run one Appium server per device, so tests can drive all of
+    them concurrently (one device per xdist worker or many from one process with run)
+    """
+
+    def __init__(self, adb="adb", appium="appium", chromedriver=None, base_port=APPIUM_PORT, base_system_port=8200,
+                 base_chromedriver_port=9515, cache_file=None, env=None):
+        """
+        Init Class
+        :param adb: adb executable
+        :param appium: appium executable (str or list)
+        :param chromedriver: chromedriver executable passed to appium servers
+        :param base_port: appium port of first device, next devices get base_port + 2 * index (one spare for
+        bootstrap)
+        :param base_system_port: UiAutomator2 systemPort of first device
+        :param base_chromedriver_port: chromedriverPort of first device
+        :param cache_file: json file keeping device properties across runs, None to cache in this process only
+        :param env: extra environment variables of adb and appium (ANDROID_HOME, JAVA_HOME, PATH)
+        """
+        self.adb = adb
+        self.appium = appium
+        self.chromedriver = chromedriver
+        self.base_port = int(base_port)
+        self.base_system_port = int(base_system_port)
+        self.base_chromedriver_port = int(base_chromedriver_port)
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.env = env
+        self.logger = basic_logging(name="DEVICE_FARM")
+        self.devices = None
+        self.servers = {}
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        """
+        Add device properties saved by earlier runs to the cache of this process, entries already there win
+        """
+        if self.cache_file and self.cache_file.is_file():
+            with open(self.cache_file, "r") as _fp:
+                with _cache_lock:
+                    for serial, properties in json_load(_fp).items():
+                        _device_cache.setdefault(serial, properties)
+
+    def _save_cache(self, serials):
+        """
+        Save cached properties of attached devices, written to a temporary file renamed into place so concurrent
+        workers never read half a file
+        :param serials:
+        """
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        with _cache_lock:
+            data = {serial: _device_cache[serial] for serial in serials}
+        with open(temp, "w") as _fp:
+            _fp.write(json_dumps(data, indent=2, sort_keys=True))
+        os.replace(temp, self.cache_file)
+
+    def discover(self, refresh=False):
+        """
+        Attached devices in serial order, properties of devices not seen before (or reflashed since, as told by
+        their build fingerprint) are queried concurrently
+        :param refresh: query `adb devices` again
+        :return: [AndroidDevice]
+        """
+        with self._lock:
+            if self.devices is not None and not refresh:
+                return self.devices
+            manager = get_process_manager()
+            serials = sorted(parse_adb_devices(manager.run([self.adb, "devices"], env=self.env, check=True).output))
+            fingerprints = manager.run_many({
+                serial: [self.adb, "-s", serial, "shell", "getprop", FINGERPRINT_PROPERTY] for serial in serials},
+                env=self.env)
+            fingerprints = {serial: result.output.strip() for serial, result in fingerprints.items()}
+            self._load_cache()
+            with _cache_lock:
+                unknown = [serial for serial in serials
+                           if _device_cache.get(serial, {}).get("fingerprint") != fingerprints[serial]]
+            if unknown:
+                results = manager.run_many({
+                    (serial, key): [self.adb, "-s", serial, "shell", "getprop", prop]
+                    for serial in unknown for key, prop in DEVICE_PROPERTIES.items()}, env=self.env)
+                with _cache_lock:
+                    for serial in unknown:
+                        _device_cache[serial] = {key: results[(serial, key)].output.strip()
+                                                 for key in DEVICE_PROPERTIES}
+                        _device_cache[serial]["fingerprint"] = fingerprints[serial]
+                self._save_cache(serials)
+            with _cache_lock:
+                self.devices = [
+                    AndroidDevice(serial=serial, appium_port=self.base_port + 2 * index,
+                                  system_port=self.base_system_port + index,
+                                  chromedriver_port=self.base_chromedriver_port + index,
+                                  **{key: _device_cache[serial][key] for key in DEVICE_PROPERTIES})
+                    for index, serial in enumerate(serials)]
+            self.logger.info(f"Devices: {[(device.serial, device.platform_version) for device in self.devices]}")
+            return self.devices
+
+    def get_device(self, worker_id=None):
+        """
+        Device of an xdist worker, gw0 gets the first device, gw1 the second and so on, there is no sharing of a
+        device (and its Appium server) between workers, run with at most as many workers as devices
+        :param worker_id: None or 'master' for the first device
+        :return: AndroidDevice
+        """
+        devices = self.discover()
+        if not devices:
+            raise Exception("No Android device attached !!")
+        number = int(worker_id[2:]) if worker_id and worker_id.startswith("gw") else 0
+        if number >= len(devices):
+            raise Exception(f"Worker {worker_id} has no device of its own, {len(devices)} attached, run with "
+                            f"-n {len(devices)} !!")
+        return devices[number]
+
+    def start(self, devices=None, timeout=120):
+        """
+        Start Appium servers of devices concurrently, returns once all of them answer on /status
+        :param devices: default all discovered devices
+        :param timeout: seconds to wait for each server
+        :return: [AndroidDevice]
+        """
+        devices = self.discover() if devices is None else devices
+        with self._lock:
+            pending = [device for device in devices
+                       if device.serial not in self.servers or not self.servers[device.serial].is_running()]
+            for device in pending:
+                self.servers[device.serial] = start_appium(
+                    port=device.appium_port, chromedriver=self.chromedriver, env=self.env, wait=False,
+                    executable=self.appium)
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            futures = [executor.submit(wait_for_appium, self.servers[device.serial], device.appium_port, timeout)
+                       for device in pending]
+            for future in futures:
+                future.result()
+        return devices
+
+    def run(self, function, devices=None):
+        """
+        Call function for every device concurrently, e.g. to create a session per device and run a flow on it
+        :param function: callable taking an AndroidDevice
+        :param devices: default all discovered devices
+        :return: {serial: return value}
+        """
+        devices = self.start(devices)
+        with ThreadPoolExecutor(max_workers=max(len(devices), 1), thread_name_prefix="device") as executor:
+            futures = {device.serial: executor.submit(function, device) for device in devices}
+            return {serial: future.result() for serial, future in futures.items()}
+
+    def stop(self):
+        """
+        Stop Appium servers started by this farm
+        """
+        with self._lock:
+            servers, self.servers = self.servers, {}
+        for server in servers.values():
+            server.stop()
@@ -0,0 +1,148 @@
+__author__ = "sarvesh.singh"
+
+import re
+import functools
+from lxml import etree, html as lxml_html
+from selenium.common.exceptions import NoSuchElementException
+from base.locators import Locator
+
+# Elements whose text is never rendered, dropped from snapshot so text matches what the browser shows
+NON_RENDERED_TAGS = ("script", "style", "noscript", "template")
+
+
+def _literal(value):
+    """
+    XPath string literal of value, also when it has both quote kinds
+    :param value:
+    :return:
+    """
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat('" + "', \"'\", '".join(value.split("'")) + "')"
+
+
+def _css_to_xpath(selector):
+    try:
+        from cssselect import HTMLTranslator
+    except ImportError:
+        raise Exception("css locators of DOM snapshots need cssselect, run pip install cssselect !!")
+    return HTMLTranslator().css_to_xpath(selector)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_locator(strategy, value):
+    """
+    Compiled XPath of a locator, compiled once per locator for all snapshots
+    :param strategy: id, name, xpath, class, tag, css, link, partial_link
+    :param value:
+    :return: lxml.etree.XPath
+    """
+    if strategy == "xpath":
+        expression = value
+    elif strategy == "css":
+        expression = _css_to_xpath(value)
+    elif strategy == "id":
+        expression = f"descendant-or-self::*[@id={_literal(value)}]"
+    elif strategy == "name":
+        expression = f"descendant-or-self::*[@name={_literal(value)}]"
+    elif strategy == "class":
+        expression = _css_to_xpath(f".{value}")
+    elif strategy == "tag":
+        expression = f"descendant-or-self::{value}"
+    elif strategy == "link":
+        expression = f"descendant-or-self::a[normalize-space(.)={_literal(value)}]"
+    elif strategy == "partial_link":
+        expression = f"descendant-or-self::a[contains(., {_literal(value)})]"
+    else:
+        raise Exception(f"Provided locator type {strategy} is not supported !!")
+    return etree.XPath(expression)
+
+
+def _get_locator(element, locator_type):
+    if isinstance(element, Locator):
+        return element.strategy, element.value
+    return locator_type or "xpath", element
+
+
+class SnapshotElement:
+    """
+    Class for a read-only element of a DOM snapshot, with the reading part of selenium's WebElement interface
+    """
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def tag_name(self):
+        return self.node.tag
+
+    @property
+    def text(self):
+        """
+        Text of element with whitespace collapsed, close to what the browser renders (CSS is not applied)
+        :return:
+        """
+        return re.sub(r"\s+", " ", self.node.text_content()).strip()
+
+    def get_attribute(self, name):
+        return self.node.get(name)
+
+    def find_elements(self, element, locator_type=None):
+        return [SnapshotElement(node) for node in compile_locator(*_get_locator(element, locator_type))(self.node)
+                if isinstance(node, etree.ElementBase)]
+
+    def find_element(self, element, locator_type=None):
+        elements = self.find_elements(element, locator_type)
+        if not elements:
+            raise NoSuchElementException(f"{element} not found in DOM snapshot")
+        return elements[0]
+
+    def __repr__(self):
+        return f"SnapshotElement(<{self.node.tag}>)"
+
+
+class DomSnapshot(SnapshotElement):
+    """
+    Class for a parsed copy of the page, answering any number of read-only locator queries without a round trip
+    Absent elements are reported right away, there is no implicit wait on a snapshot
+    """
+
+    __slots__ = ()
+
+    def __init__(self, page_source):
+        """
+        Init Class by parsing page source
+        :param page_source: html of page, e.g. driver.page_source
+        """
+        root = lxml_html.document_fromstring(page_source or "<html></html>")
+        for node in root.xpath("|".join(f"//{tag}" for tag in NON_RENDERED_TAGS)):
+            node.drop_tree()
+        super().__init__(root)
+
+    def is_element_present(self, element, locator_type=None):
+        return len(self.find_elements(element, locator_type)) > 0
+
+    def get_text(self, element, locator_type=None):
+        return self.find_element(element, locator_type).text
+
+    def get_texts(self, element, locator_type=None):
+        return [_element.text for _element in self.find_elements(element, locator_type)]
+
+    def get_attribute(self, name, element=None, locator_type=None):
+        """
+        Attribute of first element matching locator, of the document element without one
+        :param name:
+        :param element:
+        :param locator_type:
+        :return:
+        """
+        if element is None:
+            return super().get_attribute(name)
+        return self.find_element(element, locator_type).get_attribute(name)
+
+    def count(self, element, locator_type=None):
+        return len(self.find_elements(element, locator_type))
@@ -0,0 +1,257 @@
+__author__ = "sarvesh.singh"
+
+import os
+import re
+import time
+import select
+import ctypes
+import ctypes.util
+import threading
+from base.common import basic_logging
+
+# Suffixes browsers write in progress downloads to, renamed to the final name once complete
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".download", ".partial")
+
+# inotify(7) events on the download folder, any of them triggers a rescan
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def is_partial(name):
+    """
+    File is a download still being written by the browser
+    :param name:
+    :return:
+    """
+    return name.endswith(PARTIAL_SUFFIXES) or name.startswith(".com.google.Chrome.")
+
+
+def final_name(name):
+    """
+    Name a partial download gets once complete
+    :param name:
+    :return:
+    """
+    for suffix in PARTIAL_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def renamed_pattern(name):
+    """
+    Pattern of names a browser saves a download under when a file of that name is already in the folder, 'name (1).ext'
+    for chrome and 'name(1).ext' for firefox
+    :param name:
+    :return:
+    """
+    stem, extension = os.path.splitext(name)
+    return re.compile(rf"{re.escape(stem)} ?\(\d+\){re.escape(extension)}")
+
+
+def _mtime_ns(path):
+    """
+    Modification time of a file, 0 when it was removed meanwhile
+    :param path:
+    :return:
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _inotify_fd(directory):
+    """
+    Non blocking inotify descriptor watching directory, None where inotify is not available (non Linux)
+    :param directory:
+    :return:
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DownloadWatcher:
+    """
+    Class to watch a download folder in background and wake waiting tests as soon as downloads complete
+    A download is complete when its partial file was renamed to the final name, or when a file written without a
+    partial has kept the same size for stable_time
+    Files left in the folder from before are stale, they are only complete once written again (newer mtime); as the
+    browser saves a download whose name is taken by one of them as 'name (N).ext', waiting for name also accepts those
+    """
+
+    def __init__(self, directory, stable_time=0.5, poll=0.1, use_inotify=True, since=None):
+        """
+        Init Class
+        :param directory: download folder, created when missing
+        :param stable_time: seconds size of a file must not change to be complete when no partial was seen
+        :param poll: rescan interval when inotify is not available
+        :param use_inotify: False to always poll
+        :param since: epoch seconds, files already there but modified since then are complete downloads rather than
+        stale ones (e.g. start of browser session, for downloads finished before watching started)
+        """
+        self.directory = str(directory)
+        self.stable_time = stable_time
+        self.poll = poll
+        self.since = time.time() if since is None else since
+        self.logger = basic_logging(name="DOWNLOADS")
+        os.makedirs(self.directory, exist_ok=True)
+        self._fd = _inotify_fd(self.directory) if use_inotify else None
+        # inotify is waited on with select, woken up by the pipe on stop; polling just waits on the event
+        self._wake_read, self._wake_write = os.pipe() if self._fd is not None else (None, None)
+        self._wake = threading.Event()
+        self._condition = threading.Condition()
+        self._running = True
+        self._partials = set()
+        self._sizes = {}
+        self._stale = {}
+        self._complete = set()
+        self._scan(initial=True)
+        self._thread = threading.Thread(target=self._run, name="download-watcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def _scan(self, initial=False):
+        """
+        Rescan folder and mark completed downloads, files present before watching started are recorded as stale
+        with their mtime unless they were modified since self.since
+        :param initial:
+        :return: True when some file is still waiting for its size to settle
+        """
+        now = time.monotonic()
+        try:
+            entries = {entry.name: entry.stat() for entry in os.scandir(self.directory) if entry.is_file()}
+        except FileNotFoundError:
+            entries = {}
+        partials = {final_name(name) for name in entries if is_partial(name)}
+        completed, settling = set(), False
+        for name, stats in entries.items():
+            size = stats.st_size
+            if is_partial(name) or name in partials or name in self._complete:
+                continue
+            if initial and stats.st_mtime < self.since:
+                self._stale[name] = stats.st_mtime_ns
+                continue
+            if name in self._stale:
+                if self._stale[name] == stats.st_mtime_ns:
+                    continue
+                del self._stale[name]
+            if initial or name in self._partials:
+                completed.add(name)
+                continue
+            previous = self._sizes.get(name)
+            if previous is None or previous[0] != size:
+                self._sizes[name] = (size, now)
+                settling = True
+            elif now - previous[1] >= self.stable_time:
+                completed.add(name)
+            else:
+                settling = True
+        with self._condition:
+            self._partials = (self._partials | partials) - completed
+            self._complete = (self._complete | completed) & set(entries)
+            for name in completed:
+                self._sizes.pop(name, None)
+            if completed:
+                self._condition.notify_all()
+        if completed and not initial:
+            self.logger.debug(f"Downloads complete: {sorted(completed)}")
+        return settling
+
+    def _run(self):
+        """
+        Watch loop, sleeps on inotify events (or poll interval) and only wakes up early to settle file sizes
+        """
+        settling = False
+        while self._running:
+            if self._fd is None:
+                self._wake.wait(self.poll)
+                settling = self._scan()
+                continue
+            readable, _, _ = select.select([self._fd, self._wake_read], [], [],
+                                           self.stable_time / 2 if settling else 1.0)
+            if self._fd in readable:
+                try:
+                    while os.read(self._fd, 65536):
+                        pass
+                except BlockingIOError:
+                    pass
+            settling = self._scan()
+
+    def completed(self):
+        """
+        Names of completed downloads in folder
+        :return:
+        """
+        with self._condition:
+            return set(self._complete)
+
+    def _saved_as(self, name):
+        """
+        Completed download of name: name itself, else the latest 'name (N).ext' the browser saved it as, must hold
+        the condition
+        :param name:
+        :return: file name or None while not complete
+        """
+        if name in self._complete:
+            return name
+        pattern = renamed_pattern(name)
+        renamed = [other for other in self._complete if pattern.fullmatch(other)]
+        if not renamed:
+            return None
+        return max(renamed, key=lambda other: _mtime_ns(os.path.join(self.directory, other)))
+
+    def wait_for(self, *file_names, timeout=80):
+        """
+        Wait till all given downloads are complete, woken up as soon as the watcher sees them
+        :param file_names:
+        :param timeout:
+        :return: {file name: path it was saved as}, or None when some download did not complete in time
+        """
+        with self._condition:
+            done = self._condition.wait_for(
+                lambda: all(self._saved_as(name) is not None for name in file_names), timeout=timeout)
+            saved = {name: self._saved_as(name) for name in file_names}
+        if not done:
+            self.logger.error(f"Downloads not complete in {timeout} seconds: "
+                              f"{sorted(name for name, other in saved.items() if other is None)}")
+            return None
+        return {name: os.path.join(self.directory, other) for name, other in saved.items()}
+
+    def stop(self):
+        """
+        Stop watching and release descriptors
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"x")
+        self._thread.join()
+        for fd in (self._fd, self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
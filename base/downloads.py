@@ -0,0 +1,144 @@
+__author__ = "sarvesh.singh"
+
+import os
+import base64
+import hashlib
+from collections import namedtuple
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+DownloadResult = namedtuple("DownloadResult", ["path", "size", "sha256"])
+
+# Hidden file input through which a file on the browser's machine is read, returns the input element
+FILE_INPUT_SCRIPT = """
+var input = document.createElement('INPUT');
+input.setAttribute('type', 'file');
+input.hidden = true;
+input.onchange = function (e) { e.stopPropagation(); };
+return document.documentElement.appendChild(input);
+"""
+
+# [size, name] of file selected in the input, null when nothing could be selected
+FILE_INFO_SCRIPT = """
+var file = arguments[0].files[0];
+return file ? [file.size, file.name] : null;
+"""
+
+# Base64 of one slice of the file, so that neither the browser nor the client ever holds the whole file encoded
+READ_CHUNK_SCRIPT = """
+var input = arguments[0], offset = arguments[1], length = arguments[2], callback = arguments[arguments.length - 1];
+var reader = new FileReader();
+reader.onload = function () { callback(reader.result.substring(reader.result.indexOf(',') + 1)); };
+reader.onerror = function () { callback({error: String(reader.error)}); };
+reader.readAsDataURL(input.files[0].slice(offset, offset + length));
+"""
+
+REMOVE_INPUT_SCRIPT = "arguments[0].remove();"
+
+
+def _part_path(destination):
+    return f"{destination}.part"
+
+
+def verify(destination, size, digest, expected_size=None, expected_sha256=None):
+    """
+    Move a completely written temporary file into place once its size and hash are as expected
+    :param destination:
+    :param size: bytes written
+    :param digest: sha256 hex digest of bytes written
+    :param expected_size: size reported by the source and/or given by caller
+    :param expected_sha256:
+    :return: DownloadResult
+    """
+    part = _part_path(destination)
+    if expected_size is not None and size != expected_size:
+        os.remove(part)
+        raise Exception(f"Downloaded {size} bytes of {destination} instead of {expected_size} !!")
+    if expected_sha256 is not None and digest != expected_sha256.lower():
+        os.remove(part)
+        raise Exception(f"Checksum of {destination} is {digest} instead of {expected_sha256} !!")
+    os.replace(part, destination)
+    return DownloadResult(path=destination, size=size, sha256=digest)
+
+
+def stream_local(source, destination, chunk_size=CHUNK_SIZE, expected_size=None, expected_sha256=None):
+    """
+    Copy a file downloaded by a local browser chunk by chunk, hashing on the way
+    :param source:
+    :param destination:
+    :param chunk_size:
+    :param expected_size:
+    :param expected_sha256:
+    :return: DownloadResult
+    """
+    digest, size = hashlib.sha256(), 0
+    source_size = os.path.getsize(source)
+    with open(source, "rb") as _src, open(_part_path(destination), "wb") as _dst:
+        for chunk in iter(lambda: _src.read(chunk_size), b""):
+            digest.update(chunk)
+            _dst.write(chunk)
+            size += len(chunk)
+    if expected_size is not None and expected_size != source_size:
+        os.remove(_part_path(destination))
+        raise Exception(f"{source} has {source_size} bytes instead of {expected_size} !!")
+    return verify(destination, size, digest.hexdigest(), source_size, expected_sha256)
+
+
+def select_remote_file(driver, path):
+    """
+    Select a file on the browser's machine in a hidden file input, sent straight to the node (no local upload)
+    :param driver: selenium driver
+    :param path: path on the browser's machine
+    :return: (input element, [size, name]) or (None, None) when file does not exist (yet)
+    """
+    element = driver.execute_script(FILE_INPUT_SCRIPT)
+    try:
+        element._execute('sendKeysToElement', {'value': list(path), 'text': path})
+        info = driver.execute_script(FILE_INFO_SCRIPT, element)
+    except Exception:
+        info = None
+    if info is None:
+        driver.execute_script(REMOVE_INPUT_SCRIPT, element)
+        return None, None
+    return element, info
+
+
+def stream_remote(driver, path, destination, chunk_size=CHUNK_SIZE, expected_size=None, expected_sha256=None):
+    """
+    Read a file downloaded on a grid node through the browser in base64 chunks, written to disk as they arrive
+    :param driver: selenium driver
+    :param path: path of the file on the node
+    :param destination:
+    :param chunk_size: bytes per round trip, multiple of 3 so that chunks decode independently
+    :param expected_size:
+    :param expected_sha256:
+    :return: DownloadResult
+    """
+    chunk_size -= chunk_size % 3
+    element, info = select_remote_file(driver, path)
+    if element is None:
+        raise Exception(f"{path} is not present on the browser's machine !!")
+    remote_size = info[0]
+    if expected_size is not None and expected_size != remote_size:
+        driver.execute_script(REMOVE_INPUT_SCRIPT, element)
+        raise Exception(f"{path} has {remote_size} bytes instead of {expected_size} !!")
+    digest, size = hashlib.sha256(), 0
+    try:
+        with open(_part_path(destination), "wb") as _dst:
+            while size < remote_size:
+                encoded = driver.execute_async_script(READ_CHUNK_SCRIPT, element, size, chunk_size)
+                if not isinstance(encoded, str):
+                    raise Exception(f"Failed to read {path} at {size}: {encoded} !!")
+                chunk = base64.b64decode(encoded)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                _dst.write(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(_part_path(destination)):
+            os.remove(_part_path(destination))
+        raise
+    finally:
+        driver.execute_script(REMOVE_INPUT_SCRIPT, element)
+    return verify(destination, size, digest.hexdigest(), remote_size, expected_sha256)
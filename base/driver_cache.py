@@ -0,0 +1,308 @@
+__author__ = "sarvesh.singh"
+
+import os
+import io
+import time
+import stat
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+import requests
+from filelock import FileLock
+from base.common import basic_logging
+
+# How to find latest version and download url of each driver, {platform} is linux64 / mac64 (macos for gecko)
+DRIVER_SOURCES = {
+    "chrome": {
+        "name": "chromedriver",
+        "latest": "https://chromedriver.storage.googleapis.com/LATEST_RELEASE",
+        "download": "https://chromedriver.storage.googleapis.com/{version}/chromedriver_{platform}.zip",
+        "platforms": {"darwin": "mac64", "linux": "linux64"},
+    },
+    "firefox": {
+        "name": "geckodriver",
+        "latest": "https://api.github.com/repos/mozilla/geckodriver/releases/latest",
+        "download": "https://github.com/mozilla/geckodriver/releases/download/v{version}/"
+                    "geckodriver-v{version}-{platform}.tar.gz",
+        "platforms": {"darwin": "macos", "linux": "linux64"},
+    },
+}
+
+
+def get_platform(os_name):
+    """
+    Map OS name given by distro to 'darwin' or 'linux'
+    :param os_name:
+    :return:
+    """
+    os_name = str(os_name).lower()
+    for platform in ("darwin", "linux"):
+        if platform in os_name:
+            return platform
+    raise Exception(f"{os_name} is not supported !!")
+
+
+class DriverResolver:
+    """
+    Class to resolve driver binaries from a local cache, hitting the network only when the cached manifest expires
+    Cache layout: manifest.json + store/<sha256 of binary>/<driver name>, guarded by a file lock for parallel workers
+    Env: WEBDRIVER_CACHE_DIR, WEBDRIVER_MANIFEST_TTL (seconds), WEBDRIVER_OFFLINE=1, WEBDRIVER_MIRROR (local folder)
+    """
+
+    def __init__(self, os_name, cache_dir=None, ttl=None, offline=None, mirror=None):
+        """
+        Init Class with cache location and behaviour, falling back to environment variables
+        :param os_name:
+        :param cache_dir:
+        :param ttl:
+        :param offline:
+        :param mirror: folder having driver archives as <version>/<archive> or <archive>, or plain binaries
+        """
+        self.platform = get_platform(os_name)
+        default_dir = Path(__file__).parent / "web_drivers"
+        self.cache_dir = Path(cache_dir or os.environ.get("WEBDRIVER_CACHE_DIR", default_dir))
+        self.ttl = float(ttl if ttl is not None else os.environ.get("WEBDRIVER_MANIFEST_TTL", 24 * 60 * 60))
+        if offline is None:
+            offline = os.environ.get("WEBDRIVER_OFFLINE", "0").lower() in ("1", "true", "yes")
+        self.offline = offline
+        self.mirror = mirror or os.environ.get("WEBDRIVER_MIRROR")
+        self.manifest_file = self.cache_dir / "manifest.json"
+        self.logger = basic_logging(name="DRIVER-CACHE", level="INFO")
+
+    @contextmanager
+    def lock(self):
+        """
+        Exclusive lock on the cache so only one worker downloads and extracts at a time
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with FileLock(str(self.cache_dir / ".lock")):
+            yield
+
+    def read_manifest(self):
+        """
+        Read the version manifest, empty if not created yet
+        :return:
+        """
+        if not self.manifest_file.is_file():
+            return {}
+        with open(self.manifest_file, "r") as _fp:
+            return json_load(_fp)
+
+    def write_manifest(self, manifest):
+        """
+        Atomically write the version manifest
+        :param manifest:
+        """
+        temp = self.manifest_file.with_suffix(".tmp")
+        with open(temp, "w") as _fp:
+            _fp.write(json_dumps(manifest, indent=2, sort_keys=True))
+        os.replace(temp, self.manifest_file)
+
+    def store_path(self, digest, name):
+        """
+        Content addressed location of a driver binary
+        :param digest:
+        :param name:
+        :return:
+        """
+        return self.cache_dir / "store" / digest / name
+
+    def resolve(self, browser):
+        """
+        Resolve path of driver binary for browser, cached binary is returned without any network call within TTL
+        :param browser: chrome or firefox
+        :return:
+        """
+        if browser not in DRIVER_SOURCES:
+            raise Exception(f"{browser} is not supported Yet !!")
+        source = DRIVER_SOURCES[browser]
+        name = source["name"]
+        with self.lock():
+            manifest = self.read_manifest()
+            entry = manifest.setdefault(f"{name}-{self.platform}", {"versions": {}})
+            cached = self._cached_binary(entry, name, entry.get("latest"))
+
+            fresh = time.time() - entry.get("checked_at", 0) < self.ttl
+            if cached and (fresh or self.offline):
+                return str(cached)
+
+            if not self.offline:
+                try:
+                    version = self._latest_version(browser)
+                    binary = self._cached_binary(entry, name, version) or self._download(source, entry, version)
+                except Exception as exp:
+                    self.logger.info(f"Unable to get latest {name}, using cache: {exp}")
+                else:
+                    entry.update({"latest": version, "checked_at": time.time()})
+                    self.write_manifest(manifest)
+                    return str(binary)
+
+            binary = cached or self._newest_cached_binary(entry, name) or self._from_mirror(source, entry)
+            if binary is None:
+                raise Exception(f"No cached or mirrored {name} found for offline resolution !!")
+            if not self.offline:
+                # Don't pay for an unreachable upstream again till the TTL expires
+                entry["checked_at"] = time.time()
+            self.write_manifest(manifest)
+            return str(binary)
+
+    def _cached_binary(self, entry, name, version):
+        """
+        Path of cached binary of given version if it is still in store
+        :param entry:
+        :param name:
+        :param version:
+        :return:
+        """
+        digest = entry["versions"].get(version) if version else None
+        if digest and self.store_path(digest, name).is_file():
+            return self.store_path(digest, name)
+        return None
+
+    def _newest_cached_binary(self, entry, name):
+        """
+        Most recently stored binary, used when latest version could not be found out
+        :param entry:
+        :param name:
+        :return:
+        """
+        for version in sorted(entry["versions"], key=self._version_key, reverse=True):
+            binary = self._cached_binary(entry, name, version)
+            if binary:
+                return binary
+        return None
+
+    @staticmethod
+    def _version_key(version):
+        """
+        Sort key comparing dotted versions numerically
+        :param version:
+        :return:
+        """
+        return [int(part) if part.isdigit() else 0 for part in str(version).split(".")]
+
+    def _latest_version(self, browser):
+        """
+        Ask upstream for the latest driver version
+        :param browser:
+        :return:
+        """
+        url = DRIVER_SOURCES[browser]["latest"]
+        response = requests.get(url=url, timeout=10)
+        response.raise_for_status()
+        if browser == "firefox":
+            return response.json()["tag_name"].lstrip("v")
+        return response.content.decode().strip()
+
+    def _download(self, source, entry, version):
+        """
+        Download driver archive of version and add its binary to the store
+        :param source:
+        :param entry:
+        :param version:
+        :return:
+        """
+        url = source["download"].format(version=version, platform=source["platforms"][self.platform])
+        self.logger.info(f"Downloading {source['name']} {version} from {url}")
+        response = requests.get(url=url, stream=True, timeout=60)
+        response.raise_for_status()
+        with tempfile.TemporaryFile() as archive:
+            for block in response.iter_content(1024 * 1024):
+                archive.write(block)
+            archive.seek(0)
+            return self._add_to_store(entry, source["name"], version, self._extract(archive, source["name"]))
+
+    @staticmethod
+    def _extract(archive, name):
+        """
+        Read driver binary out of a zip or tar.gz archive file object
+        :param archive:
+        :param name:
+        :return:
+        """
+        if zipfile.is_zipfile(archive):
+            archive.seek(0)
+            with zipfile.ZipFile(archive) as zip_ref:
+                member = next(item for item in zip_ref.namelist() if item.rsplit("/", 1)[-1] == name)
+                return zip_ref.read(member)
+        archive.seek(0)
+        with tarfile.open(fileobj=archive, mode="r:*") as tar_ref:
+            member = next(item for item in tar_ref.getmembers() if item.name.rsplit("/", 1)[-1] == name)
+            return tar_ref.extractfile(member).read()
+
+    def _add_to_store(self, entry, name, version, content):
+        """
+        Save binary content under its sha256 and record version in manifest entry
+        :param entry:
+        :param name:
+        :param version:
+        :param content:
+        :return:
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        binary = self.store_path(digest, name)
+        if not binary.is_file():
+            binary.parent.mkdir(parents=True, exist_ok=True)
+            temp = binary.with_suffix(".tmp")
+            with open(temp, "wb") as _fp:
+                _fp.write(content)
+            os.chmod(temp, os.stat(temp).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+            os.replace(temp, binary)
+        entry["versions"][version] = digest
+        return binary
+
+    def _mirrored(self, item, source):
+        """
+        Whether a mirror file is the driver of this platform: a plain binary, or an archive named for this platform
+        :param item:
+        :param source:
+        :return:
+        """
+        name, platform = source["name"], source["platforms"][self.platform]
+        return item.is_file() and (item.name == name or (name in item.name and platform in item.name))
+
+    def _from_mirror(self, source, entry):
+        """
+        Resolve binary from local mirror folder (newest version folder first), else from legacy in-place driver
+        :param source:
+        :param entry:
+        :return:
+        """
+        name = source["name"]
+        candidates = []
+        if self.mirror and Path(self.mirror).is_dir():
+            mirror = Path(self.mirror)
+            folders = sorted((item for item in mirror.iterdir() if item.is_dir()),
+                             key=lambda item: self._version_key(item.name), reverse=True)
+            for folder in folders + [mirror]:
+                candidates.extend((folder.name if folder != mirror else "mirror", item)
+                                  for item in sorted(folder.iterdir()) if self._mirrored(item, source))
+        legacy = Path(__file__).parent / "web_drivers" / self.platform / name
+        if legacy.is_file():
+            candidates.append(("legacy", legacy))
+
+        for version, candidate in candidates:
+            with open(candidate, "rb") as _fp:
+                content = _fp.read()
+            if zipfile.is_zipfile(candidate) or tarfile.is_tarfile(candidate):
+                content = self._extract(io.BytesIO(content), name)
+            self.logger.info(f"Using {name} from {candidate}")
+            return self._add_to_store(entry, name, version, content)
+        return None
+
+    def clear(self):
+        """
+        Remove every cached binary and the manifest
+        """
+        with self.lock():
+            shutil.rmtree(self.cache_dir / "store", ignore_errors=True)
+            if self.manifest_file.is_file():
+                self.manifest_file.unlink()
@@ -0,0 +1,450 @@
+__author__ = "sarvesh.singh"
+
+import os
+import time
+import heapq
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from base.common import basic_logging
+
+
+def get_worker_id():
+    """
+    Get the pytest-xdist worker id of current process, 'master' when tests are not distributed
+    :return:
+    """
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def get_worker_path(folder, slot=None, worker_id=None):
+    """
+    Get (and create) a folder isolated per xdist worker and per pool slot, so parallel browsers never share it
+    :param folder:
+    :param slot:
+    :param worker_id:
+    :return:
+    """
+    path = Path(os.getcwd()) / folder / (worker_id or get_worker_id())
+    if slot is not None:
+        path = path / f"slot_{slot}"
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+class DriverPool:
+    """
+    Class to maintain a pool of web drivers which tests can checkout and return, one pool per xdist worker
+    """
+
+    def __init__(self, factory, size=1, health_check=True, destroy=None):
+        """
+        Init Class to create an empty pool, drivers are created lazily on checkout
+        :param factory: callable taking the slot number and returning a WebDriver
+        :param size: maximum number of live drivers in the pool
+        :param health_check: verify an idle driver is alive before handing it out
+        :param destroy: callable disposing of a discarded driver, default quits it (e.g. release of warm pool the
+        factory checks out from, so its profile is removed too)
+        """
+        if int(size) < 1:
+            raise Exception(f"Pool size should be at least 1, got {size} !!")
+        self.factory = factory
+        self.destroy = destroy
+        self.size = int(size)
+        self.health_check = health_check
+        self.logger = basic_logging(name="POOL", level="INFO")
+        self._idle = []
+        self._busy = {}
+        self._free_slots = list(range(self.size - 1, -1, -1))
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def idle_count(self):
+        """
+        Number of drivers waiting in pool to be checked out
+        :return:
+        """
+        with self._condition:
+            return len(self._idle)
+
+    @property
+    def busy_count(self):
+        """
+        Number of drivers currently checked out
+        :return:
+        """
+        with self._condition:
+            return len(self._busy)
+
+    def is_healthy(self, driver):
+        """
+        Check whether driver's session is still usable
+        :param driver:
+        :return:
+        """
+        if not self.health_check:
+            return True
+        try:
+            return bool(driver.is_alive())
+        except Exception:
+            return False
+
+    def checkout(self, timeout=None):
+        """
+        Checkout a driver from pool, creating a new one if pool is not full yet else waiting for a return
+        :param timeout: seconds to wait for a free driver, None to wait forever
+        :return:
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                slot, driver = self._reserve(deadline)
+            if driver is not None:
+                if self.is_healthy(driver):
+                    return driver
+                self.logger.info(f"Discarding unhealthy driver of slot {slot} !!")
+                self._destroy(driver)
+                with self._condition:
+                    self._busy.pop(id(driver), None)
+                    self._free_slots.append(slot)
+                continue
+            try:
+                driver = self.factory(slot)
+            except Exception:
+                with self._condition:
+                    self._free_slots.append(slot)
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._busy[id(driver)] = (slot, driver)
+            self.logger.debug(f"Created driver for slot {slot}")
+            return driver
+
+    def _reserve(self, deadline):
+        """
+        Reserve an idle driver or a free slot, must be called while holding the condition
+        :param deadline:
+        :return:
+        """
+        while True:
+            if self._closed:
+                raise Exception("Driver pool is already closed !!")
+            if self._idle:
+                slot, driver = self._idle.pop()
+                self._busy[id(driver)] = (slot, driver)
+                return slot, driver
+            if self._free_slots:
+                return self._free_slots.pop(), None
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise Exception(f"No driver returned to pool of size {self.size} in time !!")
+            self._condition.wait(remaining)
+
+    def checkin(self, driver, discard=False):
+        """
+        Return a driver back to pool
+        :param driver:
+        :param discard: quit the driver instead of reusing it (e.g. after a broken session)
+        :return:
+        """
+        with self._condition:
+            slot, _ = self._busy.pop(id(driver), (None, None))
+            if slot is None:
+                raise Exception("Driver was not checked out from this pool !!")
+            if not (discard or self._closed):
+                self._idle.append((slot, driver))
+                self._condition.notify()
+                return
+        self._destroy(driver)
+        with self._condition:
+            self._free_slots.append(slot)
+            self._condition.notify()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Context manager to checkout a driver and return it back once done
+        :param timeout:
+        :return:
+        """
+        driver = self.checkout(timeout=timeout)
+        try:
+            yield driver
+        except Exception:
+            self.checkin(driver, discard=not self.is_healthy(driver))
+            raise
+        self.checkin(driver)
+
+    def close(self):
+        """
+        Quit all idle drivers and refuse further checkouts, busy drivers are quit on checkin
+        :return:
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for _, driver in idle:
+            self._destroy(driver)
+
+    def _destroy(self, driver):
+        """
+        Quit the driver (or hand it to destroy) ignoring any error from a dead session
+        :param driver:
+        :return:
+        """
+        try:
+            if self.destroy is None:
+                driver.quit()
+            else:
+                self.destroy(driver)
+        except Exception as exp:
+            self.logger.debug(f"Ignoring error while quitting driver: {exp}")
+
+
+class WarmDriverPool:
+    """
+    Class to keep a number of freshly started web drivers ready in background, so a test needing a fresh browser
+    does not wait for browser startup; every checked out driver is replaced asynchronously
+    """
+
+    # Files a running browser keeps locked in its profile, never copied from/to template
+    LOCK_FILES = ("Singleton*", "lockfile", "parent.lock", ".parentlock", "*.lock")
+
+    def __init__(self, factory, size=2, work_dir=None, template_dir=None):
+        """
+        Init Class, call start() to begin warming up
+        :param factory: callable taking a session number and user_data_dir (None without template) returning WebDriver,
+        numbers of quit drivers are reused so their folders are too
+        :param size: number of drivers kept ready
+        :param work_dir: folder where profiles of warm drivers are created, default per worker "browser_profiles"
+        :param template_dir: profile folder each warm driver starts from, used as it is when it exists else built once
+        from a browser started and quit before any test could use it
+        """
+        if int(size) < 1:
+            raise Exception(f"Warm pool size should be at least 1, got {size} !!")
+        self.factory = factory
+        self.size = int(size)
+        self.work_dir = Path(work_dir or get_worker_path("browser_profiles"))
+        self.template_dir = Path(template_dir) if template_dir else None
+        self.logger = basic_logging(name="WARM_POOL", level="INFO")
+        self._ready = []
+        self._checked_out = {}
+        self._starting = 0
+        self._numbers = 0
+        self._free_numbers = []
+        self._error = None
+        self._condition = threading.Condition()
+        self._template_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def ready_count(self):
+        """
+        Number of drivers started and waiting to be checked out
+        :return:
+        """
+        with self._condition:
+            return len(self._ready)
+
+    def start(self):
+        """
+        Start warming up drivers in background
+        :return:
+        """
+        with self._condition:
+            self._refill()
+        return self
+
+    def _refill(self):
+        """
+        Start drivers in background till ready plus starting drivers fill the pool, must hold the condition
+        """
+        while not self._closed and self._error is None and len(self._ready) + self._starting < self.size:
+            self._starting += 1
+            if self._free_numbers:
+                number = heapq.heappop(self._free_numbers)
+            else:
+                self._numbers += 1
+                number = self._numbers
+            threading.Thread(target=self._warm, args=(number,), name=f"warm-driver-{number}", daemon=True).start()
+
+    def _warm(self, number):
+        """
+        Start one driver and add it to ready drivers
+        :param number:
+        """
+        start = time.monotonic()
+        driver, error = None, None
+        try:
+            driver = self.factory(number, user_data_dir=self._new_profile(number))
+        except Exception as exp:
+            error = exp
+        with self._condition:
+            self._starting -= 1
+            if error is not None:
+                self._error = error
+            elif not self._closed:
+                self._ready.append((driver, number))
+                driver = None
+            self._condition.notify_all()
+        if error is not None:
+            self.logger.info(f"Unable to start warm driver {number}: {error}")
+            self._destroy(None, number)
+        elif driver is not None:
+            self._destroy(driver, number)
+        else:
+            self.logger.debug(f"Warm driver {number} ready in {time.monotonic() - start:.1f}s")
+
+    def _profile_path(self, number):
+        """
+        Profile folder of a driver number
+        :param number:
+        :return: None when template is not used
+        """
+        return None if self.template_dir is None else self.work_dir / f"session_{number}"
+
+    def _new_profile(self, number):
+        """
+        Create profile folder of a driver, copied from template
+        :param number:
+        :return: profile folder or None when template is not used
+        """
+        profile = self._profile_path(number)
+        if profile is None:
+            return None
+        self._build_template()
+        shutil.rmtree(profile, ignore_errors=True)
+        shutil.copytree(self.template_dir, profile, ignore=shutil.ignore_patterns(*self.LOCK_FILES))
+        return str(profile)
+
+    def _build_template(self):
+        """
+        Build template once from a just started browser quit before any test used it, so no cookie, storage or login
+        of a test ever gets into it; renamed into place so concurrent workers never see half a profile
+        """
+        with self._template_lock:
+            if self.template_dir.exists():
+                return
+            staging = self.template_dir.parent / f".{self.template_dir.name}-{get_worker_id()}-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            try:
+                self._quit(self.factory("template", user_data_dir=str(staging)))
+                for pattern in self.LOCK_FILES:
+                    for path in staging.glob(pattern):
+                        path.unlink()
+                os.rename(staging, self.template_dir)
+                self.logger.info(f"Saved browser profile template to {self.template_dir}")
+            except OSError:
+                # template renamed into place by another worker meanwhile
+                pass
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def checkout(self, timeout=None):
+        """
+        Checkout a ready driver, waiting for one being started when none is ready, a replacement is started at once
+        :param timeout: seconds to wait, None to wait forever
+        :return:
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                driver, number = self._take(deadline)
+                self._checked_out[id(driver)] = number
+                self._refill()
+            try:
+                if driver.is_alive():
+                    return driver
+            except Exception:
+                pass
+            self.logger.info("Discarding warm driver which died while waiting !!")
+            self.release(driver)
+
+    def _take(self, deadline):
+        """
+        Take the oldest ready driver, must be called while holding the condition
+        :param deadline:
+        :return:
+        """
+        while True:
+            if self._closed:
+                raise Exception("Warm driver pool is already closed !!")
+            self._refill()
+            if self._ready:
+                return self._ready.pop(0)
+            if self._error is not None and not self._starting:
+                error, self._error = self._error, None
+                raise Exception(f"Unable to start a warm driver: {error} !!")
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise Exception("No warm driver got ready in time !!")
+            self._condition.wait(remaining)
+
+    def release(self, driver, wait=False):
+        """
+        Quit a checked out driver in background and drop its profile, the profile is never kept as template
+        :param driver:
+        :param wait: quit in calling thread instead
+        :return:
+        """
+        with self._condition:
+            number = self._checked_out.pop(id(driver), None)
+        if wait:
+            self._destroy(driver, number)
+        else:
+            threading.Thread(target=self._destroy, args=(driver, number), daemon=True).start()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Context manager to checkout a fresh driver and quit it once done
+        :param timeout:
+        :return:
+        """
+        driver = self.checkout(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """
+        Stop warming, quit ready drivers and remove profiles, checked out drivers are left to their owners
+        :return:
+        """
+        with self._condition:
+            self._closed = True
+            ready, self._ready = self._ready, []
+            self._condition.notify_all()
+        for driver, number in ready:
+            self._destroy(driver, number)
+
+    def _quit(self, driver):
+        """
+        Quit the driver ignoring errors of a dead session
+        :param driver:
+        """
+        try:
+            driver.quit()
+        except Exception as exp:
+            self.logger.debug(f"Ignoring error while quitting driver: {exp}")
+
+    def _destroy(self, driver, number=None):
+        """
+        Quit the driver, remove its profile and free its number for the next driver
+        :param driver: None when it failed to start
+        :param number:
+        """
+        if driver is not None:
+            self._quit(driver)
+        if number is None:
+            return
+        profile = self._profile_path(number)
+        if profile is not None:
+            shutil.rmtree(profile, ignore_errors=True)
+        with self._condition:
+            heapq.heappush(self._free_numbers, number)
@@ -0,0 +1,53 @@
+__author__ = "sarvesh.singh"
+
+class ElementCache:
+    """
+    Class to keep web element handles by locator till next navigation, so repeated actions skip the find command
+    A handle of a document replaced without navigating through WebDriver (e.g. by a click on a link) raises stale on
+    use and is found again then
+    """
+
+    def __init__(self):
+        """
+        Init Class with an empty cache
+        """
+        self._elements = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __contains__(self, by):
+        return by in self._elements
+
+    def get(self, by):
+        """
+        Get cached element of a (By, value) tuple, None when not cached
+        :param by:
+        :return:
+        """
+        element = self._elements.get(by)
+        if element is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return element
+
+    def put(self, by, element):
+        """
+        Cache element found for a (By, value) tuple
+        :param by:
+        :param element:
+        """
+        self._elements[by] = element
+
+    def invalidate(self, by=None):
+        """
+        Drop one cached element, or all of them when by is not given
+        :param by:
+        """
+        if by is None:
+            self._elements.clear()
+        else:
+            self._elements.pop(by, None)
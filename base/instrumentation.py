@@ -0,0 +1,297 @@
+__author__ = "sarvesh.singh"
+
+import os
+import math
+import time
+import random
+import inspect
+import functools
+import threading
+import contextvars
+
+# Kinds of timings recorded
+METHOD = "method"
+COMMAND = "command"
+LOCATOR = "locator"
+SLEEP = "sleep"
+
+ENABLED = os.environ.get("WEBDRIVER_METRICS", "1").lower() not in ("0", "false", "no")
+
+# Samples kept per (kind, name) for percentiles, count and total stay exact beyond it
+MAX_SAMPLES = 2048
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of already sorted samples
+    :param samples:
+    :param pct: 0-100
+    :return:
+    """
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct * len(samples) / 100.0) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+class _Series:
+    """
+    Class for exact count and total of one (kind, name) and a uniform reservoir of its samples
+    """
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, count=0, total=0.0, samples=None):
+        self.count, self.total, self.samples = count, total, samples or []
+
+    def add(self, seconds, max_samples):
+        """
+        Add a sample, once reservoir is full it replaces a kept one with probability max_samples / count
+        :param seconds:
+        :param max_samples:
+        """
+        self.count += 1
+        self.total += seconds
+        if len(self.samples) < max_samples:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < max_samples:
+                self.samples[slot] = seconds
+
+    def extend(self, other, max_samples):
+        """
+        Add samples of another series, kept samples are drawn from both in proportion to their counts
+        :param other: _Series
+        :param max_samples:
+        """
+        count = self.count + other.count
+        if len(self.samples) + len(other.samples) <= max_samples:
+            samples = self.samples + other.samples
+        else:
+            mine = min(round(max_samples * self.count / count), len(self.samples))
+            theirs = min(max_samples - mine, len(other.samples))
+            samples = random.sample(self.samples, mine) + random.sample(other.samples, theirs)
+        self.count, self.total, self.samples = count, self.total + other.total, samples
+
+
+class CommandMetrics:
+    """
+    Class to collect latency samples per kind (method, command, locator, sleep) and name
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        """
+        Init Class with no samples
+        :param max_samples: samples kept per (kind, name), a long session does not grow past it
+        """
+        self.max_samples = max_samples
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._series)
+
+    def record(self, kind, name, seconds):
+        """
+        Record one sample
+        :param kind:
+        :param name:
+        :param seconds:
+        """
+        with self._lock:
+            self._series.setdefault((kind, name), _Series()).add(seconds, self.max_samples)
+
+    def summary(self):
+        """
+        Count, total and p50/p95/p99 latency in milliseconds of every (kind, name)
+        :return: {kind: {name: {...}}}
+        """
+        with self._lock:
+            items = [(key, series.count, series.total, sorted(series.samples))
+                     for key, series in self._series.items()]
+        summary = {}
+        for (kind, name), count, total, samples in items:
+            summary.setdefault(kind, {})[name] = {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            }
+        return summary
+
+    def export(self):
+        """
+        Counts, totals and kept samples in a form xdist can send from a worker to the controller
+        :return: [[kind, name, count, total, [seconds]]]
+        """
+        with self._lock:
+            return [[kind, name, series.count, series.total, list(series.samples)]
+                    for (kind, name), series in self._series.items()]
+
+    def merge(self, exported):
+        """
+        Add samples exported by another process, percentiles are then computed over all of them
+        :param exported: return value of export
+        """
+        with self._lock:
+            for kind, name, count, total, samples in exported:
+                self._series.setdefault((kind, name), _Series()).extend(_Series(count, total, list(samples)),
+                                                                       self.max_samples)
+
+    def reset(self):
+        """
+        Drop all samples
+        """
+        with self._lock:
+            self._series = {}
+
+
+# Per test metrics and call depth are context local: each thread and asyncio task has its own, pipeline() workers
+# run in a copy of the caller's context so they add to the caller's test and are nested under its call
+_session_metrics = CommandMetrics()
+_test_metrics = contextvars.ContextVar("test_metrics", default=None)
+_depth = contextvars.ContextVar("instrumented_depth", default=0)
+
+
+def record(kind, name, seconds):
+    """
+    Record a sample in session wide and current test's metrics
+    :param kind:
+    :param name:
+    :param seconds:
+    """
+    if ENABLED:
+        _session_metrics.record(kind, name, seconds)
+        test_metrics = _test_metrics.get()
+        if test_metrics is not None:
+            test_metrics.record(kind, name, seconds)
+
+
+def start_test():
+    """
+    Start collecting a fresh per test breakdown in current context
+    """
+    _test_metrics.set(CommandMetrics())
+
+
+def get_session_metrics():
+    """
+    Metrics collected since start of the process
+    :return:
+    """
+    return _session_metrics
+
+
+def get_test_metrics():
+    """
+    Metrics collected in current context since last start_test
+    :return:
+    """
+    test_metrics = _test_metrics.get()
+    return CommandMetrics() if test_metrics is None else test_metrics
+
+
+def sleep(seconds, name="wait_for"):
+    """
+    time.sleep which is accounted as time spent sleeping
+    :param seconds:
+    :param name:
+    """
+    time.sleep(seconds)
+    record(SLEEP, name, seconds)
+
+
+def _locator_name(args, kwargs):
+    """
+    Locator value of an instrumented call, taken from 'element' argument
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    element = kwargs.get("element", args[0] if args else None)
+    if isinstance(element, str) or hasattr(element, "by"):
+        return str(element)
+    return None
+
+
+def _timed(name, function, takes_element):
+    """
+    Wrap a method so that outermost calls are recorded as method (and locator) timings
+    :param name:
+    :param function:
+    :param takes_element:
+    :return:
+    """
+
+    @functools.wraps(function)
+    def _wrapper(self, *args, **kwargs):
+        if not ENABLED or _depth.get():
+            return function(self, *args, **kwargs)
+        token = _depth.set(1)
+        start = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _depth.reset(token)
+            record(METHOD, name, elapsed)
+            locator = _locator_name(args, kwargs) if takes_element else None
+            if locator is not None:
+                record(LOCATOR, locator, elapsed)
+
+    return _wrapper
+
+
+def instrument_class(cls):
+    """
+    Class decorator recording latency of every public method, nested calls are accounted to the outermost one
+    :param cls:
+    :return:
+    """
+    for name, member in list(vars(cls).items()):
+        # static methods, generators and context managers are left as they are
+        if name.startswith("_") or not inspect.isfunction(member) or inspect.isgeneratorfunction(
+                inspect.unwrap(member)):
+            continue
+        parameters = list(inspect.signature(member).parameters)
+        setattr(cls, name, _timed(name, member, takes_element=len(parameters) > 1 and parameters[1] == "element"))
+    return cls
+
+
+def instrument_driver(driver):
+    """
+    Record latency of every remote command sent by a selenium driver (elements send through their parent driver)
+    :param driver:
+    :return:
+    """
+    execute = driver.execute
+
+    @functools.wraps(execute)
+    def _execute(driver_command, params=None):
+        start = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            record(COMMAND, driver_command, time.perf_counter() - start)
+
+    driver.execute = _execute
+    return driver
+
+
+def format_table(summary, kinds=(METHOD, COMMAND, SLEEP), limit=15):
+    """
+    Format summary as a plain text table, slowest (by total) first
+    :param summary:
+    :param kinds:
+    :param limit: rows per kind
+    :return:
+    """
+    lines = [f"{'kind':<8} {'name':<45} {'count':>7} {'total ms':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for kind in kinds:
+        rows = sorted(summary.get(kind, {}).items(), key=lambda row: row[1]["total_ms"], reverse=True)[:limit]
+        for name, stats in rows:
+            lines.append(f"{kind:<8} {str(name)[:45]:<45} {stats['count']:>7} {stats['total_ms']:>11.1f} "
+                         f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+__author__ = "sarvesh.singh"
+
+from selenium.webdriver.common.by import By
+
+# Locator type names used across page classes mapped to selenium's strategies
+LOCATOR_TYPES = {
+    "id": By.ID,
+    "name": By.NAME,
+    "xpath": By.XPATH,
+    "class": By.CLASS_NAME,
+    "tag": By.TAG_NAME,
+    "css": By.CSS_SELECTOR,
+    "link": By.LINK_TEXT,
+    "partial_link": By.PARTIAL_LINK_TEXT,
+}
+
+# Locator type names mapped to the ('xpath' | 'css', selector template) pair in-page scripts find elements with
+SCRIPT_LOCATOR_TYPES = {
+    "xpath": ("xpath", "{}"),
+    "css": ("css", "{}"),
+    "id": ("css", '[id="{}"]'),
+    "name": ("css", '[name="{}"]'),
+    "class": ("css", ".{}"),
+    "tag": ("css", "{}"),
+}
+
+
+def get_by_strategy(locator_type):
+    """
+    Get selenium's By strategy of a locator type
+    :param locator_type:
+    :return:
+    """
+    try:
+        return LOCATOR_TYPES[locator_type]
+    except KeyError:
+        raise Exception(f"Provided locator type {locator_type} is not supported !!")
+
+
+class Locator:
+    """
+    Class for an immutable, hashable locator, resolved to selenium's (By, value) tuple once when declared
+    """
+
+    __slots__ = ("strategy", "value", "by")
+
+    def __init__(self, value, strategy="xpath"):
+        """
+        Init Class with locator value and its type
+        :param value:
+        :param strategy: id, name, xpath, class, tag, css, link, partial_link
+        """
+        object.__setattr__(self, "strategy", strategy)
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "by", (get_by_strategy(strategy), value))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Locator is immutable !!")
+
+    def __iter__(self):
+        return iter(self.by)
+
+    def __eq__(self, other):
+        return isinstance(other, Locator) and self.by == other.by
+
+    def __hash__(self):
+        return hash(self.by)
+
+    def __repr__(self):
+        return f"Locator({self.value!r}, strategy={self.strategy!r})"
+
+    def __str__(self):
+        return self.value
+
+    def format(self, *args):
+        """
+        Fill the %s placeholders of a templated locator
+        :param args:
+        :return:
+        """
+        return Locator(self.value % args, self.strategy)
+
+    def __mod__(self, args):
+        if isinstance(args, Locator):
+            args = args.value
+        return self.format(*(args if isinstance(args, tuple) else (args,)))
+
+
+class Locators:
+    """
+    Class for registry of a page's locators, declared once as a class attribute of the page class
+    """
+
+    def __init__(self, strategy="xpath", **locators):
+        """
+        Init Class with locators, plain strings are of default strategy
+        :param strategy: default locator type
+        :param locators: name=value or name=Locator(...)
+        """
+        for name, locator in locators.items():
+            if not isinstance(locator, Locator):
+                locator = Locator(locator, strategy)
+            setattr(self, name, locator)
+
+    def __iter__(self):
+        return iter(vars(self).items())
+
+
+def to_by(element, locator_type=None):
+    """
+    Get (By, value) tuple of a Locator or of a plain value with its locator type
+    :param element:
+    :param locator_type:
+    :return:
+    """
+    if element.__class__ is Locator:
+        return element.by
+    return get_by_strategy(locator_type), element
+
+
+def get_script_locator(element, locator_type=None):
+    """
+    Convert a Locator or a plain value with its locator type to the ('xpath' | 'css', selector) pair understood by
+    in-page scripts
+    :param element:
+    :param locator_type:
+    :return:
+    """
+    if element.__class__ is Locator:
+        element, locator_type = element.value, element.strategy
+    try:
+        kind, template = SCRIPT_LOCATOR_TYPES[locator_type]
+    except KeyError:
+        raise Exception(f"Provided locator type {locator_type} is not supported in scripts !!")
+    return [kind, template.format(element)]
@@ -0,0 +1,188 @@
+__author__ = "sarvesh.singh"
+
+import os
+import re
+import sys
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+from pathlib import Path
+from json import dumps as json_dumps
+
+FORMAT = "%(levelname)s :: %(message)s"
+
+_state = {"queue": None, "handler": None, "listener": None, "files": None, "test": None}
+_lock = threading.Lock()
+
+
+def set_current_test(node_id):
+    """
+    Set pytest node id records emitted from now on are correlated with, None between tests
+    :param node_id:
+    """
+    _state["test"] = node_id
+
+
+def get_current_test():
+    """
+    Node id of the test running in this process
+    :return:
+    """
+    return _state["test"]
+
+
+class _CorrelationFilter(logging.Filter):
+    """
+    Class to stamp records with the running test in the emitting thread, before they are queued
+    """
+
+    def filter(self, record):
+        record.nodeid = _state["test"]
+        return True
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Class for a console handler always writing to current sys.stdout, which pytest swaps while capturing
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonLinesHandler(logging.Handler):
+    """
+    Class to write records as JSON lines in one file per test (session.jsonl for records outside of tests)
+    """
+
+    def __init__(self, log_dir):
+        """
+        Init Class
+        :param log_dir:
+        """
+        super().__init__()
+        self.log_dir = Path(log_dir)
+        self._files = {}
+        self._written = set()
+
+    def get_path(self, node_id):
+        """
+        File of a test, long node ids are shortened with a hash
+        :param node_id: None for records outside of tests
+        :return:
+        """
+        if node_id is None:
+            return self.log_dir / "session.jsonl"
+        name = re.sub(r"[^\w.-]+", "_", node_id).strip("_")
+        if len(name) > 150:
+            name = f"{name[:130]}_{hashlib.sha1(node_id.encode()).hexdigest()[:12]}"
+        return self.log_dir / f"{name}.jsonl"
+
+    def emit(self, record):
+        try:
+            node_id = getattr(record, "nodeid", None)
+            line = {
+                "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                "nodeid": node_id,
+                "worker": os.environ.get("PYTEST_XDIST_WORKER", "master"),
+                "thread": record.threadName,
+            }  # message already has the traceback of exceptions, added when record was queued
+            self._get_file(node_id).write(json_dumps(line, default=str) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def _get_file(self, node_id):
+        """
+        Open file of a test, truncated the first time in this process; only the latest test's file is kept open
+        :param node_id:
+        :return:
+        """
+        if node_id not in self._files:
+            for _fp in self._files.values():
+                _fp.close()
+            path = self.get_path(node_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._files = {node_id: open(path, "a" if node_id in self._written else "w", buffering=1)}
+            self._written.add(node_id)
+        return self._files[node_id]
+
+    def close(self):
+        for _fp in self._files.values():
+            _fp.close()
+        self._files = {}
+        super().close()
+
+
+def configure_logging(log_dir=None):
+    """
+    Configure logging once per process: framework loggers put records on a queue (never blocking the test on IO),
+    a listener thread writes them to console and to JSON lines files per test
+    :param log_dir: default LOG_DIR or logs/<xdist worker>
+    :return: QueueHandler to attach to loggers
+    """
+    with _lock:
+        if _state["handler"] is None:
+            log_dir = log_dir or os.environ.get("LOG_DIR") or os.path.join(
+                os.getcwd(), "logs", os.environ.get("PYTEST_XDIST_WORKER", "master"))
+            console = _StdoutHandler()
+            console.setFormatter(logging.Formatter(FORMAT))
+            files = JsonLinesHandler(log_dir)
+            _state["queue"] = queue.Queue(-1)
+            _state["files"] = files
+            _state["listener"] = logging.handlers.QueueListener(_state["queue"], console, files)
+            _state["listener"].start()
+            handler = logging.handlers.QueueHandler(_state["queue"])
+            handler.addFilter(_CorrelationFilter())
+            _state["handler"] = handler
+            atexit.register(stop_logging)
+        return _state["handler"]
+
+
+def get_test_log_path(node_id):
+    """
+    JSON lines file records of a test are written to
+    :param node_id:
+    :return:
+    """
+    configure_logging()
+    return _state["files"].get_path(node_id)
+
+
+def flush_logs():
+    """
+    Wait till every queued record has been written
+    """
+    if _state["queue"] is not None:
+        _state["queue"].join()
+
+
+def stop_logging():
+    """
+    Write remaining records and stop listener, configured again on next use
+    """
+    with _lock:
+        listener, handler = _state["listener"], _state["handler"]
+        _state.update({"queue": None, "handler": None, "listener": None})
+    if listener is None:
+        return
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger) and handler in logger.handlers:
+            logger.removeHandler(handler)
+    listener.stop()
+    for target in listener.handlers:
+        target.close()
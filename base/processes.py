@@ -0,0 +1,324 @@
+__author__ = "sarvesh.singh"
+
+import os
+import shlex
+import signal
+import atexit
+import threading
+import subprocess
+import urllib.request
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from json import loads as json_loads
+from base.common import basic_logging
+from base.waits import WaitPolicy
+
+CmdResponse = namedtuple("CmdResponse", ["cmd", "status", "output", "error"])
+
+APPIUM_PORT = 4723
+
+# Child processes get their own process group (session) so stop reaches whatever they spawned, signals and
+# process groups are POSIX only, on Windows the tree is ended with taskkill
+WINDOWS = os.name == "nt"
+
+_host_values = {}
+_host_lock = threading.Lock()
+_manager = {"instance": None}
+
+
+def to_args(cmd):
+    """
+    Argument list of a command, strings are split like a shell would but never run through one
+    :param cmd: str or list
+    :return:
+    """
+    return shlex.split(cmd) if isinstance(cmd, str) else [str(arg) for arg in cmd]
+
+
+class ManagedProcess:
+    """
+    Class for a child process whose stdout / stderr lines are streamed to the logger as they come
+    """
+
+    def __init__(self, cmd, name=None, env=None, cwd=None, logger=None, keep_lines=1000, shell=False):
+        """
+        Init Class and start the process
+        :param cmd: str or list, run without a shell unless shell is set
+        :param name: prefix of logged lines, default program name
+        :param env: extra environment variables
+        :param cwd:
+        :param logger:
+        :param keep_lines: last lines of each stream kept for output / error
+        :param shell: run str cmd through the shell, for pipes, globs, && and variable expansion
+        """
+        self.args = to_args(cmd)
+        self.cmd = cmd if shell and isinstance(cmd, str) else shlex.join(self.args)
+        self.name = name or os.path.basename(self.args[0])
+        self.logger = logger or basic_logging(name="PROCESS")
+        self._stdout, self._stderr = deque(maxlen=keep_lines), deque(maxlen=keep_lines)
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if WINDOWS else {"start_new_session": True}
+        self.process = subprocess.Popen(self.cmd if shell else self.args, shell=shell, stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd,
+                                        env={**os.environ, **(env or {})}, **group)
+        self.logger.debug(f"[{self.name}] started pid {self.process.pid}: {self.cmd}")
+        self._readers = [threading.Thread(target=self._pump, args=(stream, lines), daemon=True,
+                                          name=f"{self.name}-output")
+                         for stream, lines in ((self.process.stdout, self._stdout),
+                                               (self.process.stderr, self._stderr))]
+        for reader in self._readers:
+            reader.start()
+
+    def _pump(self, stream, lines):
+        """
+        Reader thread of one output stream, keeps its last lines and logs every line as it comes
+        :param stream: stdout or stderr pipe
+        :param lines: deque of kept lines
+        """
+        for raw in iter(stream.readline, b""):
+            line = raw.decode(errors="replace").rstrip()
+            lines.append(line)
+            self.logger.debug(f"[{self.name}] {line}")
+        stream.close()
+
+    @property
+    def pid(self):
+        """
+        Process id of the child
+        :return:
+        """
+        return self.process.pid
+
+    def is_running(self):
+        """
+        Whether the child has not exited yet
+        :return:
+        """
+        return self.process.poll() is None
+
+    def _end_tree(self, force):
+        """
+        Ask the process and its descendants to exit, or kill them when force is set
+        :param force:
+        :return: False when process is already gone
+        """
+        if WINDOWS:
+            subprocess.run(["taskkill", "/T"] + (["/F"] if force else []) + ["/PID", str(self.process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return True
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Wait for process to exit, killed when it does not within timeout
+        :param timeout: seconds, None to wait forever
+        :return: CmdResponse
+        """
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.stop()
+            raise Exception(f"{self.cmd} did not finish in {timeout} seconds !!")
+        return self.result()
+
+    def result(self):
+        """
+        Exit status and output collected so far
+        :return: CmdResponse
+        """
+        for reader in self._readers:
+            reader.join(timeout=None if self.process.poll() is not None else 0)
+        return CmdResponse(cmd=self.cmd, status=self.process.poll(),
+                           output="\n".join(self._stdout), error="\n".join(self._stderr))
+
+    def stop(self, timeout=5):
+        """
+        Terminate process and whatever it spawned (own process group), killed when it does not exit in time
+        :param timeout:
+        """
+        if not self.is_running():
+            return
+        for force, wait in ((False, timeout), (True, None)):
+            if not self._end_tree(force):
+                return
+            try:
+                self.process.wait(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                self.logger.warning(f"[{self.name}] did not stop in {timeout} seconds, killing it")
+        self.logger.debug(f"[{self.name}] stopped with {self.process.returncode}")
+
+
+class ProcessManager:
+    """
+    Class to start child processes (without a shell unless asked for), keep their handles and stop them all at the end
+    """
+
+    def __init__(self, max_workers=8):
+        """
+        Init Class
+        :param max_workers: commands run concurrently by run_many
+        """
+        self.logger = basic_logging(name="PROCESS")
+        self.max_workers = max_workers
+        self.processes = []
+        self._lock = threading.Lock()
+
+    def start(self, cmd, name=None, env=None, cwd=None, shell=False):
+        """
+        Start a long running process, tracked till stopped
+        :param cmd: str or list
+        :param name:
+        :param env: extra environment variables
+        :param cwd:
+        :param shell: run str cmd through the shell
+        :return: ManagedProcess
+        """
+        process = ManagedProcess(cmd, name=name, env=env, cwd=cwd, logger=self.logger, shell=shell)
+        with self._lock:
+            self.processes = [_process for _process in self.processes if _process.is_running()] + [process]
+        return process
+
+    def run(self, cmd, timeout=60, env=None, cwd=None, check=False, shell=False):
+        """
+        Run a command to completion
+        :param cmd: str or list
+        :param timeout: seconds after which command is killed and an exception raised, None to wait forever
+        :param env: extra environment variables
+        :param cwd:
+        :param check: raise when exit status is not 0
+        :param shell: run str cmd through the shell
+        :return: CmdResponse
+        """
+        try:
+            process = ManagedProcess(cmd, env=env, cwd=cwd, logger=self.logger, shell=shell)
+        except FileNotFoundError:
+            if check:
+                raise Exception(f"{to_args(cmd)[0]} is not installed !!")
+            return CmdResponse(cmd=shlex.join(to_args(cmd)), status=127, output="", error="command not found")
+        result = process.wait(timeout=timeout)
+        if check and result.status != 0:
+            raise Exception(f"{result.cmd} failed with {result.status}: {result.error} !!")
+        return result
+
+    def run_many(self, commands, timeout=60, env=None):
+        """
+        Run independent commands concurrently
+        :param commands: {key: cmd}
+        :param timeout: per command
+        :param env: extra environment variables
+        :return: {key: CmdResponse}
+        """
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(commands), 1))) as executor:
+            futures = {key: executor.submit(self.run, cmd, timeout, env) for key, cmd in commands.items()}
+            return {key: future.result() for key, future in futures.items()}
+
+    def stop(self, name=None):
+        """
+        Stop tracked processes
+        :param name: only the ones started with this name, None for all
+        """
+        with self._lock:
+            stopping = [process for process in self.processes if name is None or process.name == name]
+            self.processes = [process for process in self.processes if process not in stopping]
+        for process in stopping:
+            process.stop()
+
+
+def get_process_manager():
+    """
+    Process manager of this python process, all its children are stopped at exit
+    :return: ProcessManager
+    """
+    with _host_lock:
+        if _manager["instance"] is None:
+            _manager["instance"] = ProcessManager()
+            atexit.register(_manager["instance"].stop)
+        return _manager["instance"]
+
+
+def get_host_value(key, cmd, env=None):
+    """
+    Output of a command whose result does not change on this host (java home, sdk paths), run once per process
+    :param key:
+    :param cmd:
+    :param env:
+    :return: stripped output, "" when command failed
+    """
+    with _host_lock:
+        if key in _host_values:
+            return _host_values[key]
+    result = get_process_manager().run(cmd, env=env)
+    value = result.output.strip() if result.status == 0 else ""
+    with _host_lock:
+        return _host_values.setdefault(key, value)
+
+
+def http_ready(url, timeout=60, process=None, wait_policy=None):
+    """
+    Poll a status endpoint till it answers 200 with a JSON body
+    :param url:
+    :param timeout:
+    :param process: ManagedProcess serving the endpoint, waiting stops early when it exits
+    :param wait_policy:
+    :return: decoded JSON body
+    """
+
+    def _probe(_):
+        if process is not None and not process.is_running():
+            raise Exception(f"{process.name} exited with {process.process.returncode}: {process.result().error} !!")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return json_loads(response.read() or b"null") if response.status == 200 else None
+        except (OSError, ValueError):
+            return None
+
+    return (wait_policy or WaitPolicy()).budget(timeout).until(_probe, message=f"{url} not ready in {timeout} s")
+
+
+def start_appium(port=APPIUM_PORT, chromedriver=None, env=None, wait=True, timeout=60, extra_args=(),
+                 executable="appium"):
+    """
+    Start an Appium server, by default returning once its /status endpoint answers instead of sleeping a fixed time
+    :param port:
+    :param chromedriver: chromedriver executable used for web views
+    :param env: extra environment variables (ANDROID_HOME, JAVA_HOME)
+    :param wait: False to return right away and call wait_for_appium later (other setup meanwhile)
+    :param timeout: seconds to wait for readiness
+    :param extra_args:
+    :param executable: appium command (str or list)
+    :return: ManagedProcess
+    """
+    cmd = to_args(executable) + ["--port", port]
+    if chromedriver:
+        cmd += ["--chromedriver-executable", chromedriver]
+    process = get_process_manager().start(cmd + list(extra_args), name=f"appium-{port}", env=env)
+    if wait:
+        wait_for_appium(process, port, timeout=timeout)
+    return process
+
+
+def wait_for_appium(process, port=APPIUM_PORT, timeout=60):
+    """
+    Wait till Appium server answers on /status, stopped when it does not in time
+    :param process: ManagedProcess of server
+    :param port:
+    :param timeout:
+    :return: status value
+    """
+    try:
+        return http_ready(f"http://127.0.0.1:{port}/wd/hub/status", timeout=timeout, process=process)
+    except Exception:
+        process.stop()
+        raise
+
+
+def stop_appium(port=APPIUM_PORT):
+    """
+    Stop Appium server started by this process on port, other node processes on the host are left alone
+    :param port:
+    """
+    get_process_manager().stop(name=f"appium-{port}")
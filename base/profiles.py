@@ -0,0 +1,123 @@
+__author__ = "sarvesh.singh"
+
+from collections import namedtuple
+from base.common import get_resource_config
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+# Third party trackers/analytics and web fonts, none of them is needed to check the DOM
+HEAVY_RESOURCES = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+]
+
+SessionProfile = namedtuple(
+    "SessionProfile",
+    ["name", "headless", "page_load_strategy", "block_urls", "disable_images", "disk_cache_dir", "user_data_dir"],
+)
+SessionProfile.__new__.__defaults__ = (False, "normal", (), False, None, None)
+
+PROFILES = {
+    "default": SessionProfile(name="default"),
+    "fast": SessionProfile(name="fast", page_load_strategy="eager", block_urls=tuple(HEAVY_RESOURCES),
+                           disable_images=True),
+    "headless": SessionProfile(name="headless", headless=True, page_load_strategy="eager",
+                               block_urls=tuple(HEAVY_RESOURCES), disable_images=True),
+}
+
+
+def get_profile(profile=None, visited=()):
+    """
+    Resolve a session profile from a SessionProfile, a dict or a name of built-in / config.json "profiles" entry
+    :param profile: None means "default"
+    :param visited: names of config.json profiles being resolved, to detect "extends" going round in a cycle
+    :return: SessionProfile
+    """
+    if isinstance(profile, SessionProfile):
+        return profile
+    if isinstance(profile, dict):
+        profile = dict(profile)
+        return make_profile(profile.pop("name", "custom"), visited=visited, **profile)
+    name = profile or "default"
+    profiles = getattr(get_resource_config(), "profiles", None)
+    if profiles is not None and hasattr(profiles, name):
+        if name in visited:
+            raise Exception(f"Session profiles extend each other in a cycle: {' -> '.join(visited + (name,))} !!")
+        return make_profile(name, visited=visited, **vars(getattr(profiles, name)))
+    if name not in PROFILES:
+        raise Exception(f"{name} is not a known session profile, use one of {sorted(PROFILES)} !!")
+    return PROFILES[name]
+
+
+def make_profile(name, visited=(), **settings):
+    """
+    Create a profile, settings left out are taken from the profile named in "extends" (default profile otherwise)
+    :param name:
+    :param visited: names of profiles being resolved, see get_profile
+    :param settings:
+    :return: SessionProfile
+    """
+    extends = settings.pop("extends", "default")
+    if extends == name and name in PROFILES:
+        base = PROFILES[extends]
+    else:
+        base = get_profile(extends, visited=visited + (name,))
+    unknown = set(settings) - set(SessionProfile._fields)
+    if unknown:
+        raise Exception(f"Unknown settings {sorted(unknown)} in session profile {name} !!")
+    profile = base._replace(name=name, **settings)
+    if profile.page_load_strategy not in PAGE_LOAD_STRATEGIES:
+        raise Exception(f"Page load strategy of {name} should be one of {PAGE_LOAD_STRATEGIES} !!")
+    return profile._replace(block_urls=tuple(profile.block_urls or ()))
+
+
+def apply_profile(options, profile, browser):
+    """
+    Apply headless mode, page load strategy, disabled images, disk cache and user data dir of profile to options
+    Url blocklist can not be given as an option, it is applied on the started session (see block_urls)
+    :param options: ChromeOptions or FirefoxOptions
+    :param profile:
+    :param browser: chrome, firefox
+    :return: options
+    """
+    options.set_capability("pageLoadStrategy", profile.page_load_strategy)
+    if browser == "chrome":
+        if profile.headless:
+            options.headless = True
+            options.add_argument("--window-size=1920,1080")
+        if profile.disk_cache_dir:
+            options.add_argument(f"--disk-cache-dir={profile.disk_cache_dir}")
+        if profile.user_data_dir:
+            options.add_argument(f"--user-data-dir={profile.user_data_dir}")
+        if profile.disable_images:
+            prefs = options.experimental_options.setdefault("prefs", {})
+            prefs["profile.managed_default_content_settings.images"] = 2
+    elif browser == "firefox":
+        options.headless = profile.headless
+        if profile.disk_cache_dir:
+            options.set_preference("browser.cache.disk.parent_directory", profile.disk_cache_dir)
+        if profile.user_data_dir:
+            options.profile = profile.user_data_dir
+        if profile.disable_images:
+            options.set_preference("permissions.default.image", 2)
+    return options
+
+
+def block_urls(driver, patterns):
+    """
+    Block requests matching url patterns (* wildcard) for the whole session through chrome devtools protocol
+    Works for local and remote (grid) chrome sessions
+    :param driver: selenium driver
+    :param patterns:
+    :return:
+    """
+    commands = driver.command_executor._commands
+    commands.setdefault("executeCdpCommand", ("POST", "/session/$sessionId/goog/cdp/execute"))
+    driver.execute("executeCdpCommand", {"cmd": "Network.enable", "params": {}})
+    driver.execute("executeCdpCommand", {"cmd": "Network.setBlockedURLs", "params": {"urls": list(patterns)}})
@@ -0,0 +1,292 @@
+__author__ = "sarvesh.singh"
+
+import os
+import re
+import html
+import hashlib
+import mimetypes
+import threading
+from html.parser import HTMLParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+import requests
+from base.common import basic_logging
+
+REPLAY_PREFIX = "/__replay__"
+SNAPSHOTS_DIR = Path(__file__).parent.parent / "resources" / "snapshots"
+CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""")
+SCRIPT_TAG = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.I | re.S)
+
+
+def get_origin(url):
+    """
+    scheme://host[:port] of a url
+    :param url:
+    :return:
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class AssetCollector(HTMLParser):
+    """
+    Class to collect urls of static assets (stylesheets, icons, images, optionally scripts) referenced by a page
+    """
+
+    def __init__(self, keep_scripts=False):
+        super().__init__()
+        self.keep_scripts = keep_scripts
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link" and attrs.get("href") and set(str(attrs.get("rel", "")).lower().split()) & {
+                "stylesheet", "icon", "preload", "shortcut"}:
+            self.urls.append(attrs["href"])
+        elif tag in ("img", "source"):
+            if attrs.get("src"):
+                self.urls.append(attrs["src"])
+            for candidate in str(attrs.get("srcset") or "").split(","):
+                if candidate.strip():
+                    self.urls.append(candidate.strip().split()[0])
+        elif tag == "script" and self.keep_scripts and attrs.get("src"):
+            self.urls.append(attrs["src"])
+
+
+class PageRecorder:
+    """
+    Class to record pages visited by a flow (rendered DOM plus the static assets it needs) for offline replay
+    Layout: <snapshot dir>/manifest.json, pages/<sha1>.html, assets/<host>/<sha1><ext>
+    """
+
+    def __init__(self, snapshot_dir, keep_scripts=False, timeout=30):
+        """
+        Init Class
+        :param snapshot_dir:
+        :param keep_scripts: keep <script> tags, by default they are dropped so replay is static and deterministic
+        :param timeout: timeout of every asset download
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        self.keep_scripts = keep_scripts
+        self.timeout = timeout
+        self.logger = basic_logging(name="RECORDER", level="INFO")
+        self.session = requests.Session()
+        self.manifest = {"pages": {}, "assets": {}}
+        if (self.snapshot_dir / "manifest.json").is_file():
+            with open(self.snapshot_dir / "manifest.json", "r") as _fp:
+                self.manifest = json_load(_fp)
+        self._recorded = set()
+        self._lock = threading.Lock()
+
+    def capture(self, web_driver):
+        """
+        Capture the page currently open in browser, only the first capture of every url in this run is kept
+        :param web_driver: WebDriver
+        :return: True if page was captured
+        """
+        url = web_driver.driver.current_url
+        if not url.startswith("http") or url in self._recorded:
+            return False
+        self._recorded.add(url)
+        self.session.headers["User-Agent"] = web_driver.execute_script("return navigator.userAgent;")
+        self.save_page(url, web_driver.driver.page_source)
+        return True
+
+    def save_page(self, url, source):
+        """
+        Save page source of url with its assets pointed to the replay server
+        :param url:
+        :param source:
+        """
+        if not self.keep_scripts:
+            source = SCRIPT_TAG.sub("", source)
+        collector = AssetCollector(keep_scripts=self.keep_scripts)
+        collector.feed(source)
+        # Longest first so that a reference which is a prefix of another one does not break it
+        for reference in sorted(set(collector.urls), key=len, reverse=True):
+            local = self.save_asset(urljoin(url, reference))
+            if local:
+                for written in {reference, html.escape(reference, quote=False)}:
+                    source = source.replace(written, local)
+
+        # Absolute links to the recorded origin should stay on replay server
+        source = source.replace(f'"{get_origin(url)}/', '"/')
+        file_name = f"pages/{hashlib.sha1(url.encode()).hexdigest()}.html"
+        self._write(file_name, source.encode())
+        with self._lock:
+            self.manifest["pages"][url] = file_name
+            self._save_manifest()
+        self.logger.info(f"Recorded {url}")
+
+    def save_asset(self, url):
+        """
+        Download an asset once and return the replay path serving it, None when it could not be downloaded
+        :param url:
+        :return:
+        """
+        if not url.startswith("http"):
+            return None
+        with self._lock:
+            if url in self.manifest["assets"]:
+                return f"{REPLAY_PREFIX}/{self.manifest['assets'][url]}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as exp:
+            self.logger.info(f"Skipping asset {url}: {exp}")
+            return None
+
+        content = response.content
+        content_type = response.headers.get("Content-Type", "").split(";")[0]
+        extension = Path(urlsplit(url).path).suffix or mimetypes.guess_extension(content_type) or ""
+        if content_type == "text/css" or extension == ".css":
+            content = self._rewrite_css(url, content.decode(response.encoding or "utf-8", "replace")).encode()
+        file_name = f"assets/{urlsplit(url).hostname}/{hashlib.sha1(url.encode()).hexdigest()}{extension[:8]}"
+        self._write(file_name, content)
+        with self._lock:
+            self.manifest["assets"][url] = file_name
+        return f"{REPLAY_PREFIX}/{file_name}"
+
+    def _rewrite_css(self, url, css):
+        """
+        Save fonts/images referenced by a stylesheet and point them to replay server
+        :param url:
+        :param css:
+        :return:
+        """
+
+        def _replace(match):
+            if match.group(1).startswith("data:"):
+                return match.group(0)
+            local = self.save_asset(urljoin(url, match.group(1)))
+            return f"url({local})" if local else match.group(0)
+
+        return CSS_URL.sub(_replace, css)
+
+    def _write(self, file_name, content):
+        """
+        Write a file of snapshot
+        :param file_name:
+        :param content:
+        """
+        path = self.snapshot_dir / file_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as _fp:
+            _fp.write(content)
+
+    def _save_manifest(self):
+        """
+        Write manifest of snapshot
+        """
+        self._write("manifest.json", json_dumps(self.manifest, indent=2, sort_keys=True).encode())
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Class to serve recorded pages of one origin and all recorded assets
+    """
+
+    snapshot_dir = None
+    origin = None
+    pages = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith(REPLAY_PREFIX + "/"):
+            file_name = self.path[len(REPLAY_PREFIX) + 1:].split("?")[0]
+        else:
+            path = self.path.split("#")[0]
+            file_name = self.pages.get(self.origin + path) or self.pages.get(self.origin + path.split("?")[0])
+        path = (self.snapshot_dir / file_name).resolve() if file_name else None
+        if path is None or self.snapshot_dir.resolve() not in path.parents or not path.is_file():
+            self.send_error(404, f"{self.path} was not recorded")
+            return
+        with open(path, "rb") as _fp:
+            content = _fp.read()
+        content_type = "text/html" if path.suffix == ".html" else mimetypes.guess_type(str(path))[0]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Cache-Control", "max-age=3600")
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class ReplayServer:
+    """
+    Class to serve a recorded snapshot locally, one port per recorded origin so relative links keep working
+    """
+
+    def __init__(self, snapshot_dir, host="127.0.0.1"):
+        """
+        Init Class
+        :param snapshot_dir:
+        :param host:
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        manifest_file = self.snapshot_dir / "manifest.json"
+        if not manifest_file.is_file():
+            raise Exception(f"No recorded snapshot found in {self.snapshot_dir} !!")
+        with open(manifest_file, "r") as _fp:
+            self.pages = json_load(_fp)["pages"]
+        self.host = host
+        self.servers = {}
+
+    def start(self):
+        """
+        Start serving every recorded origin in background threads
+        :return:
+        """
+        pages = {}
+        for url, file_name in self.pages.items():
+            parts = urlsplit(url)
+            origin_pages = pages.setdefault(get_origin(url), {})
+            path = get_origin(url) + (parts.path or "/")
+            origin_pages[path + (f"?{parts.query}" if parts.query else "")] = file_name
+            # Same path with another query (tracking parameters, form submitted without JS) falls back to it
+            origin_pages.setdefault(path, file_name)
+        for origin, origin_pages in pages.items():
+            handler = type("BoundReplayHandler", (ReplayHandler,), {
+                "snapshot_dir": self.snapshot_dir, "origin": origin, "pages": origin_pages})
+            server = ThreadingHTTPServer((self.host, 0), handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"replay-{origin}", daemon=True).start()
+            self.servers[origin] = server
+        return self
+
+    def url_for(self, url):
+        """
+        Local replay url of a recorded url, url as it is when its origin was not recorded
+        :param url:
+        :return:
+        """
+        server = self.servers.get(get_origin(url))
+        if server is None:
+            return url
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}" + url[len(get_origin(url)):]
+
+    def stop(self):
+        """
+        Stop all servers
+        """
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        self.servers = {}
+
+
+def get_snapshot_dir(name):
+    """
+    Folder of a named snapshot under resources/snapshots, a path is returned as it is
+    :param name:
+    :return:
+    """
+    return Path(name) if os.sep in str(name) else SNAPSHOTS_DIR / name
@@ -0,0 +1,221 @@
+__author__ = "sarvesh.singh"
+
+import time
+import random
+import threading
+from collections import namedtuple
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+)
+from base import instrumentation
+from base.common import basic_logging, get_resource_config
+
+RetryConfig = namedtuple(
+    "RetryConfig", ["max_attempts", "base_delay", "max_delay", "test_budget", "test_time_budget"])
+RetryConfig.__new__.__defaults__ = (4, 0.05, 1.0, 50, 60.0)
+
+# Exception classes in order of precedence, anything else is fatal and never retried
+CLASSES = (
+    (StaleElementReferenceException, "stale"),
+    (ElementClickInterceptedException, "intercepted"),
+    (ElementNotInteractableException, "not_interactable"),
+    (NoSuchElementException, "not_found"),
+)
+
+# Classes retried by default, an element not found yet is waited for (WebDriver.wait_for_element) rather than retried
+RETRYABLE = ("stale", "intercepted", "not_interactable")
+
+_lock = threading.Lock()
+_budget = {"retries": 0, "lost": 0.0, "exhausted": False}
+
+
+def classify(exp):
+    """
+    Class of an exception raised by an action
+    :param exp:
+    :return: stale, intercepted, not_interactable, not_found or fatal
+    """
+    for exception, name in CLASSES:
+        if isinstance(exp, exception):
+            return name
+    return "fatal"
+
+
+def get_retry_config(config=None):
+    """
+    Resolve retry settings from a RetryConfig, a dict or "retries" section of config.json
+    :param config: None to use config.json (defaults when it has no such section)
+    :return: RetryConfig
+    """
+    if isinstance(config, RetryConfig):
+        return config
+    if config is None:
+        section = getattr(get_resource_config(), "retries", None)
+        config = vars(section) if section is not None else {}
+    unknown = set(config) - set(RetryConfig._fields)
+    if unknown:
+        raise Exception(f"Unknown retry settings {sorted(unknown)} !!")
+    return RetryConfig(**config)
+
+
+class RetryStats:
+    """
+    Class to count retries and time lost to them per locator and exception class
+    """
+
+    def __init__(self):
+        """
+        Init Class with no retries
+        """
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stats)
+
+    def record(self, locator, kind, lost):
+        """
+        Record one retry
+        :param locator:
+        :param kind: exception class
+        :param lost: seconds spent on failed attempt and backoff
+        """
+        with self._lock:
+            stats = self._stats.setdefault(locator, {"retries": 0, "lost_ms": 0.0, "classes": {}})
+            stats["retries"] += 1
+            stats["lost_ms"] = round(stats["lost_ms"] + lost * 1000, 3)
+            stats["classes"][kind] = stats["classes"].get(kind, 0) + 1
+
+    def summary(self):
+        """
+        Retries per locator, most time lost first
+        :return: {locator: {"retries": n, "lost_ms": n, "classes": {class: n}}}
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: -item[1]["lost_ms"])
+            return {locator: {**stats, "classes": dict(stats["classes"])} for locator, stats in items}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+_session_stats = RetryStats()
+_test_stats = RetryStats()
+
+
+def start_test():
+    """
+    Start counting retries of a new test, with a fresh retry budget
+    """
+    _test_stats.reset()
+    with _lock:
+        _budget.update({"retries": 0, "lost": 0.0, "exhausted": False})
+
+
+def get_session_stats():
+    return _session_stats
+
+
+def get_test_stats():
+    return _test_stats
+
+
+def format_table(summary, limit=15):
+    """
+    Plain text table of retries per locator
+    :param summary: RetryStats.summary()
+    :param limit: rows shown
+    :return:
+    """
+    lines = [f"{'locator':<60}{'retries':>8}{'lost ms':>12}  classes"]
+    for locator, stats in list(summary.items())[:limit]:
+        classes = ", ".join(f"{kind}={count}" for kind, count in stats["classes"].items())
+        lines.append(f"{str(locator)[:59]:<60}{stats['retries']:>8}{stats['lost_ms']:>12.1f}  {classes}")
+    return "\n".join(lines)
+
+
+class RetryPolicy:
+    """
+    Class to retry an action on transient exceptions only, with capped exponential backoff and full jitter, within
+    a retry budget per test so that a flaky page cannot make a test crawl
+    """
+
+    def __init__(self, config=None):
+        """
+        Init Class
+        :param config: RetryConfig, dict or None for "retries" section of config.json
+        """
+        self.config = get_retry_config(config)
+        self.logger = basic_logging(name="RETRY")
+
+    def delay(self, attempt):
+        """
+        Backoff before attempt number attempt + 1: random between 0 and base_delay * 2 ** (attempt - 1), capped
+        :param attempt: failed attempts so far
+        :return: seconds
+        """
+        return random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2 ** (attempt - 1)))
+
+    def _take_budget(self, lost):
+        """
+        Account a retry against the running test's budget
+        :param lost: seconds
+        :return: False when budget is spent
+        """
+        with _lock:
+            if _budget["retries"] >= self.config.test_budget or _budget["lost"] >= self.config.test_time_budget:
+                first, _budget["exhausted"] = not _budget["exhausted"], True
+            else:
+                _budget["retries"] += 1
+                _budget["lost"] += lost
+                return True
+        if first:
+            self.logger.warning(f"Retry budget of test spent ({self.config.test_budget} retries / "
+                                f"{self.config.test_time_budget} s), failing on next transient exception")
+        return False
+
+    def call(self, operation, locator=None, retry_on=RETRYABLE, timeout=None, on_retry=None):
+        """
+        Run operation, retrying it on exceptions of the given classes
+        :param operation: callable without arguments
+        :param locator: name retries are reported under
+        :param retry_on: exception classes retried (see classify)
+        :param timeout: seconds to keep retrying for instead of max_attempts
+        :param on_retry: callable taking class and exception, called before every retry (e.g. to drop a stale
+        handle)
+        :return: value returned by operation
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                return operation()
+            except Exception as exp:
+                kind = classify(exp)
+                attempt += 1
+                if kind not in retry_on:
+                    raise
+                delay = self.delay(attempt)
+                if deadline is None:
+                    if attempt >= self.config.max_attempts:
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise
+                    delay = min(delay, remaining)
+                if not self._take_budget(time.monotonic() - started + delay):
+                    raise
+                if on_retry is not None:
+                    on_retry(kind, exp)
+                instrumentation.sleep(delay, name="retry")
+                lost = time.monotonic() - started
+                _session_stats.record(str(locator), kind, lost)
+                _test_stats.record(str(locator), kind, lost)
+                self.logger.debug(f"Retrying {locator} after {kind} ({attempt}), waited {delay:.3f} s")
+
@@ -0,0 +1,147 @@
+__author__ = "sarvesh.singh"
+
+import os
+import time
+import signal
+from pathlib import Path
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+from selenium import webdriver as seleniumwebdriver
+from base.common import basic_logging
+
+
+class AttachedRemote(seleniumwebdriver.Remote):
+    """
+    Class to drive an already running browser session instead of starting a new one
+    """
+
+    def __init__(self, command_executor, session_id, capabilities=None, w3c=True, service_pid=None):
+        """
+        Init Class
+        :param command_executor: url of the driver server owning the session
+        :param session_id:
+        :param capabilities: capabilities returned when the session was created
+        :param w3c:
+        :param service_pid: pid of local driver server which was started for the session, stopped on quit
+        """
+        self._attach_to = (session_id, capabilities or {}, w3c)
+        self.service_pid = service_pid
+        super().__init__(command_executor=command_executor, desired_capabilities={})
+
+    def quit(self):
+        """
+        Quit the session and stop the local driver server left running for it
+        """
+        try:
+            super().quit()
+        finally:
+            if self.service_pid:
+                try:
+                    os.kill(self.service_pid, signal.SIGTERM)
+                except OSError:
+                    pass
+                self.service_pid = None
+
+    def start_session(self, capabilities, browser_profile=None):
+        """
+        Take over saved session, no new session command is sent
+        :param capabilities:
+        :param browser_profile:
+        """
+        self.session_id, self.capabilities, self.w3c = self._attach_to
+        self.command_executor.w3c = self.w3c
+
+
+class SessionStore:
+    """
+    Class to keep a browser session alive across pytest runs: session is saved to a state file instead of quit and
+    next WebDriver of same browser attaches to it after a liveness check
+    """
+
+    def __init__(self, state_file):
+        """
+        Init Class
+        :param state_file:
+        """
+        self.state_file = Path(state_file)
+        self.logger = basic_logging(name="SESSION_STORE", level="INFO")
+
+    def load(self):
+        """
+        Saved session state, None when there is none or it can not be read
+        :return:
+        """
+        try:
+            with open(self.state_file, "r") as _fp:
+                return json_load(_fp)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, driver, browser):
+        """
+        Save session of a selenium driver and detach from its local driver server so that both outlive this process
+        :param driver: selenium driver
+        :param browser:
+        """
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        service = getattr(driver, "service", None)
+        state = {
+            "browser": browser,
+            "executor_url": driver.command_executor._url,
+            "session_id": driver.session_id,
+            "capabilities": driver.capabilities,
+            "w3c": driver.w3c,
+            "service_pid": getattr(driver, "service_pid", None) or (
+                service.process.pid if service is not None and service.process is not None else None),
+            "saved": time.time(),
+        }
+        with open(self.state_file, "w") as _fp:
+            _fp.write(json_dumps(state, indent=2))
+
+        # Service stops chromedriver/geckodriver when it is garbage collected, forget the process to keep it running
+        if service is not None and service.process is not None:
+            service.process.stdin.close()
+            service.process = None
+        self.logger.info(f"Saved {browser} session {driver.session_id} to {self.state_file}")
+
+    def attach(self, browser):
+        """
+        Attach to saved session if it is of same browser and still alive, a dead or foreign session is dropped
+        :param browser:
+        :return: selenium driver or None
+        """
+        state = self.load()
+        if state is None:
+            return None
+        self.clear()
+        driver = None
+        try:
+            driver = AttachedRemote(command_executor=state["executor_url"], session_id=state["session_id"],
+                                    capabilities=state.get("capabilities"), w3c=state.get("w3c", True),
+                                    service_pid=state.get("service_pid"))
+            driver.current_window_handle
+        except Exception as exp:
+            self.logger.info(f"Saved session {state.get('session_id')} is not alive anymore: {exp}")
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            return None
+        if state.get("browser") != browser:
+            self.logger.info(f"Saved session is of {state.get('browser')}, quitting it for a {browser} session")
+            driver.quit()
+            return None
+        self.logger.info(f"Reattached to {browser} session {state['session_id']}")
+        return driver
+
+    def clear(self):
+        """
+        Remove saved state
+        """
+        try:
+            os.remove(self.state_file)
+        except OSError:
+            pass
@@ -0,0 +1,159 @@
+__author__ = "sarvesh.singh"
+
+import os
+import sys
+import heapq
+import argparse
+from statistics import median
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+
+DEFAULT_DURATION = 1.0
+
+
+class DurationHistory:
+    """
+    Class to keep a rolling history of test durations (setup + call + teardown seconds) by node id
+    """
+
+    def __init__(self, path, window=5):
+        """
+        Init Class loading existing history
+        :param path: json file of history
+        :param window: number of latest runs an estimate is made from
+        """
+        self.path = path
+        self.window = window
+        self.durations = {}
+        if os.path.isfile(path):
+            with open(path, "r") as _fp:
+                self.durations = json_load(_fp)
+
+    def add(self, node_id, seconds):
+        """
+        Add duration of a run of test, oldest runs beyond window are dropped
+        :param node_id:
+        :param seconds:
+        """
+        runs = self.durations.setdefault(node_id, [])
+        runs.append(round(seconds, 3))
+        del runs[:-self.window]
+
+    def update_from_report(self, report_file):
+        """
+        Add durations of tests which ran (skipped ones are ignored) in a pytest-json-report file
+        :param report_file:
+        :return: number of tests added
+        """
+        with open(report_file, "r") as _fp:
+            report = json_load(_fp)
+        added = 0
+        for test in report.get("tests", []):
+            if test.get("outcome") == "skipped":
+                continue
+            stages = [test.get(stage) or {} for stage in ("setup", "call", "teardown")]
+            self.add(test["nodeid"], sum(stage.get("duration", 0.0) for stage in stages))
+            added += 1
+        return added
+
+    def estimate(self, node_id, default=None):
+        """
+        Expected duration of a test, median of its recent runs
+        :param node_id:
+        :param default: used for a test never seen, median of all known tests when None
+        :return:
+        """
+        runs = self.durations.get(node_id)
+        if runs:
+            return median(runs)
+        if default is not None:
+            return default
+        known = [median(runs) for runs in self.durations.values() if runs]
+        return median(known) if known else DEFAULT_DURATION
+
+    def save(self):
+        """
+        Write history, through a temporary file so a concurrent reader never sees a partial file
+        """
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as _fp:
+            _fp.write(json_dumps(self.durations, indent=2, sort_keys=True))
+        os.replace(temp_file, self.path)
+
+
+def get_group(item):
+    """
+    Scheduling unit of a collected test, all tests of a class ordered with pytest-ordering's run(order=N) share one
+    :param item: pytest item
+    :return:
+    """
+    cls = getattr(item, "cls", None)
+    if cls is not None and item.get_closest_marker("run") is not None:
+        return item.nodeid.rsplit("::", 1)[0]
+    return item.nodeid
+
+
+def partition(groups, weights, shard_count):
+    """
+    Longest processing time first: heaviest group goes to the least loaded shard, ties broken by name
+    :param groups: [group name]
+    :param weights: {group name: seconds}
+    :param shard_count:
+    :return: ([set of groups of every shard], [load of every shard])
+    """
+    if int(shard_count) < 1:
+        raise Exception(f"Shard count should be at least 1, got {shard_count} !!")
+    shards = [set() for _ in range(int(shard_count))]
+    loads = [(0.0, index) for index in range(int(shard_count))]
+    for group in sorted(set(groups), key=lambda name: (-weights[name], name)):
+        load, index = heapq.heappop(loads)
+        shards[index].add(group)
+        heapq.heappush(loads, (load + weights[group], index))
+    return shards, [load for load, _ in sorted(loads, key=lambda entry: entry[1])]
+
+
+def select_shard(items, history, shard_id, shard_count):
+    """
+    Split collected items in balanced shards and return the ones of shard_id, keeping collection order
+    :param items: pytest items
+    :param history: DurationHistory
+    :param shard_id: 0 based
+    :param shard_count:
+    :return: (selected, deselected, estimated seconds of every shard)
+    """
+    if not 0 <= int(shard_id) < int(shard_count):
+        raise Exception(f"Shard id should be in 0..{int(shard_count) - 1}, got {shard_id} !!")
+    default = history.estimate(None)
+    weights = {}
+    for item in items:
+        group = get_group(item)
+        weights[group] = weights.get(group, 0.0) + history.estimate(item.nodeid, default=default)
+    shards, loads = partition(list(weights), weights, shard_count)
+    selected = [item for item in items if get_group(item) in shards[int(shard_id)]]
+    deselected = [item for item in items if get_group(item) not in shards[int(shard_id)]]
+    return selected, deselected, loads
+
+
+def main(argv=None):
+    """
+    Command line entry to merge reports of all nodes into history:
+    python -m base.sharding --history .test_durations.json report.json [report.json ...]
+    :param argv:
+    :return:
+    """
+    parser = argparse.ArgumentParser(description="Merge pytest json reports into test duration history")
+    parser.add_argument("reports", nargs="+")
+    parser.add_argument("--history", default=".test_durations.json")
+    parser.add_argument("--window", type=int, default=5)
+    args = parser.parse_args(argv)
+    history = DurationHistory(args.history, window=args.window)
+    for report in args.reports:
+        print(f"{report}: {history.update_from_report(report)} tests")
+    history.save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
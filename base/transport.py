@@ -0,0 +1,103 @@
+__author__ = "sarvesh.singh"
+
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import urllib3
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from base.common import get_resource_config
+
+TransportConfig = namedtuple(
+    "TransportConfig", ["pool_maxsize", "connect_timeout", "read_timeout", "connect_retries", "pipelining"])
+TransportConfig.__new__.__defaults__ = (16, 10.0, 300.0, 2, False)
+
+_pools = {}
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_transport(transport=None):
+    """
+    Resolve transport settings from a TransportConfig, a dict or "transport" section of config.json
+    :param transport: None to use config.json (defaults when it has no such section)
+    :return: TransportConfig
+    """
+    if isinstance(transport, TransportConfig):
+        return transport
+    if transport is None:
+        section = getattr(get_resource_config(), "transport", None)
+        transport = vars(section) if section is not None else {}
+    unknown = set(transport) - set(TransportConfig._fields)
+    if unknown:
+        raise Exception(f"Unknown transport settings {sorted(unknown)} !!")
+    return TransportConfig(**transport)
+
+
+def get_pool_manager(transport):
+    """
+    Process wide keep-alive connection pool of given settings, shared by all sessions using them
+    Only failed connects are retried, a command which reached the server is never sent twice
+    :param transport: TransportConfig
+    :return: urllib3.PoolManager
+    """
+    with _lock:
+        if transport not in _pools:
+            _pools[transport] = urllib3.PoolManager(
+                num_pools=8,
+                maxsize=transport.pool_maxsize,
+                block=True,
+                timeout=urllib3.Timeout(connect=transport.connect_timeout, read=transport.read_timeout),
+                retries=urllib3.Retry(total=transport.connect_retries, connect=transport.connect_retries, read=0,
+                                      redirect=0, status=0, raise_on_redirect=False),
+            )
+        return _pools[transport]
+
+
+def get_executor(transport):
+    """
+    Thread pool sending independent commands concurrently, sized like the connection pool
+    :param transport: TransportConfig
+    :return:
+    """
+    with _lock:
+        if transport not in _executors:
+            _executors[transport] = ThreadPoolExecutor(max_workers=transport.pool_maxsize,
+                                                       thread_name_prefix="webdriver-pipeline")
+        return _executors[transport]
+
+
+def get_transport_stats():
+    """
+    Connections opened and requests sent per server by all shared pools, fewer connections per request is better
+    :return: {host:port: {"connections": n, "requests": n}}
+    """
+    stats = {}
+    with _lock:
+        pools = list(_pools.values())
+    for manager in pools:
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            server = stats.setdefault(f"{pool.host}:{pool.port}", {"connections": 0, "requests": 0})
+            server["connections"] += pool.num_connections
+            server["requests"] += pool.num_requests
+    return stats
+
+
+class PooledRemoteConnection(RemoteConnection):
+    """
+    Class for selenium's command executor sending commands over a shared keep-alive connection pool, selenium's
+    default for remote sessions opens a new connection for every command
+    """
+
+    def __init__(self, remote_server_addr, transport=None, resolve_ip=False):
+        """
+        Init Class
+        :param remote_server_addr: http://host:port/wd/hub
+        :param transport: TransportConfig
+        :param resolve_ip: resolve host to ip once (off by default so grids behind DNS / load balancers keep working)
+        """
+        super().__init__(remote_server_addr, keep_alive=True, resolve_ip=resolve_ip)
+        self.transport = get_transport(transport)
+        self._conn = get_pool_manager(self.transport)
@@ -0,0 +1,190 @@
+__author__ = "sarvesh.singh"
+
+import time
+from base import instrumentation
+from selenium.common.exceptions import (
+    TimeoutException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+)
+
+# Exceptions which only mean "not yet", the condition is polled again when one of these is raised
+TRANSIENT_EXCEPTIONS = (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+)
+
+
+class WaitPolicy:
+    """
+    Class to poll a condition till it holds, starting with a short interval which backs off up to max_poll
+    """
+
+    def __init__(self, timeout=30, poll=0.05, max_poll=1.0, backoff=1.5):
+        """
+        Init Class with the timeout budget and polling behaviour
+        :param timeout: seconds after which waiting is given up
+        :param poll: first polling interval in seconds
+        :param max_poll: upper cap of polling interval in seconds
+        :param backoff: factor by which polling interval grows after every failed poll
+        """
+        self.timeout = timeout
+        self.poll = poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+
+    def budget(self, timeout=None):
+        """
+        Get the same policy with a different timeout budget for a single call
+        :param timeout: None to keep the current timeout
+        :return:
+        """
+        if timeout is None:
+            return self
+        return WaitPolicy(timeout=timeout, poll=self.poll, max_poll=self.max_poll, backoff=self.backoff)
+
+    def intervals(self):
+        """
+        Generator of sleep intervals, each one capped so that total sleep never exceeds the timeout
+        :return:
+        """
+        deadline = time.monotonic() + self.timeout
+        interval = self.poll
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            yield min(interval, remaining)
+            interval = min(interval * self.backoff, self.max_poll)
+
+    def until(self, condition, driver=None, message="", ignored_exceptions=TRANSIENT_EXCEPTIONS):
+        """
+        Poll condition till it returns a truthy value and return that value
+        :param condition: callable taking driver and returning a truthy value once condition holds
+        :param driver: selenium driver passed to condition
+        :param message: message of TimeoutException when condition never holds
+        :param ignored_exceptions: exceptions treated as condition not holding yet
+        :return:
+        """
+        last_exp = None
+        intervals = self.intervals()
+        while True:
+            try:
+                value = condition(driver)
+                if value:
+                    return value
+            except ignored_exceptions as exp:
+                last_exp = exp
+            interval = next(intervals, None)
+            if interval is None:
+                break
+            instrumentation.sleep(interval, name="wait_policy")
+        raise TimeoutException(message or f"Condition not met within {self.timeout} seconds", None,
+                               getattr(last_exp, "stacktrace", None))
+
+    def holds(self, condition, driver=None, ignored_exceptions=TRANSIENT_EXCEPTIONS):
+        """
+        Same as until but returns False instead of raising when condition never holds
+        :param condition:
+        :param driver:
+        :param ignored_exceptions:
+        :return:
+        """
+        try:
+            return self.until(condition, driver=driver, ignored_exceptions=ignored_exceptions)
+        except TimeoutException:
+            return False
+
+
+def document_ready(driver):
+    """
+    Readiness predicate: document has finished loading
+    :param driver:
+    :return:
+    """
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def dom_ready(driver):
+    """
+    Readiness predicate: document is parsed, sub resources (images, frames) may still be loading
+    :param driver:
+    :return:
+    """
+    return driver.execute_script("return document.readyState") != "loading"
+
+
+def network_idle(idle_time=0.5):
+    """
+    Readiness predicate: document is loaded and no new resource was fetched for idle_time seconds
+    :param idle_time:
+    :return:
+    """
+    state = {"count": None, "since": None}
+
+    def _predicate(driver):
+        ready, count = driver.execute_script(
+            "return [document.readyState, performance.getEntriesByType('resource').length];")
+        now = time.monotonic()
+        if ready != "complete" or count != state["count"]:
+            state["count"], state["since"] = count, now
+            return False
+        return now - state["since"] >= idle_time
+
+    return _predicate
+
+
+def element_visible(locator):
+    """
+    Predicate: element is present and displayed, returns the element
+    :param locator: (By, value) tuple
+    :return:
+    """
+
+    def _predicate(driver):
+        element = driver.find_element(*locator)
+        return element if element.is_displayed() else False
+
+    return _predicate
+
+
+def element_invisible(locator):
+    """
+    Predicate: element is either absent or not displayed
+    :param locator: (By, value) tuple
+    :return:
+    """
+
+    def _predicate(driver):
+        try:
+            return not any(element.is_displayed() for element in driver.find_elements(*locator))
+        except StaleElementReferenceException:
+            return True
+
+    return _predicate
+
+
+def element_stable(locator, clickable=False):
+    """
+    Predicate: element is displayed and its position and size did not change since previous poll (scrolling or
+    animation has settled), returns the element
+    :param locator: (By, value) tuple
+    :param clickable: also require element to be enabled
+    :return:
+    """
+    state = {"rect": None}
+
+    def _predicate(driver):
+        element = driver.find_element(*locator)
+        rect = driver.execute_script(
+            "var r = arguments[0].getBoundingClientRect(); return [r.x, r.y, r.width, r.height];", element)
+        stable = rect == state["rect"] and element.is_displayed() and (not clickable or element.is_enabled())
+        state["rect"] = rect
+        return element if stable else False
+
+    return _predicate
+
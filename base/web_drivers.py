@@ -2,96 +2,258 @@ __author__ = 'sarvesh.singh'
 
 import distro
 from selenium import webdriver as seleniumwebdriver
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.select import Select
-from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import StaleElementReferenceException
 from appium.webdriver.common.touch_action import TouchAction
-from selenium.webdriver.common.by import By
 from appium import webdriver
-import pathlib
 from base.common import (
-    run_cmd,
-    get_adb_device,
+    parse_adb_devices,
     basic_logging,
 )
-import zipfile
+from base.driver_cache import DriverResolver
+from base.locators import Locator, to_by, get_by_strategy, get_script_locator
+from base.element_cache import ElementCache
+from base.attachments import get_attachment_pipeline
+from base.instrumentation import instrument_class, instrument_driver
+from base import instrumentation
+from base.profiles import get_profile, apply_profile, block_urls
+from base.session_store import SessionStore
+from base.transport import PooledRemoteConnection, get_transport, get_executor
+from base.download_watcher import DownloadWatcher
+from base.dom_snapshot import DomSnapshot
+from base.retries import RetryPolicy, RETRYABLE
+from base.device_farm import get_android_env
+from base.processes import (
+    get_process_manager,
+    start_appium,
+    wait_for_appium,
+    stop_appium as stop_appium_server,
+)
+from base.downloads import CHUNK_SIZE, select_remote_file, stream_local, stream_remote, REMOVE_INPUT_SCRIPT
+from base.waits import (
+    WaitPolicy,
+    document_ready,
+    dom_ready,
+    element_visible,
+    element_invisible,
+    element_stable,
+    network_idle,
+)
+from contextlib import contextmanager
+from collections import deque
 import os
-import re
 import time
-import requests
+import contextvars
 from pathlib import Path
-import base64
-import allure
-
 
+ANDROID_APP_CAPABILITIES = {
+    'appPackage': 'com.flipkart',
+    'appActivity': '.MainActivity',
+    'INSTALL_GRANT_RUNTIME_PERMISSIONS': True,
+    'newCommandTimeout': 300,
+    'app': str(Path(__file__).parent.parent / "resources/com.flipkart.android.apk"),
+}
+
+# Locating rows and reading their fields in page, shared by bulk extraction and harvesting
+ROW_FUNCTIONS = """
+function findAll(locator, context) {
+    if (locator[0] === 'xpath') {
+        var result = document.evaluate(locator[1], context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+        return nodes;
+    }
+    return Array.prototype.slice.call(context.querySelectorAll(locator[1]));
+}
+function findOne(locator, context) {
+    if (locator[1] === '.') return context;
+    if (locator[0] === 'xpath') {
+        return document.evaluate(locator[1], context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+            .singleNodeValue;
+    }
+    return context.querySelector(locator[1]);
+}
+function read(node, attribute) {
+    if (!node) return null;
+    if (attribute === 'text') return (node.innerText || node.textContent || '').trim();
+    var value = node.getAttribute(attribute);
+    return value === null && attribute in node ? node[attribute] : value;
+}
+function readRecord(row, fields) {
+    var record = {};
+    fields.forEach(function (field) { record[field[0]] = read(findOne(field[1], row), field[2]); });
+    return record;
+}
+"""
+
+# Reads fields of every row matched by arguments[0] in a single round trip, see WebDriver.extract_records
+BULK_EXTRACT_SCRIPT = ROW_FUNCTIONS + """
+var rowLocator = arguments[0], fields = arguments[1];
+return findAll(rowLocator, document).map(function (row) { return readRecord(row, fields); });
+"""
+
+# Installs an in-page collector buffering rows as they are rendered (deduplicated on a field or the whole record),
+# returns its id, see WebDriver.harvest
+# Row nodes already read are skipped, so fields are read once per row and not once per row per batch; a read row is
+# read again only when a mutation happened inside it (filled in late, or recycled by a virtualised list)
+HARVEST_INSTALL_SCRIPT = ROW_FUNCTIONS + """
+var rowLocator = arguments[0], fields = arguments[1], keyField = arguments[2];
+var harvests = window.__pomHarvest = window.__pomHarvest || {next: 0};
+var id = 'harvest-' + (harvests.next++);
+var state = {buffer: [], seen: new Set(), read: new WeakSet(), waiter: null, scheduled: false};
+function scan() {
+    state.scheduled = false;
+    findAll(rowLocator, document).forEach(function (row) {
+        if (state.read.has(row)) return;
+        var record = readRecord(row, fields);
+        if (fields.every(function (field) { return record[field[0]] === null; })) return;
+        state.read.add(row);
+        var key = keyField ? String(record[keyField]) : JSON.stringify(record);
+        if (state.seen.has(key)) return;
+        state.seen.add(key);
+        state.buffer.push(record);
+    });
+    if (state.buffer.length && state.waiter) state.waiter();
+}
+state.observer = new MutationObserver(function (mutations) {
+    mutations.forEach(function (mutation) {
+        for (var node = mutation.target; node; node = node.parentNode) {
+            if (state.read.has(node)) { state.read.delete(node); break; }
+        }
+    });
+    if (!state.scheduled) { state.scheduled = true; setTimeout(scan, 50); }
+});
+state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+scan();
+harvests[id] = state;
+return id;
+"""
+
+# Returns up to arguments[1] buffered rows; when none are buffered scrolls to bottom and waits up to arguments[2] ms
+# for new rows, end is true when nothing new came and page did not grow
+HARVEST_NEXT_SCRIPT = """
+var state = (window.__pomHarvest || {})[arguments[0]], size = arguments[1], waitMs = arguments[2];
+var callback = arguments[arguments.length - 1];
+if (!state) { callback(null); return; }
+function drain(end) { state.waiter = null; callback({items: state.buffer.splice(0, size), end: end}); }
+if (state.buffer.length) { drain(false); return; }
+var height = document.documentElement.scrollHeight;
+window.scrollTo(0, height);
+var timer = setTimeout(function () {
+    drain(!state.buffer.length && document.documentElement.scrollHeight === height);
+}, waitMs);
+state.waiter = function () { clearTimeout(timer); drain(false); };
+"""
+
+HARVEST_STOP_SCRIPT = """
+var harvests = window.__pomHarvest || {}, state = harvests[arguments[0]];
+if (state) { state.observer.disconnect(); delete harvests[arguments[0]]; }
+"""
+
+
+@instrument_class
 class WebDriver:
     """
     Class to connect any sort of web drivers and common methods of web driver to automate the mobile and web UI
     """
 
-    def __init__(self, browser, remote=None, port='4444'):
+    def __init__(self, browser, remote=None, port='4444', download_path=None, screenshot_path=None,
+                 wait_policy=None, cache_elements=False, recorder=None, profile=None, reuse_session=None,
+                 transport=None, device=None, retry_policy=None):
         """
         Init Class to initialise Web Driver depending upon browser given
         @sarvesh: Grid is on 192.168.9.111
         param browser: chrome, firefox, android, ios
         :param remote:
         :param port:
+        :param download_path: folder where browser saves downloads, isolated per worker when pooled
+        :param screenshot_path: folder where screenshots are saved, isolated per worker when pooled
+        :param wait_policy: WaitPolicy used by all the waits of this driver
+        :param cache_elements: reuse found element handles till navigation / DOM change / staleness
+        :param recorder: PageRecorder capturing visited pages for offline replay
+        :param profile: session profile (name, dict or SessionProfile) setting headless mode, page load strategy,
+        url blocklist, disabled images and disk cache dir, see base/profiles.py
+        :param reuse_session: state file, when given quit() keeps the session alive for next run which reattaches
+        (chrome and firefox only)
+        :param transport: connection pool settings of remote sessions (dict or TransportConfig), see base/transport.py
+        :param device: AndroidDevice of a DeviceFarm whose Appium server is running, see base/device_farm.py
+        :param retry_policy: RetryPolicy of actions, default from "retries" section of config.json
         """
         self.browser = str(browser).lower()
         self.osName = distro.name().lower()
         self.logger = basic_logging(name="DRIVER", level='DEBUG')
-        download_path = os.getcwd() + '/downloaded_files/'
-
-        if remote is None:
+        if download_path is None:
+            download_path = os.getcwd() + '/downloaded_files/'
+        self.download_path = download_path
+        self.remote = remote
+        self.started_at = time.time()
+        self._download_watchers = {}
+        if screenshot_path is None:
+            screenshot_path = f"{os.getcwd()}/screenshots"
+        self.screenshot_path = screenshot_path
+        self.wait_policy = wait_policy or WaitPolicy()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.implicit_wait = 0
+        self.element_cache = ElementCache() if cache_elements else None
+        self.dom_snapshot = None
+        self.use_snapshot = False
+        self.recorder = recorder
+        self.profile = get_profile(profile)
+        self.transport = get_transport(transport)
+        self.session_store = None
+        if reuse_session and self.browser in ('chrome', 'firefox'):
+            self.session_store = SessionStore(reuse_session)
+        self.driver = self.session_store.attach(self.browser) if self.session_store else None
+
+        if self.driver is not None:
+            self.set_implicit_wait(10)
+        elif remote is None:
             if self.browser == 'chrome':
                 self.logger.debug(f"Local Chrome Driver")
                 options = seleniumwebdriver.ChromeOptions()
                 options.add_argument("--no-sandbox")
                 options.add_argument("--privileged")
                 options.add_experimental_option('prefs', {'download.default_directory': download_path})
+                apply_profile(options, self.profile, self.browser)
                 self.driver = seleniumwebdriver.Chrome(
                     executable_path=self._get_latest_driver(),
                     desired_capabilities=options.to_capabilities(),
                     chrome_options=options
                 )
-                self.driver.implicitly_wait(time_to_wait=10)
+                self.set_implicit_wait(10)
                 self.driver.maximize_window()
             elif self.browser == 'firefox':
                 self.logger.debug(f"Local Firefox Driver")
                 options = seleniumwebdriver.FirefoxOptions()
                 options.add_argument("--no-sandbox")
                 options.add_argument("--privileged")
+                apply_profile(options, self.profile, self.browser)
                 self.driver = seleniumwebdriver.Firefox(
                     executable_path=self._get_latest_driver(),
                     desired_capabilities=options.to_capabilities()
                 )
-                self.driver.implicitly_wait(time_to_wait=10)
+                self.set_implicit_wait(10)
                 self.driver.maximize_window()
+            elif self.browser == 'android' and device is not None:
+                self.logger.debug(f"Local Android Appium Driver on {device.serial} ({device.appium_url})")
+                self.driver = webdriver.Remote(device.appium_url, device.capabilities(**ANDROID_APP_CAPABILITIES))
             elif self.browser == 'android':
                 self.logger.debug(f"Local Android Appium Driver")
-                os_path = os.environ.get('PATH', None)
-                os_path = list(set(os_path.split(":")))
-                user = str(run_cmd("whoami").output).strip()
-                os_path.append(f"/Users/{user}/Library/Android/sdk/tools")
-                os_path.append(f"/Users/{user}/Library/Android/sdk/platform-tools")
-                os.environ['PATH'] = ":".join(os_path)
-                os.environ['ANDROID_HOME'] = f"/Users/{user}/Library/Android/sdk"
-                os.environ['JAVA_HOME'] = str(run_cmd("/usr/libexec/java_home").output).strip()
-                apk_path = str(Path(__file__).parent.parent / "resources/com.flipkart.android.apk")
-                # device_version = str(run_cmd('adb shell getprop ro.build.version.release').output).strip()
-                run_cmd("appium --chromedriver-executable /usr/local/bin/chromedriver", wait=False)
-                self.wait_for(10)
+                os.environ.update(get_android_env())
+                # device queries run while appium boots, appium is used once its /status answers
+                appium = start_appium(chromedriver="/usr/local/bin/chromedriver", wait=False)
+                setup = get_process_manager().run_many({
+                    "version": ["adb", "shell", "getprop", "ro.build.version.release"],
+                    "devices": ["adb", "devices"],
+                })
+                wait_for_appium(appium)
                 desired_caps = {
                     'platformName': 'Android',
-                    'platformVersion': str(run_cmd('adb shell getprop ro.build.version.release').output).strip(),
-                    'deviceName': get_adb_device()[0],
-                    'appPackage': 'com.flipkart',
-                    'appActivity': '.MainActivity',
-                    'INSTALL_GRANT_RUNTIME_PERMISSIONS': True,
-                    'newCommandTimeout': 300,
-                    'app': apk_path
+                    'platformVersion': setup["version"].output.strip(),
+                    'deviceName': parse_adb_devices(setup["devices"].output)[0],
+                    **ANDROID_APP_CAPABILITIES,
                 }
                 self.driver = webdriver.Remote('http://localhost:4723/wd/hub', desired_caps)
             elif self.browser == 'ios':
@@ -103,25 +265,28 @@ class WebDriver:
             self.remote_server = f"http://{remote}:{port}/wd/hub"
             if self.browser == 'chrome':
                 self.logger.debug(f"Remote Chrome Driver")
-                capabilities = {
-                    'browserName': 'chrome', 'version': '', 'platform': 'ANY', 'acceptInsecureCerts': True,
-                    'timeouts': {'implicit': 60}, 'prefs': {'download.default_directory': download_path},
-                    'goog:chromeOptions': {'extensions': [], 'args': ['--no-sandbox', '--privileged']}
-                }
+                options = seleniumwebdriver.ChromeOptions()
+                options.add_argument("--no-sandbox")
+                options.add_argument("--privileged")
+                options.add_experimental_option('prefs', {'download.default_directory': download_path})
+                options.set_capability('acceptInsecureCerts', True)
+                options.set_capability('timeouts', {'implicit': 60})
+                apply_profile(options, self.profile, self.browser)
                 self.driver = seleniumwebdriver.Remote(
-                    command_executor=self.remote_server,
-                    desired_capabilities=capabilities,
+                    command_executor=PooledRemoteConnection(self.remote_server, transport=self.transport),
+                    desired_capabilities=options.to_capabilities(),
                 )
-                self.driver.implicitly_wait(time_to_wait=10)
+                self.set_implicit_wait(10)
                 self.driver.maximize_window()
             elif self.browser == 'firefox':
                 self.logger.debug(f"Remote Firefox Driver")
                 options = seleniumwebdriver.FirefoxOptions()
+                apply_profile(options, self.profile, self.browser)
                 self.driver = seleniumwebdriver.Remote(
-                    command_executor=self.remote_server,
+                    command_executor=PooledRemoteConnection(self.remote_server, transport=self.transport),
                     desired_capabilities=options.to_capabilities(),
                 )
-                self.driver.implicitly_wait(time_to_wait=60)
+                self.set_implicit_wait(60)
                 self.driver.maximize_window()
             elif self.browser == 'android':
                 self.logger.debug(f"Remote Android Appium Driver")
@@ -131,110 +296,152 @@ class WebDriver:
                 self.logger.error(f'{self.browser} is a non-supported web-driver !!')
                 raise Exception(f'{self.browser} is a non-supported web-driver !!')
 
+        if getattr(self, 'driver', None) is not None:
+            instrument_driver(self.driver)
+            if self.profile.block_urls:
+                if self.browser == 'chrome':
+                    block_urls(self.driver, self.profile.block_urls)
+                else:
+                    self.logger.warning(f"Url blocklist of profile {self.profile.name} is supported on chrome only")
+
     def _get_latest_driver(self):
         """
-        Get Chrome's latest version from Google's Api
+        Get path of latest driver binary for browser, served from local cache and refreshed once the TTL expires
+        Set WEBDRIVER_OFFLINE=1 (and optionally WEBDRIVER_MIRROR) to resolve without any network call
         :return:
         """
-        if self.browser == 'chrome':
-            if 'darwin' in self.osName:
-                driver_location = Path(__file__).parent / f"web_drivers/darwin/chromedriver"
-            elif 'linux' in self.osName:
-                driver_location = Path(__file__).parent / f"web_drivers/linux/chromedriver"
-            else:
-                raise Exception(f"{self.osName} is not supported !!")
+        return DriverResolver(os_name=self.osName).resolve(self.browser)
 
-            down_version = re.search(r'ChromeDriver (.*?) ', run_cmd(f'{str(driver_location)} --version').output,
-                                     re.I | re.M).group(1)
-
-            # Get Download Link for Driver
-            url = 'https://chromedriver.storage.googleapis.com/LATEST_RELEASE'
-            current_version = requests.get(url=url).content.decode()
-            if current_version == down_version:
-                return str(driver_location)
+    def is_alive(self):
+        """
+        Health check to know whether the browser session is still usable
+        :return:
+        """
+        try:
+            self.driver.current_window_handle
+            return True
+        except Exception:
+            return False
 
-            if 'darwin' == self.osName:
-                url = f"https://chromedriver.storage.googleapis.com/{current_version}/chromedriver_mac64.zip"
-            elif 'linux' in self.osName:
-                url = f"https://chromedriver.storage.googleapis.com/{current_version}/chromedriver_linux64.zip"
-            else:
-                raise Exception(f"{self.osName} is not supported !!")
-
-            response = requests.get(url=url, stream=True)
-            response.raise_for_status()
-            zip_location = Path(__file__).parent / "chromedriver.zip"
-            with open(zip_location, 'wb') as handle:
-                for block in response.iter_content(1024):
-                    handle.write(block)
-
-            with zipfile.ZipFile(zip_location, 'r') as zip_ref:
-                zip_ref.extractall(os.path.dirname(driver_location))
-            os.remove(zip_location)
-            return str(driver_location)
-
-        elif self.browser == 'firefox':
-            if 'darwin' in self.osName:
-                driver_location = Path(__file__).parent / f"web_drivers/darwin/geckodriver"
-            elif 'linux' in self.osName:
-                driver_location = Path(__file__).parent / f"web_drivers/linux/geckodriver"
-            else:
-                raise Exception(f"{self.osName} is not supported !!")
+    def quit(self):
+        """
+        This function is used to end the browser session and close all its windows
+        When sessions are reused the session is saved for next run instead
+        """
+        for watcher in self._download_watchers.values():
+            watcher.stop()
+        self._download_watchers = {}
+        if self.session_store is not None and self.is_alive():
+            self.session_store.save(self.driver, self.browser)
+            return
+        self.driver.quit()
 
-            down_version = re.search(r'geckodriver (.*?) ', run_cmd(f'{str(driver_location)} --version').output,
-                                     re.I | re.M).group(1)
+    def set_implicit_wait(self, seconds):
+        """
+        Set implicit wait of the session and remember it so that it can be restored
+        :param seconds:
+        """
+        self.driver.implicitly_wait(time_to_wait=seconds)
+        self.implicit_wait = seconds
 
-            url = 'https://api.github.com/repos/mozilla/geckodriver/tags'
-            response = requests.get(url=url).json()
-            if f"v{down_version}" == response[0]['name']:
-                return str(driver_location)
+    @contextmanager
+    def no_implicit_wait(self):
+        """
+        Context manager to switch off implicit wait while polling, so an absent element is reported immediately
+        """
+        if not self.implicit_wait:
+            yield
+            return
+        self.driver.implicitly_wait(time_to_wait=0)
+        try:
+            yield
+        finally:
+            self.driver.implicitly_wait(time_to_wait=self.implicit_wait)
+
+    def wait_until(self, condition, timeout=None, message=""):
+        """
+        Wait till condition holds as per wait policy of the driver and return condition's value
+        Conditions finding elements are to be waited for under no_implicit_wait, else every poll of an absent element
+        blocks for the implicit wait and timeout is overrun
+        :param condition: callable taking selenium driver, see base.waits
+        :param timeout: timeout budget of this call, defaults to the policy's timeout
+        :param message:
+        :return:
+        """
+        return self.wait_policy.budget(timeout).until(condition, driver=self.driver, message=message)
 
-            url = response[0]['zipball_url']
-            response = requests.get(url=url, stream=True)
-            response.raise_for_status()
-            zip_location = Path(__file__).parent / "geckodriver.zip"
-            with open(zip_location, 'wb') as handle:
-                for block in response.iter_content(1024):
-                    handle.write(block)
+    def wait_for_page_ready(self, timeout=None):
+        """
+        Wait till document of current page has finished loading, only till DOM is parsed with eager/none profiles
+        :param timeout:
+        """
+        ready = document_ready if self.profile.page_load_strategy == "normal" else dom_ready
+        self.wait_until(ready, timeout=timeout, message="Page did not finish loading")
 
-            with zipfile.ZipFile(zip_location, 'r') as zip_ref:
-                zip_ref.extractall(os.path.dirname(driver_location))
-            os.remove(zip_location)
-            return str(driver_location)
+    def wait_for_network_idle(self, idle_time=0.5, timeout=None):
+        """
+        Wait till page has finished loading and fetched no new resource for idle_time seconds, e.g. before capturing
+        a page whose scripts keep loading content after the load event
+        :param idle_time:
+        :param timeout:
+        """
+        self.wait_until(network_idle(idle_time), timeout=timeout, message="Network did not become idle")
 
-        else:
-            # TODO: add support to download FireFox Driver here
-            raise Exception(f"self.browser is not supported Yet !!")
+    def invalidate_element_cache(self):
+        """
+        Forget all cached element handles and the DOM snapshot, called on every navigation and window/frame switch
+        """
+        self.dom_snapshot = None
+        if self.element_cache is not None:
+            self.element_cache.invalidate()
 
-    def open_website(self, url):
+    def open_website(self, url, timeout=None):
         """
         This function is used to open the website in browser
         :param url:
+        :param timeout:
         """
+        self.invalidate_element_cache()
         self.driver.get(url)
-        self.wait_for(seconds=5)
+        self.wait_for_page_ready(timeout=timeout)
+        self.record_page()
+
+    def record_page(self):
+        """
+        Capture the page open in browser with its assets when pages are being recorded
+        :return: True if page was captured
+        """
+        if self.recorder is None:
+            return False
+        self.wait_for_network_idle()
+        return self.recorder.capture(self)
 
     def navigate_back(self):
         """
         Navigate back in browser
         """
+        self.invalidate_element_cache()
         self.driver.back()
 
     def navigate_forward(self):
         """
         Navigate back in browser
         """
+        self.invalidate_element_cache()
         self.driver.forward()
 
     def page_refresh(self):
         """
         Navigate back in browser
         """
+        self.invalidate_element_cache()
         self.driver.refresh()
 
     def close_window(self):
         """
         This function is used to close the current active window of browser
         """
+        self.invalidate_element_cache()
         self.driver.close()
 
     def get_title(self):
@@ -243,60 +450,186 @@ class WebDriver:
         """
         return self.driver.title
 
-    def get_web_element(self, element, locator_type):
+    def get_web_element(self, element, locator_type=None):
         """
         This function is used to return the element
-        :param element:
-        :param locator_type:
+        :param element: Locator or locator value
+        :param locator_type: type of locator value, not needed for a Locator
         :return:
         """
-        if locator_type == 'id':
-            web_element = self.driver.find_element_by_id(element)
-        elif locator_type == 'name':
-            web_element = self.driver.find_element_by_name(element)
-        elif locator_type == 'xpath':
-            web_element = self.driver.find_element_by_xpath(element)
-        elif locator_type == 'class':
-            web_element = self.driver.find_element_by_class_name(element)
-        elif locator_type == 'tag':
-            web_element = self.driver.find_element_by_tag_name(element)
-        elif locator_type == 'css':
-            web_element = self.driver.find_element_by_css_selector(element)
-        elif locator_type == 'link':
-            web_element = self.driver.find_element_by_link_text(element)
-        elif locator_type == 'partial_link':
-            web_element = self.driver.find_element_by_partial_link_text(element)
-        else:
-            raise Exception(f'Provided locator type {locator_type} is not supported !!')
+        by = to_by(element, locator_type)
+        if self.element_cache is None:
+            return self.driver.find_element(*by)
+        web_element = self.element_cache.get(by)
+        if web_element is None:
+            web_element = self.driver.find_element(*by)
+            self.element_cache.put(by, web_element)
+        return web_element
 
+    def wait_for_element(self, element, locator_type=None, timeout=None):
+        """
+        Wait till element is present, polled as per wait policy without implicit wait so timeout is kept; waiting is
+        not a retry and never charged to the retry budget
+        :param element:
+        :param locator_type:
+        :param timeout: default timeout of wait policy
+        :return: web element, also cached when elements are cached
+        """
+        by = to_by(element, locator_type)
+        with self.no_implicit_wait():
+            web_element = self.wait_until(lambda driver: driver.find_element(*by), timeout=timeout,
+                                          message=f"{element} is not present")
+        if self.element_cache is not None:
+            self.element_cache.put(by, web_element)
         return web_element
 
-    def get_elements(self, element, locator_type):
+    def on_element(self, element, locator_type, action, retry_on=RETRYABLE, timeout=None, web_element=None):
+        """
+        Run action on the web element as per retry policy: transient failures (stale, intercepted, not interactable)
+        are retried with backoff after finding the element again, anything else fails right away
+        :param element:
+        :param locator_type:
+        :param action: callable taking the web element
+        :param retry_on: exception classes retried, see base/retries.py
+        :param timeout: seconds to keep retrying for, default retry policy's max attempts
+        :param web_element: handle already found for first attempt (e.g. by wait_for_element)
+        :return: value returned by action
+        """
+        by = to_by(element, locator_type)
+        found = [web_element] if web_element is not None else []
+
+        def _attempt():
+            if found:
+                return action(found.pop())
+            cached = self.element_cache is not None and by in self.element_cache
+            try:
+                return action(self.get_web_element(element, locator_type))
+            except StaleElementReferenceException:
+                if not cached:
+                    raise
+                # cached handles belong to a document replaced since (e.g. a click followed a link), found again at
+                # once without being charged to the retry budget
+                self.element_cache.invalidate()
+                return action(self.get_web_element(element, locator_type))
+
+        def _on_retry(kind, exp):
+            if kind == "stale" and self.element_cache is not None:
+                self.element_cache.invalidate(by)
+
+        return self.retry_policy.call(_attempt, locator=element, retry_on=retry_on, timeout=timeout,
+                                      on_retry=_on_retry)
+
+    def get_elements(self, element, locator_type=None):
         """
         This function is used to get the same type of elements in list
+        :param element: Locator or locator value
+        :param locator_type: type of locator value, not needed for a Locator
+        :return:
+        """
+        return self.driver.find_elements(*to_by(element, locator_type))
+
+    @staticmethod
+    def get_script_locator(element, locator_type=None):
+        """
+        Convert a locator to the ('xpath' | 'css', selector) pair understood by in-page scripts
         :param element:
         :param locator_type:
         :return:
         """
-        if locator_type == 'id':
-            elements = self.driver.find_elements_by_id(element)
-        elif locator_type == 'name':
-            elements = self.driver.find_elements_by_name(element)
-        elif locator_type == 'xpath':
-            elements = self.driver.find_elements_by_xpath(element)
-        elif locator_type == 'class':
-            elements = self.driver.find_elements_by_class_name(element)
-        elif locator_type == 'tag':
-            elements = self.driver.find_elements_by_tag_name(element)
-        elif locator_type == 'css':
-            elements = self.driver.find_elements_by_css_selector(element)
-        elif locator_type == 'link':
-            elements = self.driver.find_elements_by_link_text(element)
-        elif locator_type == 'partial_link':
-            elements = self.driver.find_elements_by_partial_link_text(element)
-        else:
-            raise Exception(f'Provided locator type {locator_type} is not supported !!')
-        return elements
+        return get_script_locator(element, locator_type)
+
+    def extract_records(self, element, locator_type=None, fields=None):
+        """
+        Read data of all rows of a listing in one round trip instead of a find plus a .text call per cell
+        Every record has all the field names as keys (None when field is not found), in the order of rows
+        :param element: locator of the rows
+        :param locator_type:
+        :param fields: {name: relative_locator} or {name: (relative_locator, attribute, locator_type)}, where
+                       relative locator (a Locator or a value) is evaluated against row ('.' is row itself) and
+                       attribute defaults to 'text'
+        :return: list of dict
+        """
+        return self.execute_script(BULK_EXTRACT_SCRIPT, self.get_script_locator(element, locator_type),
+                                   self.get_script_fields(element, locator_type, fields))
+
+    def get_script_fields(self, element, locator_type, fields):
+        """
+        Convert fields of extract_records to [name, script locator, attribute] triples of in-page scripts
+        :param element: locator of the rows
+        :param locator_type:
+        :param fields:
+        :return:
+        """
+        row_type = element.strategy if isinstance(element, Locator) else locator_type
+        script_fields = []
+        for name, field in fields.items():
+            if isinstance(field, (str, Locator)):
+                field = (field,)
+            attribute = field[1] if len(field) > 1 else 'text'
+            field_type = field[2] if len(field) > 2 else row_type
+            script_fields.append([name, self.get_script_locator(field[0], field_type), attribute])
+        return script_fields
+
+    def harvest(self, element, locator_type=None, fields=None, key=None, batch_size=100, wait=2.0, max_items=None):
+        """
+        Generator streaming rows of an infinite scroll / lazy loaded listing in batches while scrolling it
+        An in-page collector reads rows as they are rendered, each round trip returns the next batch (or scrolls and
+        waits in page for one), so memory stays bounded and rows are never read twice
+        e.g. for batch in web_driver.harvest(rows, "xpath", fields={"name": "."}, key="name"): ...
+        :param element: locator of the rows
+        :param locator_type:
+        :param fields: same as extract_records
+        :param key: field identifying a row for deduplication, default whole record
+        :param batch_size: max rows per batch
+        :param wait: seconds to wait in page for new rows after scrolling, listing ends when none came
+        :param max_items: stop after these many rows
+        :return: generator of lists of dict
+        """
+        harvest_id = self.execute_script(HARVEST_INSTALL_SCRIPT, self.get_script_locator(element, locator_type),
+                                         self.get_script_fields(element, locator_type, fields), key)
+        count = 0
+        try:
+            while max_items is None or count < max_items:
+                result = self.driver.execute_async_script(HARVEST_NEXT_SCRIPT, harvest_id, batch_size,
+                                                          int(wait * 1000))
+                if result is None:
+                    raise Exception(f"Harvest {harvest_id} lost, page navigated away !!")
+                items = result["items"] if max_items is None else result["items"][:max_items - count]
+                if items:
+                    count += len(items)
+                    yield items
+                if result["end"]:
+                    break
+        finally:
+            try:
+                self.execute_script(HARVEST_STOP_SCRIPT, harvest_id)
+            except Exception as exp:
+                self.logger.debug(f"Unable to stop harvest {harvest_id}: {exp}")
+        self.logger.debug(f"Harvested {count} rows of {element}")
+
+    def execute_script(self, script, *args):
+        """
+        This function is used to run javascript in current page and return its result
+        :param script:
+        :param args:
+        :return:
+        """
+        return self.driver.execute_script(script, *args)
+
+    def pipeline(self, *operations):
+        """
+        Run independent operations (callables taking this WebDriver), concurrently over the pooled connections
+        when transport has pipelining on, one after the other otherwise, each in a copy of the caller's context so
+        its commands are accounted to the calling test
+        e.g. name, price = web_driver.pipeline(lambda d: d.get_text(name), lambda d: d.get_text(price))
+        :param operations:
+        :return: results in order of operations
+        """
+        if not self.transport.pipelining or len(operations) < 2:
+            return [operation(self) for operation in operations]
+        futures = [get_executor(self.transport).submit(contextvars.copy_context().run, operation, self)
+                   for operation in operations]
+        return [future.result() for future in futures]
 
     @staticmethod
     def get_locator_type(locator_type):
@@ -305,120 +638,153 @@ class WebDriver:
         :param locator_type:
         :return:
         """
-        if locator_type == 'id':
-            locator_type = By.ID
-        elif locator_type == 'name':
-            locator_type = By.NAME
-        elif locator_type == 'xpath':
-            locator_type = By.XPATH
-        elif locator_type == 'class':
-            locator_type = By.CLASS_NAME
-        elif locator_type == 'tag':
-            locator_type = By.TAG_NAME
-        elif locator_type == 'css':
-            locator_type = By.CSS_SELECTOR
-        elif locator_type == 'link':
-            locator_type = By.LINK_TEXT
-        elif locator_type == 'partial_link':
-            locator_type = By.PARTIAL_LINK_TEXT
-        else:
-            raise Exception(f'Provided locator type {locator_type} is not supported !!')
-
-        return locator_type
+        return get_by_strategy(locator_type)
 
-    def click(self, element, locator_type):
+    def click(self, element, locator_type=None, timeout=None):
         """
         This function is used to click on the buttons, radio button, checkbox etc. available on web page
+        An element not found yet is waited for, then click is retried (stale/intercepted/not interactable) till it goes
+        through or timeout is spent
         :param element:
         :param locator_type:
+        :param timeout: default timeout of wait policy
         """
-        try:
-            self.get_web_element(element, locator_type).click()
-            self.wait_for(1)
-        except(Exception, ValueError):
-            self.wait_for(2)
-            self.get_web_element(element, locator_type).click()
-            self.wait_for(1)
+        deadline = time.monotonic() + (timeout or self.wait_policy.timeout)
+        web_element = None
+        if self.element_cache is None or to_by(element, locator_type) not in self.element_cache:
+            web_element = self.wait_for_element(element, locator_type, timeout=timeout)
+        self.on_element(element, locator_type, lambda web_element: web_element.click(),
+                        timeout=max(deadline - time.monotonic(), 0), web_element=web_element)
 
-    def explicit_click(self, element, locator_type):
+    def explicit_click(self, element, locator_type=None, time_out=60):
         """
         This function is used to click on element till wait for explict condition meet
+        Element is clicked once it is clickable and stopped moving, so an animating element is not clicked off target
         :param element:
         :param locator_type:
+        :param time_out:
         """
-        element = WebDriverWait(self.driver, 60).until(
-            ec.element_to_be_clickable((self.get_locator_type(locator_type), element)))
-        element.click()
+        self.explicit_check_element_is_clickable(element, locator_type, time_out=time_out)
+        self.click(element, locator_type, timeout=time_out)
 
-    def explicit_check_element_is_clickable(self, element, locator_type, time_out):
+    def explicit_check_element_is_clickable(self, element, locator_type=None, time_out=60):
         """
         This function is used to check the element is clickable or not and wait till explict condition meet
+        Element has to be displayed, enabled and at the same position on two consecutive polls
         :param element:
         :param locator_type:
         :param time_out:
         """
-        WebDriverWait(self.driver, time_out).until(
-            ec.element_to_be_clickable((self.get_locator_type(locator_type), element)))
+        with self.no_implicit_wait():
+            self.wait_until(element_stable(to_by(element, locator_type), clickable=True), timeout=time_out,
+                            message=f"{element} is not clickable")
 
-    def explicit_visibility_of_element(self, element, locator_type, time_out):
+    def explicit_visibility_of_element(self, element, locator_type=None, time_out=60):
         """
         This function is used to check the visibility on element till wait for explict condition meet
         :param element:
         :param locator_type:
         :param time_out:
         """
-        WebDriverWait(self.driver, time_out).until(
-            ec.visibility_of_element_located((self.get_locator_type(locator_type), element)))
+        with self.no_implicit_wait():
+            self.wait_until(element_visible(to_by(element, locator_type)), timeout=time_out,
+                            message=f"{element} is not visible")
 
-    def explicit_invisibility_of_element(self, element, locator_type, time_out):
+    def explicit_invisibility_of_element(self, element, locator_type=None, time_out=60):
         """
         Explicit wait till element is not visible
         :param element:
         :param locator_type:
+        :param time_out:
         :return:
         """
-        WebDriverWait(self.driver, time_out).until(
-            ec.invisibility_of_element((self.get_locator_type(locator_type), element)))
+        with self.no_implicit_wait():
+            self.wait_until(element_invisible(to_by(element, locator_type)), timeout=time_out,
+                            message=f"{element} is still visible")
 
-    def set_text(self, element, locator_type, text):
+    def set_text(self, element, locator_type=None, text=''):
         """
         This function is used to Enter the values in Text box
         :param element:
         :param locator_type:
         :param text:
         """
-        self.get_web_element(element, locator_type).send_keys(text)
+        self.on_element(element, locator_type, lambda web_element: web_element.send_keys(text))
+
+    def get_snapshot(self, refresh=False):
+        """
+        Parsed copy of current page answering read-only queries locally, taken once till invalidated (navigation,
+        window / frame switch or refresh=True after the page changed in place)
+        :param refresh:
+        :return: DomSnapshot
+        """
+        if refresh or self.dom_snapshot is None:
+            self.dom_snapshot = DomSnapshot(self.driver.page_source)
+        return self.dom_snapshot
 
-    def get_text(self, element, locator_type):
+    @contextmanager
+    def snapshot_mode(self, refresh=True):
+        """
+        Context manager in which get_text, is_element_present and get_texts are answered from a DOM snapshot, for
+        read-only checks of a page that does not change meanwhile
+        :param refresh: take a new snapshot on entering
+        """
+        previous, self.use_snapshot = self.use_snapshot, True
+        try:
+            yield self.get_snapshot(refresh=refresh)
+        finally:
+            self.use_snapshot = previous
+
+    def get_texts(self, element, locator_type=None):
+        """
+        Text of every element matching locator
+        :param element:
+        :param locator_type:
+        :return: list of str
+        """
+        if self.use_snapshot:
+            return self.get_snapshot().get_texts(element, locator_type)
+        return [web_element.text for web_element in self.get_elements(element, locator_type)]
+
+    def get_text(self, element, locator_type=None):
         """
         This function is used to get the text from Labels available on page
         :param element:
         :param locator_type:
         """
-        return self.get_web_element(element, locator_type).text
+        if self.use_snapshot:
+            return self.get_snapshot().get_text(element, locator_type)
+        return self.on_element(element, locator_type, lambda web_element: web_element.text)
 
-    def get_value_from_textbox(self, element, locator_type):
+    def get_value_from_textbox(self, element, locator_type=None):
         """
         This function is used to get the text from text box on web page
         :param element:
         :param locator_type:
         :return:
         """
-        return self.get_web_element(element, locator_type).get_attribute('value')
+        return self.on_element(element, locator_type, lambda web_element: web_element.get_attribute('value'))
 
-    def clear_text(self, element, locator_type, action_type):
+    def clear_text(self, element, locator_type=None, action_type='clear'):
         """
         Function to clear the value from text box
         :param element:
         :param locator_type:
         :param action_type:
         """
-        web_element = self.get_web_element(element, locator_type)
+        self.on_element(element, locator_type, lambda web_element: self._clear_web_element(web_element, action_type))
+
+    def _clear_web_element(self, web_element, action_type):
+        """
+        Clear the value of an already found text box
+        :param web_element:
+        :param action_type:
+        """
         if action_type == 'clear':
             web_element.clear()
         elif action_type == 'action':
             action = self.key_chains()
-            action.move_to_element(self.get_web_element(element, locator_type)).perform()
+            action.move_to_element(web_element).perform()
             action.send_keys(Keys.END).perform()
             for i in range(len(web_element.get_attribute('value'))):
                 action.send_keys(Keys.BACK_SPACE).perform()
@@ -426,19 +792,21 @@ class WebDriver:
             length = len(web_element.get_attribute('value'))
             web_element.send_keys(length * Keys.BACKSPACE)
 
-    def is_element_present(self, element, locator_type):
+    def is_element_present(self, element, locator_type=None):
         """
         This function is used to check the element is Present on web page or not
         :param element:
         :param locator_type:
         :return:
         """
+        if self.use_snapshot:
+            return self.get_snapshot().is_element_present(element, locator_type)
         if len(self.get_elements(element, locator_type)) > 0:
             return True
         else:
             return False
 
-    def is_element_display_on_screen(self, element, locator_type):
+    def is_element_display_on_screen(self, element, locator_type=None):
         """
         This function is used to check the element is display on web page or not
         :param element:
@@ -446,27 +814,27 @@ class WebDriver:
         :return:
         """
         try:
-            return self.get_web_element(element, locator_type).is_displayed()
+            return self.on_element(element, locator_type, lambda web_element: web_element.is_displayed())
         except Exception:
             return False
 
-    def is_element_selected(self, element, locator_type):
+    def is_element_selected(self, element, locator_type=None):
         """
         This function is used to check the element is selected on web page or not
         :param element:
         :param locator_type:
         :return:
         """
-        return self.get_web_element(element, locator_type).is_selected()
+        return self.on_element(element, locator_type, lambda web_element: web_element.is_selected())
 
-    def is_element_enabled(self, element, locator_type):
+    def is_element_enabled(self, element, locator_type=None):
         """
         This function is used to check the element is enabled on web page or not
         :param element:
         :param locator_type:
         :return:
         """
-        return self.get_web_element(element, locator_type).is_enabled()
+        return self.on_element(element, locator_type, lambda web_element: web_element.is_enabled())
 
     @staticmethod
     def wait_for(seconds):
@@ -474,29 +842,31 @@ class WebDriver:
         This is function is used for hard wait
         :param seconds:
         """
-        time.sleep(seconds)
+        instrumentation.sleep(seconds)
 
-    def wait_till_element_appear_on_screen(self, element, locator_type):
+    def wait_till_element_appear_on_screen(self, element, locator_type=None, timeout=80):
         """
         This function is used to wait for the element appear on the page
+        :param element:
+        :param locator_type:
+        :param timeout:
+        :return: True if element appeared within timeout
         """
-        flag = False
-        count = 1
-        while flag is False and count <= 40:
-            flag = self.is_element_display_on_screen(element, locator_type)
-            self.wait_for(2)
-            count += 1
+        condition = element_visible(to_by(element, locator_type))
+        with self.no_implicit_wait():
+            return bool(self.wait_policy.budget(timeout).holds(condition, driver=self.driver))
 
-    def wait_till_element_disappear_from_screen(self, element, locator_type):
+    def wait_till_element_disappear_from_screen(self, element, locator_type=None, timeout=80):
         """
         This function is used to wait for the element disappear from the page
+        :param element:
+        :param locator_type:
+        :param timeout:
+        :return: True if element disappeared within timeout
         """
-        flag = True
-        count = 1
-        while flag and count <= 40:
-            flag = self.is_element_display_on_screen(element, locator_type)
-            self.wait_for(2)
-            count += 1
+        condition = element_invisible(to_by(element, locator_type))
+        with self.no_implicit_wait():
+            return bool(self.wait_policy.budget(timeout).holds(condition, driver=self.driver))
 
     def scroll(self, pixel_x, pixel_y):
         """
@@ -506,13 +876,19 @@ class WebDriver:
         """
         self.driver.execute_script(f"window.scrollTo({pixel_x},{pixel_y})")
 
-    def scroll_till_element(self, element, locator_type):
+    def scroll_till_element(self, element, locator_type=None, timeout=None):
         """
         This function is used to scroll the page till visibility of element
+        Returns once the element stopped moving, smooth scrolling and lazy loaded content above it may shift it
         :param element:
         :param locator_type:
+        :param timeout: budget to settle, default timeout of wait policy
         """
-        self.driver.execute_script("arguments[0].scrollIntoView();", self.get_web_element(element, locator_type))
+        self.on_element(element, locator_type,
+                        lambda web_element: self.driver.execute_script("arguments[0].scrollIntoView();", web_element))
+        with self.no_implicit_wait():
+            self.wait_until(element_stable(to_by(element, locator_type)), timeout=timeout,
+                            message=f"{element} did not settle after scrolling")
 
     def scroll_complete_page(self):
         """
@@ -543,79 +919,82 @@ class WebDriver:
         This function is used to capture the screen shot on web page/device
         :param file_name:
         """
-        ss_path = f"{os.getcwd()}/screenshots/{file_name}.png"
+        os.makedirs(self.screenshot_path, exist_ok=True)
+        ss_path = f"{self.screenshot_path}/{file_name}.png"
         self.driver.get_screenshot_as_file(ss_path)
         return ss_path
 
-    def allure_attach_jpeg(self, file_name):
+    def allure_attach_jpeg(self, file_name, image_format=None, max_width=None):
         """
-        This function is used to capture the screen shot on web page/device
+        This function is used to capture the screen shot on web page/device and attach it to allure report
+        Screenshot is captured in memory, encoding and attaching happen on the attachment pipeline's worker
         :param file_name:
+        :param image_format: jpeg, webp or png, defaults to the pipeline's format
+        :param max_width: downscale wider screenshots to this width
         """
-        with open(self.screen_shot(file_name), "rb") as image:
-            byte_image = bytearray(image.read())
-        allure.attach(byte_image, name=f"{file_name}.png", attachment_type=allure.attachment_type.PNG)
+        get_attachment_pipeline().attach_screenshot(self.driver.get_screenshot_as_base64(), name=file_name,
+                                                    save_path=self.screenshot_path, image_format=image_format,
+                                                    max_width=max_width)
 
-    def select_by_index(self, element, locator_type, index):
+    def select_by_index(self, element, locator_type=None, index=0):
         """
         selects the option located by index in a drop down
         :param element:
         :param locator_type:
         :param index:
         """
-        select = Select(self.get_web_element(element, locator_type))
-        select.select_by_index(index)
+        self.on_element(element, locator_type, lambda web_element: Select(web_element).select_by_index(index))
 
-    def select_by_text(self, element, locator_type, text):
+    def select_by_text(self, element, locator_type=None, text=''):
         """
         selects the option located by text in a drop down
         :param element:
         :param locator_type:
         :param text:
         """
-        select = Select(self.get_web_element(element, locator_type))
-        select.select_by_visible_text(text)
+        self.on_element(element, locator_type, lambda web_element: Select(web_element).select_by_visible_text(text))
 
-    def move_to_element(self, element, locator_type):
+    def move_to_element(self, element, locator_type=None):
         """
         move to the element by action key class
         :param element:
         :param locator_type:
         """
-        action = self.key_chains()
-        action.move_to_element(self.get_web_element(element, locator_type)).perform()
+        self.on_element(element, locator_type,
+                        lambda web_element: self.key_chains().move_to_element(web_element).perform())
 
-    def move_to_element_and_click(self, element, locator_type):
+    def move_to_element_and_click(self, element, locator_type=None):
         """
         move to the element by action key class and then click
         :param element:
         :param locator_type:
         """
-        action = self.key_chains()
-        action.move_to_element(self.get_web_element(element, locator_type)).click(element, locator_type).perform()
+        self.on_element(element, locator_type,
+                        lambda web_element: self.key_chains().move_to_element(web_element).click().perform())
 
-    def enter_data_in_textbox_using_action(self, element, locator_type, text):
+    def enter_data_in_textbox_using_action(self, element, locator_type=None, text=''):
         """
         move to the element by action key class then click and then enter the value in text box
         :param element:
         :param locator_type:
         :param text
         """
-        action = self.key_chains()
-        action.move_to_element(self.get_web_element(element, locator_type)).click().send_keys(text).send_keys(
-            Keys.TAB).perform()
+        self.on_element(element, locator_type, lambda web_element: self.key_chains().move_to_element(
+            web_element).click().send_keys(text).send_keys(Keys.TAB).perform())
 
     def switch_to_iframe(self, frame_reference):
         """
         Switch to iframe
         :param frame_reference:
         """
+        self.invalidate_element_cache()
         self.driver.switch_to.frame(frame_reference)
 
     def switch_to_default_content(self):
         """
         Switch to default content
         """
+        self.invalidate_element_cache()
         self.driver.switch_to.default_content()
 
     def switch_to_alert_and_dismiss(self):
@@ -640,6 +1019,7 @@ class WebDriver:
         """
         for context in contexts:
             if context == context_name:
+                self.invalidate_element_cache()
                 self.driver.switch_to.context(context)
                 break
 
@@ -656,6 +1036,7 @@ class WebDriver:
         :param index
         :return:
         """
+        self.invalidate_element_cache()
         self.driver.execute_script("window.open();")
         # switch to the new window which is second in window_handles array
         self.driver.switch_to.window(self.driver.window_handles[index])
@@ -666,100 +1047,149 @@ class WebDriver:
         :param switch_window_name:
         :return:
         """
+        self.invalidate_element_cache()
         self.driver.close()
         self.driver.switch_to.window(switch_window_name)
 
+    def crawl_pages(self, urls, extract, prefetch=2, timeout=None, current=False):
+        """
+        Generator visiting urls in order while the next prefetch urls already load in background tabs, so page loads
+        overlap with extraction; each page is extracted in its own tab which is closed right after
+        Stopping iteration early closes tabs still loading, browser is left on the tab it was on
+        :param urls: iterable of urls, may be endless (stop iterating once pages are empty)
+        :param extract: callable taking this WebDriver (switched to the page's tab) returning page data
+        :param prefetch: pages loading in background besides the one extracted
+        :param timeout: seconds to wait for each page to be ready
+        :param current: first extract the page already open in current tab, while urls start loading
+        :return: generator of (url, extracted data)
+        """
+        main = self.get_current_window()
+        urls = iter(urls)
+        loading = deque()
+
+        def _fill():
+            while len(loading) <= prefetch:
+                url = next(urls, None)
+                if url is None:
+                    return
+                handles = set(self.driver.window_handles)
+                self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+                opened = set(self.driver.window_handles) - handles
+                if len(opened) != 1:
+                    raise Exception(f"Unable to open {url} in a new tab !!")
+                loading.append((url, opened.pop()))
+
+        try:
+            _fill()
+            if current:
+                yield self.driver.current_url, extract(self)
+            while loading:
+                url, handle = loading[0]
+                self.invalidate_element_cache()
+                self.driver.switch_to.window(handle)
+                self.wait_for_page_ready(timeout=timeout)
+                data = extract(self)
+                self.close_tab_and_switch_to_main_tab(main)
+                loading.popleft()
+                _fill()
+                yield url, data
+        finally:
+            for _, handle in loading:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            if loading:
+                self.driver.switch_to.window(main)
+                self.invalidate_element_cache()
+
+    def get_download_path(self, file_name):
+        """
+        Path of a download on the browser's machine, same folder for local and grid sessions as set in preferences
+        :param file_name:
+        :return:
+        """
+        return os.path.join(self.download_path, file_name)
+
     def grid_download_verification(self, file_name):
         """
-        Download via Grid and Verify
+        Verify download is complete (browser renames .crdownload / .part to file name when done), without any tab
+        :param file_name:
         :return:
         """
-        window = self.get_current_window()
-        self.open_and_switch_to_new_tab(index=1)
-        # open successfully
-        self.open_website("chrome://downloads/")
-        files = self.driver.execute_script(
-            """
-            var elements = document
-            .querySelector('downloads-manager')
-            .shadowRoot.querySelector('#downloadsList').items;
-            if (elements.every(e => e.state === "COMPLETE"))
-                return elements.map(elements =>elements.fileUrl || elements.file_url);
-            """
-        )
-        if files[0].rsplit("/", 1)[-1].__contains__(file_name):
-            self.close_tab_and_switch_to_main_tab(window)
-            return True
+        path = self.get_download_path(file_name)
+        if self.remote is None:
+            return os.path.isfile(path)
+        element, info = select_remote_file(self.driver, path)
+        if element is not None:
+            self.driver.execute_script(REMOVE_INPUT_SCRIPT, element)
+        return element is not None
+
+    def download_file(self, file_name, destination=None, chunk_size=CHUNK_SIZE, expected_size=None,
+                      expected_sha256=None):
+        """
+        Stream a downloaded file to local disk chunk by chunk (memory bound by chunk size), verifying size and hash
+        :param file_name: name of file in download folder
+        :param destination: local path, default file name in current working directory
+        :param chunk_size:
+        :param expected_size:
+        :param expected_sha256:
+        :return: DownloadResult(path, size, sha256)
+        """
+        destination = destination or os.path.join(os.getcwd(), file_name)
+        path = self.get_download_path(file_name)
+        if self.remote is None:
+            result = stream_local(path, destination, chunk_size, expected_size, expected_sha256)
         else:
-            self.close_tab_and_switch_to_main_tab(window)
-            return False
+            result = stream_remote(self.driver, path, destination, chunk_size, expected_size, expected_sha256)
+        self.logger.debug(f"Downloaded {file_name} ({result.size} bytes, sha256 {result.sha256})")
+        return result
 
-    def get_file_content(self):
+    def get_file_content(self, file_name, destination=None):
         """
         Read the file content and save the content in local system
-        :return:
+        :param file_name:
+        :param destination:
+        :return: path of saved file
         """
-        window = self.get_current_window()
-        self.open_and_switch_to_new_tab(index=1)
-        self.open_website("chrome://downloads/")
-        files = self.driver.execute_script(
-            """
-            var elements = document
-            .querySelector('downloads-manager')
-            .shadowRoot.querySelector('#downloadsList').items;
-            if (elements.every(e => e.state === "COMPLETE"))
-                return elements.map(elements =>elements.fileUrl || elements.file_url);
-            """
-        )
-        path = files[0]
-        elem = self.driver.execute_script(
-            "var input = window.document.createElement('INPUT'); "
-            "input.setAttribute('type', 'file'); "
-            "input.hidden = true; "
-            "input.onchange = function (e) { e.stopPropagation() }; "
-            "return window.document.documentElement.appendChild(input); ")
-
-        elem._execute('sendKeysToElement', {'value': [path.replace('file:/', '').replace('%20', ' ')],
-                                            'text': path.replace('file:/', '').replace('%20', ' ')})
-        result = self.driver.execute_async_script(
-            "var input = arguments[0], callback = arguments[1]; "
-            "var reader = new FileReader(); "
-            "reader.onload = function (ev) { callback(reader.result) }; "
-            "reader.onerror = function (ex) { callback(ex.message) }; "
-            "reader.readAsDataURL(input.files[0]); "
-            "input.remove(); "
-            , elem)
-
-        if not result.startswith('data:'):
-            self.close_tab_and_switch_to_main_tab(window)
-            raise Exception("Failed to get file content: %s" % result)
-        content = base64.b64decode(result[result.find('base64,') + 7:])
-        with open(os.path.basename(re.sub("%20(...)", "", files[0])), 'wb') as f:
-            f.write(content)
-        self.close_tab_and_switch_to_main_tab(window)
-
-    def check_local_system_download(self, file_path):
+        return self.download_file(file_name, destination).path
+
+    def get_download_watcher(self, directory=None):
+        """
+        Watcher of a local download folder, started on first use and stopped on quit
+        Files written since this driver started count as downloads, older ones are left from earlier runs
+        :param directory: default download folder of the browser
+        :return: DownloadWatcher
+        """
+        directory = os.path.abspath(directory or self.download_path)
+        if directory not in self._download_watchers:
+            self._download_watchers[directory] = DownloadWatcher(directory, since=self.started_at)
+        return self._download_watchers[directory]
+
+    def wait_for_downloads(self, *file_names, timeout=80):
+        """
+        Wait till all given local downloads are complete (not only present while the browser still writes them)
+        :param file_names: names in download folder
+        :param timeout:
+        :return: {file name: path it was saved as, 'name (N).ext' when name was taken}, or None when some download
+        did not complete in time
+        """
+        return self.get_download_watcher().wait_for(*file_names, timeout=timeout)
+
+    def check_local_system_download(self, file_path, timeout=80):
         """
         Check local System Download
         :param file_path:
+        :param timeout:
         :return:
         """
-        file = pathlib.Path(file_path)
-        flag = False
-        count = 1
-        while flag is False:
-            flag = file.exists()
-            if count <= 40 and flag is False:
-                self.wait_for(2)
-                count = count + 1
-        return flag
+        directory, file_name = os.path.split(os.path.abspath(file_path))
+        return self.get_download_watcher(directory).wait_for(file_name, timeout=timeout) is not None
 
     @staticmethod
     def stop_appium():
         """
         This function to stop the appium
         """
-        run_cmd("killall node", wait=False)
+        stop_appium_server()
 
     def submit(self):
         """
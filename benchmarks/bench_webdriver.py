@@ -0,0 +1,189 @@
+__author__ = "sarvesh.singh"
+
+import os
+import sys
+import time
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from json import (
+    dumps as json_dumps,
+    load as json_load,
+)
+import selenium
+from selenium.webdriver.common.by import By
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from base.common import run_cmd  # noqa: E402
+from base.driver_pool import DriverPool  # noqa: E402
+from base.instrumentation import percentile  # noqa: E402
+from base.web_drivers import WebDriver  # noqa: E402
+from pages.home_page import HomePage  # noqa: E402
+from pages.search_results import SearchResults  # noqa: E402
+from benchmarks.webdriver_stub import WebDriverStub  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+XPATH = "//*[@class='_2cLu-l']"
+
+
+def measure(stub, operation, iterations, warmup=5):
+    """
+    Run operation in a loop and collect its latency and number of WebDriver commands it sends
+    :param stub:
+    :param operation:
+    :param iterations:
+    :param warmup:
+    :return:
+    """
+    for _ in range(warmup):
+        operation()
+    samples = []
+    commands = stub.state.commands
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    commands = stub.state.commands - commands
+    samples.sort()
+    total = sum(samples)
+    return {
+        "ops_per_sec": round(iterations / total, 1) if total else None,
+        "mean_us": round(total / iterations * 1e6, 1),
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p95_us": round(percentile(samples, 95) * 1e6, 1),
+        "commands_per_op": round(commands / iterations, 2),
+    }
+
+
+def get_benchmarks(stub, screenshot_dir):
+    """
+    Benchmarks as {name: (wrapper operation, equivalent raw selenium operation or None)}
+    :param stub:
+    :param screenshot_dir:
+    :return:
+    """
+    driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, screenshot_path=screenshot_dir)
+    cached = WebDriver(browser="chrome", remote=stub.host, port=stub.port, cache_elements=True)
+    raw = driver.driver
+    home, search = HomePage(driver), SearchResults(driver)
+    pool = DriverPool(factory=lambda slot: driver, size=1)
+
+    def _pool_cycle():
+        pool.checkin(pool.checkout())
+
+    return {
+        "open_website": (lambda: driver.open_website("http://stub.local/"), lambda: raw.get("http://stub.local/")),
+        "get_web_element": (lambda: driver.get_web_element(XPATH, "xpath"),
+                            lambda: raw.find_element(By.XPATH, XPATH)),
+        "get_elements": (lambda: driver.get_elements(XPATH, "xpath"), lambda: raw.find_elements(By.XPATH, XPATH)),
+        "click": (lambda: driver.click(XPATH, "xpath"), lambda: raw.find_element(By.XPATH, XPATH).click()),
+        "click_cached": (lambda: cached.click(XPATH, "xpath"), lambda: raw.find_element(By.XPATH, XPATH).click()),
+        "set_text": (lambda: driver.set_text(XPATH, "xpath", "apple"),
+                     lambda: raw.find_element(By.XPATH, XPATH).send_keys("apple")),
+        "get_text": (lambda: driver.get_text(XPATH, "xpath"), lambda: raw.find_element(By.XPATH, XPATH).text),
+        "execute_script": (lambda: driver.execute_script("return 1;"), lambda: raw.execute_script("return 1;")),
+        "screen_shot": (lambda: driver.screen_shot("bench"),
+                        lambda: raw.get_screenshot_as_file(os.path.join(screenshot_dir, "raw.png"))),
+        "page_home_search_apple": (home.search_apple, None),
+        "page_search_results": (search.get_search_results, None),
+        "fixture_pool_checkout_checkin": (_pool_cycle, None),
+    }
+
+
+def run(iterations=200, elements=40):
+    """
+    Run all benchmarks against a local WebDriver stub
+    :param iterations:
+    :param elements: rows returned for listing pages
+    :return: results in comparable JSON format
+    """
+    results = {}
+    with WebDriverStub(elements_per_find=elements) as stub, tempfile.TemporaryDirectory() as screenshot_dir:
+        for name, (operation, raw_operation) in get_benchmarks(stub, screenshot_dir).items():
+            result = measure(stub, operation, iterations)
+            if raw_operation is not None:
+                raw_result = measure(stub, raw_operation, iterations)
+                result["overhead_us"] = round(result["mean_us"] - raw_result["mean_us"], 1)
+                result["raw_commands_per_op"] = raw_result["commands_per_op"]
+            results[name] = result
+
+    commit = run_cmd("git rev-parse --short HEAD")
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit.output.strip() if commit.status == 0 else None,
+            "python": platform.python_version(),
+            "selenium": selenium.__version__,
+            "iterations": iterations,
+            "elements": elements,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Compare two benchmark results, mean latency growing over threshold or extra commands are regressions
+    :param current:
+    :param baseline:
+    :param threshold: allowed relative growth of mean latency
+    :return: (report lines, regressions)
+    """
+    lines, regressions = [], []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            lines.append(f"{name:<32} new")
+            continue
+        ratio = result["mean_us"] / old["mean_us"] if old["mean_us"] else 1.0
+        line = (f"{name:<32} {old['mean_us']:>10.1f}us -> {result['mean_us']:>10.1f}us ({ratio - 1:+.0%}) "
+                f"commands {old['commands_per_op']} -> {result['commands_per_op']}")
+        if ratio > 1 + threshold or result["commands_per_op"] > old["commands_per_op"]:
+            regressions.append(name)
+            line += "  REGRESSION"
+        lines.append(line)
+    return lines, regressions
+
+
+def main(argv=None):
+    """
+    Command line entry: python -m benchmarks.bench_webdriver [--iterations N] [--compare old.json]
+    :param argv:
+    :return: exit code, 1 on regression
+    """
+    parser = argparse.ArgumentParser(description="Benchmark WebDriver wrapper overhead against a local stub")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--elements", type=int, default=40)
+    parser.add_argument("--output", default=None, help="result file, default benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare", default=None, help="baseline result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    current = run(iterations=args.iterations, elements=args.elements)
+    output = Path(args.output or RESULTS_DIR / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as _fp:
+        _fp.write(json_dumps(current, indent=2, sort_keys=True))
+
+    print(f"{'benchmark':<32} {'ops/sec':>10} {'mean us':>10} {'p95 us':>10} {'overhead us':>12} {'commands':>9}")
+    for name, result in current["results"].items():
+        overhead = result.get("overhead_us")
+        print(f"{name:<32} {result['ops_per_sec']:>10} {result['mean_us']:>10} {result['p95_us']:>10} "
+              f"{'-' if overhead is None else overhead:>12} {result['commands_per_op']:>9}")
+    print(f"Saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as _fp:
+            lines, regressions = compare(current, json_load(_fp), threshold=args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
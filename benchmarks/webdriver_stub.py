@@ -0,0 +1,402 @@
+__author__ = "sarvesh.singh"
+
+import os
+import re
+import sys
+import argparse
+import time
+import uuid
+import base64
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from json import (
+    dumps as json_dumps,
+    loads as json_loads,
+)
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+# Smallest valid PNG (1x1 transparent pixel), served as screenshot
+TINY_PNG = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)).decode()
+
+
+class StubState:
+    """
+    Class to keep sessions and elements served by the stub, shared by all request handler threads
+    """
+
+    def __init__(self, elements_per_find=10):
+        """
+        Init Class
+        :param elements_per_find: number of elements returned by find elements and rows by bulk scripts
+        """
+        self.elements_per_find = elements_per_find
+        self.sessions = {}
+        self.elements = {}
+        self.files = {}
+        self.harvests = {}
+        self.harvest_pages = 3
+        self.result_pages = None
+        self.page_source = "<html><head><title>Stub</title></head><body></body></html>"
+        # locator values never found, finding them takes the session's implicit wait like a browser
+        self.absent = set()
+        # element ids answered with stale element reference, e.g. all of them to mimic a page replaced by a click
+        self.stale = set()
+        self.commands = 0
+        self.lock = threading.Lock()
+
+    def new_element(self, locator):
+        """
+        Register an element and return its W3C reference
+        :param locator:
+        :return:
+        """
+        element_id = uuid.uuid4().hex
+        with self.lock:
+            self.elements[element_id] = {"locator": locator, "text": f"text of {locator}", "value": ""}
+        return {ELEMENT_KEY: element_id}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Class to answer the W3C WebDriver endpoints used by base/web_drivers.py with canned values
+    """
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without TCP_NODELAY keep-alive clients would wait on delayed ACKs
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        """
+        Route request to the handler of its endpoint
+        :param method:
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json_loads(self.rfile.read(length) or b"{}") if length else {}
+        path = re.sub(r"^/wd/hub", "", self.path.split("?")[0]).rstrip("/")
+        with self.state.lock:
+            self.state.commands += 1
+        for route_method, pattern, handler in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match and route_method == method:
+                if match.groups() and match.group(1) not in self.state.sessions:
+                    return self._reply(404, {"error": "invalid session id", "message": match.group(1),
+                                             "stacktrace": ""})
+                if len(match.groups()) > 1 and match.group(2) in self.state.stale:
+                    return self._reply(404, {"error": "stale element reference", "message": match.group(2),
+                                             "stacktrace": ""})
+                status, value = handler(self.state, body, *match.groups())
+                return self._reply(status, value)
+        self._reply(404, {"error": "unknown command", "message": f"{method} {path}", "stacktrace": ""})
+
+    def _reply(self, status, value):
+        """
+        Send W3C {"value": ...} response
+        :param status:
+        :param value:
+        """
+        payload = json_dumps({"value": value}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _new_session(state, body):
+    session_id = uuid.uuid4().hex
+    state.sessions[session_id] = {"windows": {"window-1": "about:blank"}, "window": "window-1", "opened": 1,
+                                  "title": "Stub", "requested": body, "implicit": 0}
+    return 200, {"sessionId": session_id, "capabilities": {"browserName": "chrome", "browserVersion": "stub"}}
+
+
+def _delete_session(state, body, session_id):
+    state.sessions.pop(session_id, None)
+    return 200, None
+
+
+def _status(state, body):
+    return 200, {"ready": True, "message": "stub ready", "build": {"version": "stub"}}
+
+
+def _null(state, body, *args):
+    return 200, None
+
+
+def _timeouts(state, body, session_id):
+    if "implicit" in body:
+        state.sessions[session_id]["implicit"] = body["implicit"] / 1000
+    return 200, None
+
+
+def _navigate(state, body, session_id):
+    session = state.sessions[session_id]
+    session["windows"][session["window"]] = body.get("url")
+    return 200, None
+
+
+def _current_url(state, body, session_id):
+    session = state.sessions[session_id]
+    return 200, session["windows"][session["window"]]
+
+
+def _title(state, body, session_id):
+    return 200, state.sessions[session_id]["title"]
+
+
+def _window_handle(state, body, session_id):
+    return 200, state.sessions[session_id]["window"]
+
+
+def _window_handles(state, body, session_id):
+    return 200, list(state.sessions[session_id]["windows"])
+
+
+def _switch_window(state, body, session_id):
+    session = state.sessions[session_id]
+    if body.get("handle") not in session["windows"]:
+        return 404, {"error": "no such window", "message": body.get("handle"), "stacktrace": ""}
+    session["window"] = body["handle"]
+    return 200, None
+
+
+def _close_window(state, body, session_id):
+    session = state.sessions[session_id]
+    session["windows"].pop(session["window"], None)
+    return 200, list(session["windows"])
+
+
+def _open_window(state, session_id, url):
+    session = state.sessions[session_id]
+    session["opened"] += 1
+    session["windows"][f"window-{session['opened']}"] = url or "about:blank"
+
+
+def _rows(state, session_id):
+    """
+    Row labels of listing in current window, pages after result_pages (?page=N, no page is page 1) are empty
+    """
+    session = state.sessions[session_id]
+    page = re.search(r"[?&]page=(\d+)", session["windows"].get(session["window"], ""))
+    if page is None and state.result_pages is None:
+        return [str(row) for row in range(state.elements_per_find)]
+    page = int(page.group(1)) if page else 1
+    if state.result_pages is not None and page > state.result_pages:
+        return []
+    return [f"{page}-{row}" for row in range(state.elements_per_find)]
+
+
+def _find_element(state, body, session_id, parent_id=None):
+    if body.get("value") in state.absent:
+        time.sleep(state.sessions[session_id]["implicit"])
+        return 404, {"error": "no such element", "message": body.get("value"), "stacktrace": ""}
+    return 200, state.new_element(body.get("value"))
+
+
+def _find_elements(state, body, session_id, parent_id=None):
+    if body.get("value") in state.absent:
+        time.sleep(state.sessions[session_id]["implicit"])
+        return 200, []
+    return 200, [state.new_element(body.get("value")) for _ in range(state.elements_per_find)]
+
+
+def _element_text(state, body, session_id, element_id):
+    return 200, state.elements.get(element_id, {}).get("text", "")
+
+
+def _element_value(state, body, session_id, element_id):
+    state.elements.get(element_id, {})["value"] = "".join(body.get("text", ""))
+    return 200, None
+
+
+def _element_true(state, body, session_id, element_id, *args):
+    return 200, True
+
+
+def _element_rect(state, body, session_id, element_id):
+    return 200, {"x": 0, "y": 0, "width": 10, "height": 10}
+
+
+def _execute(state, body, session_id):
+    """
+    Answer the scripts sent by the wrapper and by selenium's atoms
+    """
+    script, args = body.get("script", ""), body.get("args", [])
+    if "readyState" in script and "getEntriesByType" not in script:
+        return 200, "complete"
+    if "getEntriesByType" in script:
+        return 200, ["complete", 1]
+    if "__pomHarvest" in script:
+        return 200, _harvest(state, script, args)
+    if "window.open(" in script:
+        return 200, _open_window(state, session_id, args[0] if args else None)
+    if "fields.forEach" in script:
+        names = [field[0] for field in args[1]]
+        return 200, [{name: f"{name} {row}" for name in names} for row in _rows(state, session_id)]
+    if script.startswith("return (function") and len(args) == 2:
+        element = state.elements.get(args[0].get(ELEMENT_KEY), {})
+        return 200, element.get(args[1])
+    if script.startswith("return (function") and len(args) == 1:
+        return 200, True
+    if "getBoundingClientRect" in script:
+        return 200, [0, 0, 10, 10]
+    if "createElement('INPUT')" in script:
+        return 200, state.new_element("file input")
+    if "files[0]" in script:
+        path = state.elements.get(args[0].get(ELEMENT_KEY), {}).get("value")
+        content = state.files.get(path)
+        if content is None:
+            return 200, None
+        if "readAsDataURL" in script:
+            return 200, base64.b64encode(content[args[1]:args[1] + args[2]]).decode()
+        return 200, [len(content), os.path.basename(path)]
+    return 200, None
+
+
+def _harvest(state, script, args):
+    """
+    Collector of WebDriver.harvest over a listing growing by elements_per_find rows per scroll, harvest_pages times
+    """
+    if "MutationObserver" in script:
+        harvest_id = f"harvest-{len(state.harvests)}"
+        state.harvests[harvest_id] = {"fields": [field[0] for field in args[1]], "page": 0}
+        return harvest_id
+    harvest = state.harvests.get(args[0])
+    if "drain" not in script:
+        state.harvests.pop(args[0], None)
+        return None
+    if harvest is None:
+        return None
+    if harvest["page"] >= state.harvest_pages:
+        return {"items": [], "end": True}
+    start, harvest["page"] = harvest["page"] * state.elements_per_find, harvest["page"] + 1
+    return {"items": [{name: f"{name} {row}" for name in harvest["fields"]}
+                      for row in range(start, start + state.elements_per_find)], "end": False}
+
+
+def _source(state, body, session_id):
+    return 200, state.page_source
+
+
+def _screenshot(state, body, session_id):
+    return 200, TINY_PNG
+
+
+SESSION = r"/session/([^/]+)"
+ELEMENT = SESSION + r"/element/([^/]+)"
+ROUTES = [
+    ("GET", r"/status", _status),
+    ("POST", r"/session", _new_session),
+    ("DELETE", SESSION, _delete_session),
+    ("POST", SESSION + r"/timeouts", _timeouts),
+    ("POST", SESSION + r"/window/maximize", _null),
+    ("POST", SESSION + r"/url", _navigate),
+    ("GET", SESSION + r"/url", _current_url),
+    ("GET", SESSION + r"/title", _title),
+    ("POST", SESSION + r"/(?:back|forward|refresh)", _null),
+    ("GET", SESSION + r"/window", _window_handle),
+    ("GET", SESSION + r"/window/handles", _window_handles),
+    ("POST", SESSION + r"/window", _switch_window),
+    ("DELETE", SESSION + r"/window", _close_window),
+    ("POST", SESSION + r"/element", _find_element),
+    ("POST", SESSION + r"/elements", _find_elements),
+    ("POST", ELEMENT + r"/element", _find_element),
+    ("POST", ELEMENT + r"/elements", _find_elements),
+    ("POST", ELEMENT + r"/click", lambda state, body, session_id, element_id: (200, None)),
+    ("POST", ELEMENT + r"/clear", lambda state, body, session_id, element_id: (200, None)),
+    ("POST", ELEMENT + r"/value", _element_value),
+    ("GET", ELEMENT + r"/text", _element_text),
+    ("GET", ELEMENT + r"/(enabled|selected|displayed)", _element_true),
+    ("GET", ELEMENT + r"/rect", _element_rect),
+    ("POST", SESSION + r"/execute/sync", _execute),
+    ("POST", SESSION + r"/execute/async", _execute),
+    ("GET", SESSION + r"/screenshot", _screenshot),
+    ("GET", SESSION + r"/source", _source),
+    ("POST", SESSION + r"/goog/cdp/execute", _null),
+]
+
+
+class WebDriverStub:
+    """
+    Class to run a lightweight local W3C WebDriver endpoint, usable as WebDriver(browser='chrome', remote=host, port)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, elements_per_find=10):
+        """
+        Init Class, port 0 picks a free port
+        :param host:
+        :param port:
+        :param elements_per_find:
+        """
+        self.state = StubState(elements_per_find=elements_per_find)
+        handler = type("BoundStubHandler", (StubHandler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/wd/hub"
+
+    def start(self):
+        """
+        Serve in a background thread
+        :return:
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever, name="webdriver-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv=None):
+    """
+    Serve the stub in foreground, e.g. as stand-in Appium server of a process
+    :param argv:
+    :return:
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in W3C WebDriver endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4444)
+    parser.add_argument("--elements", type=int, default=10, help="elements returned by find elements")
+    args = parser.parse_args(argv)
+    stub = WebDriverStub(host=args.host, port=args.port, elements_per_find=args.elements)
+    print(f"serving on {stub.url}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,43 @@ import os
 from collections import namedtuple
 import pytest
 from base.web_drivers import WebDriver
+from base.driver_pool import DriverPool, WarmDriverPool, get_worker_path
+from base.profiles import get_profile
+from base.attachments import get_attachment_pipeline
+from base.recorder import PageRecorder, ReplayServer, get_snapshot_dir
+from base.sharding import DurationHistory, select_shard
+from base.transport import get_transport_stats
+from base.device_farm import DeviceFarm, get_android_env
+from base import instrumentation
+from base import retries
+from base import logs
 from pages.home_page import HomePage
 from pages.search_results import SearchResults
 
+# setup + call + teardown seconds of tests run in this session, by node id
+_durations = {}
+_skipped = set()
+
+
+def pytest_addoption(parser):
+    """
+    Command line options to record pages visited by tests and replay them offline
+    :param parser:
+    :return:
+    """
+    group = parser.getgroup("snapshots", "record and replay page snapshots")
+    group.addoption("--record-pages", default=None, metavar="NAME",
+                    help="record visited pages under resources/snapshots/NAME")
+    group.addoption("--replay-pages", default=None, metavar="NAME",
+                    help="serve resources/snapshots/NAME locally and point config urls to it")
+    group = parser.getgroup("sharding", "split tests in shards balanced by their past durations")
+    group.addoption("--shard-id", type=int, default=int(os.environ.get("SHARD_ID", 0)),
+                    help="0 based shard to run (SHARD_ID)")
+    group.addoption("--shard-count", type=int, default=int(os.environ.get("SHARD_COUNT", 1)),
+                    help="number of shards (SHARD_COUNT), 1 runs everything")
+    group.addoption("--durations-file", default=os.environ.get("DURATIONS_FILE", ".test_durations.json"),
+                    help="rolling history of test durations, updated after every run")
+
 
 def pytest_configure(config):
     """
@@ -45,29 +79,378 @@ def pytest_configure(config):
         config.option.xmlpath = f"report.xml"
 
 
+def pytest_collection_modifyitems(config, items):
+    """
+    Keep only the tests of this shard, shards are balanced by past durations and ordered classes stay together
+    :param config:
+    :param items:
+    :return:
+    """
+    shard_count = config.getoption("shard_count")
+    if shard_count <= 1:
+        return
+    history = DurationHistory(config.getoption("durations_file"))
+    selected, deselected, loads = select_shard(items, history, config.getoption("shard_id"), shard_count)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
+    config._shard_loads = loads
+
+
+def pytest_report_collectionfinish(config, items):
+    """
+    Show estimated time of every shard
+    :param config:
+    :param items:
+    :return:
+    """
+    loads = getattr(config, "_shard_loads", None)
+    if loads:
+        estimates = ", ".join(f"{index}: {load:.1f}s" for index, load in enumerate(loads))
+        return f"shard {config.getoption('shard_id')} of {len(loads)}, estimated shards {estimates}"
+
+
+def pytest_runtest_logreport(report):
+    """
+    Add up duration of every stage of a test, reported by xdist workers too
+    :param report:
+    :return:
+    """
+    _durations[report.nodeid] = _durations.get(report.nodeid, 0.0) + report.duration
+    if report.skipped:
+        _skipped.add(report.nodeid)
+
+
+def pytest_sessionfinish(session):
+    """
+    Add durations of tests which ran to history used for sharding next runs, xdist workers instead hand their web
+    driver latency samples to the controller
+    :param session:
+    :return:
+    """
+    if hasattr(session.config, "workerinput"):
+        session.config.workeroutput["webdriver_metrics"] = instrumentation.get_session_metrics().export()
+        return
+    ran = {node_id: seconds for node_id, seconds in _durations.items() if node_id not in _skipped}
+    if ran:
+        history = DurationHistory(session.config.getoption("durations_file"))
+        for node_id, seconds in ran.items():
+            history.add(node_id, seconds)
+        history.save()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    """
+    Start a fresh web driver latency breakdown for every test and correlate log records with it, screenshots queued
+    by fixtures while setting up are attached to the test
+    :param item:
+    :return:
+    """
+    logs.set_current_test(item.nodeid)
+    instrumentation.start_test()
+    retries.start_test()
+    yield
+    get_attachment_pipeline().flush()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    """
+    Attach screenshots queued by fixtures while tearing down to the test, before the next one starts
+    :param item:
+    :return:
+    """
+    yield
+    get_attachment_pipeline().flush()
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    """
+    Write all log records of the test to its file before moving on
+    :param nodeid:
+    :param location:
+    :return:
+    """
+    logs.flush_logs()
+    logs.set_current_test(None)
+
+
+def pytest_unconfigure(config):
+    """
+    Stop log listener after writing remaining records
+    :param config:
+    :return:
+    """
+    logs.stop_logging()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """
+    Merge web driver latency samples of a finished xdist worker into the controller's session metrics
+    :param node:
+    :param error:
+    :return:
+    """
+    instrumentation.get_session_metrics().merge(getattr(node, "workeroutput", {}).get("webdriver_metrics", []))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_json_runtest_metadata(item, call):
+    """
+    Add test's web driver latency breakdown and retries to its metadata in json report
+    :param item:
+    :param call:
+    :return:
+    """
+    if call.when == "teardown":
+        return {"webdriver": instrumentation.get_test_metrics().summary(),
+                "webdriver_retries": retries.get_test_stats().summary()}
+    return {}
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_json_modifyreport(json_report):
+    """
+    Add session wide web driver latency summary (samples of xdist workers merged) and retries to json report,
+    retries are merged from the tests under xdist
+    :param json_report:
+    :return:
+    """
+    json_report["webdriver"] = instrumentation.get_session_metrics().summary()
+    json_report["webdriver_transport"] = get_transport_stats()
+    retried = retries.get_session_stats().summary()
+    if not retried:
+        for test in json_report.get("tests", []):
+            for locator, stats in test.get("metadata", {}).get("webdriver_retries", {}).items():
+                merged = retried.setdefault(locator, {"retries": 0, "lost_ms": 0.0, "classes": {}})
+                merged["retries"] += stats["retries"]
+                merged["lost_ms"] = round(merged["lost_ms"] + stats["lost_ms"], 3)
+                for kind, count in stats["classes"].items():
+                    merged["classes"][kind] = merged["classes"].get(kind, 0) + count
+    json_report["webdriver_retries"] = retried
+
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Print session wide web driver latency summary table, connection reuse of remote sessions and retried locators
+    :param terminalreporter:
+    :return:
+    """
+    summary = instrumentation.get_session_metrics().summary()
+    if summary:
+        terminalreporter.write_sep("-", "web driver latency")
+        terminalreporter.write_line(instrumentation.format_table(summary))
+    for server, stats in get_transport_stats().items():
+        terminalreporter.write_line(f"transport {server}: {stats['requests']} commands over "
+                                    f"{stats['connections']} connections")
+    retried = retries.get_session_stats().summary()
+    if retried:
+        terminalreporter.write_sep("-", "web driver retries")
+        terminalreporter.write_line(retries.format_table(retried))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """
+    Record the page a test ended on and wait for its queued screenshots to be attached before it is reported
+    :param item:
+    :return:
+    """
+    yield
+    web_driver = item.funcargs.get("web_driver")
+    if web_driver is not None and web_driver.recorder is not None:
+        web_driver.record_page()
+    get_attachment_pipeline().flush()
+
+
 @pytest.fixture(autouse=True, scope="session")
-def resources():
+def resources(request):
+    """
+    resources Fixture with all Url, urls point to local replay server when run with --replay-pages
+    :param request
+    :return:
+    """
+    config = get_resource_config()
+    replay = request.config.getoption("replay_pages")
+    if replay is None:
+        yield config
+        return
+
+    server = ReplayServer(get_snapshot_dir(replay)).start()
+    for name, url in vars(config.url).items():
+        setattr(config.url, name, server.url_for(url))
+    yield config
+    server.stop()
+
+
+@pytest.fixture(autouse=True, scope="session")
+def attachment_pipeline(resources):
+    """
+    Fixture to configure the background screenshot pipeline from config
+    :param resources
+    :return:
+    """
+    pipeline = get_attachment_pipeline()
+    pipeline.configure(
+        image_format=resources.screenshots.format,
+        max_width=resources.screenshots.max_width,
+        quality=resources.screenshots.quality,
+        save_to_disk=resources.screenshots.save_to_disk,
+    )
+    yield pipeline
+    pipeline.flush()
+
+
+@pytest.fixture(scope='session')
+def driver_factory(request, resources):
+    """
+    Fixture to create web drivers of this worker as configured, taking a slot number and optional user data dir
+    Session profile comes from driver.profile (WEBDRIVER_PROFILE overrides it), disk cache is kept per slot
+    With WEBDRIVER_REUSE_SESSION=1 browsers are kept open after the run and reattached by the next one
+    :param request
+    :param resources
+    :return:
+    """
+    browser = resources.driver.browser
+    record = request.config.getoption("record_pages")
+    recorder = PageRecorder(get_snapshot_dir(record)) if record else None
+    profile = get_profile(os.environ.get("WEBDRIVER_PROFILE", resources.driver.profile))
+    reuse_sessions = os.environ.get("WEBDRIVER_REUSE_SESSION", "0").lower() in ("1", "true", "yes")
+
+    def _factory(slot, user_data_dir=None, reuse=reuse_sessions):
+        slot_profile = profile._replace(user_data_dir=user_data_dir or profile.user_data_dir)
+        if profile.disk_cache_dir:
+            slot_profile = slot_profile._replace(disk_cache_dir=get_worker_path(profile.disk_cache_dir, slot=slot))
+        return WebDriver(
+            browser=browser,
+            download_path=get_worker_path("downloaded_files", slot=slot) + "/",
+            screenshot_path=get_worker_path("screenshots", slot=slot),
+            cache_elements=resources.driver.cache_elements,
+            recorder=recorder,
+            profile=slot_profile,
+            reuse_session=os.path.join(get_worker_path(".webdriver_sessions", slot=slot), "session.json")
+            if reuse else None,
+        )
+
+    return _factory
+
+
+@pytest.fixture(scope='session')
+def warm_pool(driver_factory, resources):
+    """
+    Fixture to keep driver.warm_pool browsers (WARM_POOL_SIZE overrides it, default 0 is off) started in background
+    from a clean cached profile template, so getting a new browser does not wait for its startup
+    Not used when sessions are reused, reattaching is faster still
+    :param driver_factory
+    :param resources
+    :return: WarmDriverPool or None
+    """
+    size = int(os.environ.get("WARM_POOL_SIZE", resources.driver.warm_pool))
+    if size < 1 or os.environ.get("WEBDRIVER_REUSE_SESSION", "0").lower() in ("1", "true", "yes"):
+        yield None
+        return
+    pool = WarmDriverPool(
+        factory=driver_factory,
+        size=size,
+        template_dir=os.path.join(os.getcwd(), "browser_profiles", f"template_{resources.driver.browser}"),
+    ).start()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope='session')
+def driver_pool(driver_factory, warm_pool, resources):
+    """
+    Fixture to initialise the web driver pool of this worker, size can be overridden by DRIVER_POOL_SIZE
+    New drivers are taken from warm pool when it is enabled
+    :param driver_factory
+    :param warm_pool
+    :param resources
+    :return:
+    """
+    size = os.environ.get("DRIVER_POOL_SIZE", resources.driver.pool_size)
+    if warm_pool is None:
+        pool = DriverPool(factory=driver_factory, size=size)
+    else:
+        pool = DriverPool(factory=lambda slot: warm_pool.checkout(), size=size,
+                          destroy=lambda driver: warm_pool.release(driver, wait=True))
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def fresh_web_driver(driver_factory, warm_pool):
     """
-    resources Fixture with all Url
+    Fixture to get a brand new browser for one test, quit after it
+    :param driver_factory
+    :param warm_pool
     :return:
     """
-    return get_resource_config()
+    if warm_pool is None:
+        driver = driver_factory("fresh", reuse=False)
+        yield driver
+        driver.quit()
+    else:
+        with warm_pool.driver() as driver:
+            yield driver
 
 
 @pytest.fixture(scope='session')
-def web_driver():
+def web_driver(driver_pool):
     """
-    Fixture to initialise the web driver
+    Fixture to checkout the web driver from pool for the session
+    :param driver_pool
     :return:
     """
-    driver = WebDriver(browser='chrome')
+    driver = driver_pool.checkout()
     yield driver
     try:
-        driver.driver.close()
+        driver_pool.checkin(driver, discard=not driver_pool.is_healthy(driver))
     except (Exception, ValueError):
         pass
 
 
+@pytest.fixture(scope="module")
+def stub():
+    """
+    Fixture to serve a local stand-in WebDriver endpoint, with three elements per find and rows per listing
+    Stub is imported only when a test uses it, so test runs do not depend on the benchmarks folder otherwise
+    :return:
+    """
+    from benchmarks.webdriver_stub import WebDriverStub
+
+    with WebDriverStub(elements_per_find=3) as _stub:
+        yield _stub
+
+
+@pytest.fixture(scope='session')
+def device_farm():
+    """
+    Fixture to discover attached Android devices, each device gets its own Appium server and ports
+    :return:
+    """
+    farm = DeviceFarm(chromedriver="/usr/local/bin/chromedriver", cache_file=".device_cache.json",
+                      env=get_android_env())
+    yield farm
+    farm.stop()
+
+
+@pytest.fixture(scope='session')
+def android_web_driver(device_farm):
+    """
+    Fixture to get an Android driver on the device of this worker, run with `-n <devices>` to use all of them
+    :param device_farm
+    :return:
+    """
+    device = device_farm.get_device(os.environ.get("PYTEST_XDIST_WORKER"))
+    device_farm.start([device])
+    driver = WebDriver(browser="android", device=device)
+    yield driver
+    driver.quit()
+
+
 @pytest.fixture(scope='session')
 def pages(web_driver):
     """
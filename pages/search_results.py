@@ -1,6 +1,25 @@
 __author__ = "sarvesh.singh"
 
-from base.common import dict_to_ns, basic_logging
+from itertools import count
+from collections import namedtuple
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+from base.common import basic_logging
+from base.locators import Locators
+
+SearchResult = namedtuple("SearchResult", ["page", "position", "name", "price"])
+
+
+def get_page_url(url, page):
+    """
+    Url of a result page, same search with its page query parameter set
+    :param url:
+    :param page: 1 based
+    :return:
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    query["page"] = [str(page)]
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
 
 
 class SearchResults:
@@ -8,31 +27,84 @@ class SearchResults:
     Class for contains methods of Search Results Page
     """
 
+    locators = Locators(
+        resultsName="//*[@class='_2cLu-l']",
+        resultsPrice="%s/../a[3]/div/div[1]",
+        searchResultsPage="//span[contains(text(), 'Showing ')]",
+    )
+
     def __init__(self, web_driver):
         """
-        To Initialize the locators of Search Results page
+        To Initialize the Search Results page
         :param web_driver
         """
         self.webDriver = web_driver
-        self.locators = dict_to_ns({
-            "resultsName": "//*[@class='_2cLu-l']",
-            "resultsPrice": "%s/../a[3]/div/div[1]",
-            "searchResultsPage": "//span[contains(text(), 'Showing ')]",
-        })
         self.logger = basic_logging(name="SEARCH", level='INFO')
 
+    def get_search_results(self):
+        """
+        Get name and price of every search result, read in a single round trip
+        :return: list of {'name': .., 'price': ..}
+        """
+        self.webDriver.explicit_visibility_of_element(element=self.locators.searchResultsPage, time_out=60)
+        return self.extract_page()
+
+    def extract_page(self, web_driver=None):
+        """
+        Name and price of every result of page in current tab, read in one round trip without waiting for results
+        (last page has none)
+        :param web_driver: default this page's driver
+        :return: list of {'name': .., 'price': ..}
+        """
+        return (web_driver or self.webDriver).extract_records(element=self.locators.resultsName, fields={
+            "name": ".",
+            "price": self.locators.resultsPrice.format("."),
+        })
+
+    def crawl(self, max_pages=None, prefetch=2, url=None):
+        """
+        Walk result pages from the current one in page order, the current page is read from the current tab while next
+        pages load in background tabs
+        Stops at the first page without results
+        :param max_pages:
+        :param prefetch: pages loading in background tabs
+        :param url: search results url, opened in current tab when it is not the current one
+        :return: generator of SearchResult
+        """
+        if url and url != self.webDriver.driver.current_url:
+            self.webDriver.open_website(url)
+        url = self.webDriver.driver.current_url
+        first = int(parse_qs(urlparse(url).query).get("page", ["1"])[0])
+        pages = count(first + 1) if max_pages is None else range(first + 1, first + max_pages)
+        urls = (get_page_url(url, page) for page in pages)
+        crawled = self.webDriver.crawl_pages(urls, self.extract_page, prefetch, current=True)
+        for page, (_, records) in enumerate(crawled, first):
+            if not records:
+                break
+            for position, record in enumerate(records, 1):
+                yield SearchResult(page=page, position=position, name=record["name"], price=record["price"])
+
+    def stream_search_results(self, batch_size=100, max_items=None):
+        """
+        Stream name and price of search results of a lazy loaded listing, scrolling till no more results come
+        :param batch_size:
+        :param max_items:
+        :return: generator of {'name': .., 'price': ..}
+        """
+        self.webDriver.explicit_visibility_of_element(element=self.locators.searchResultsPage, time_out=60)
+        for batch in self.webDriver.harvest(element=self.locators.resultsName, batch_size=batch_size,
+                                            max_items=max_items, fields={
+                                                "name": ".",
+                                                "price": self.locators.resultsPrice.format("."),
+                                            }):
+            yield from batch
+
     def print_search_results(self):
         """
         print the search results in console
         :return:
         """
-        self.webDriver.explicit_visibility_of_element(element=self.locators.searchResultsPage, locator_type='xpath',
-                                                      time_out=60)
-        results_name = self.webDriver.get_elements(element=self.locators.resultsName, locator_type='xpath')
-        results_price = self.webDriver.get_elements(element=self.locators.resultsPrice % self.locators.resultsName,
-                                                    locator_type='xpath')
-        for _result in results_name:
-            name = _result.text
-            index = results_name.index(_result)
-            price = results_price[index].text
-            self.logger.info(f'Device Name - {name} | Price - {price}')
+        results = self.get_search_results()
+        for _result in results:
+            self.logger.info(f'Device Name - {_result["name"]} | Price - {_result["price"]}')
+        return results
@@ -0,0 +1,213 @@
+__author__ = "sarvesh.singh"
+
+import time
+import threading
+from pathlib import Path
+import pytest
+from base.driver_pool import DriverPool, WarmDriverPool, get_worker_path
+
+
+class FakeDriver:
+    """
+    Stand-in for WebDriver so pool can be tested without a browser
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.alive = True
+        self.quit_count = 0
+
+    def is_alive(self):
+        return self.alive
+
+    def quit(self):
+        self.quit_count += 1
+
+
+@pytest.mark.POOL
+class TestDriverPool:
+    """
+    This suite is created to test the per worker web driver pool
+    """
+
+    def test_01_reuse_returned_driver(self):
+        """
+        Returned driver should be handed out again instead of creating a new one
+        :return:
+        """
+        pool = DriverPool(factory=FakeDriver, size=2)
+        driver = pool.checkout()
+        pool.checkin(driver)
+        assert pool.checkout() is driver
+        assert pool.busy_count == 1
+
+    def test_02_unhealthy_driver_replaced(self):
+        """
+        Dead driver sitting idle in pool should be quit and replaced on the same slot
+        :return:
+        """
+        pool = DriverPool(factory=FakeDriver, size=1)
+        driver = pool.checkout()
+        pool.checkin(driver)
+        driver.alive = False
+        new_driver = pool.checkout()
+        assert new_driver is not driver
+        assert new_driver.slot == driver.slot
+        assert driver.quit_count == 1
+
+    def test_03_checkout_waits_for_checkin(self):
+        """
+        Checkout on a full pool should block till another thread returns a driver
+        :return:
+        """
+        pool = DriverPool(factory=FakeDriver, size=1)
+        driver = pool.checkout()
+        with pytest.raises(Exception, match="in time"):
+            pool.checkout(timeout=0.05)
+        timer = threading.Timer(0.05, pool.checkin, args=(driver,))
+        timer.start()
+        assert pool.checkout(timeout=5) is driver
+        timer.join()
+
+    def test_04_concurrent_checkouts_get_distinct_slots(self):
+        """
+        Drivers checked out concurrently should each own a distinct slot
+        :return:
+        """
+        pool = DriverPool(factory=FakeDriver, size=4)
+        drivers = []
+        threads = [threading.Thread(target=lambda: drivers.append(pool.checkout())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(driver.slot for driver in drivers) == [0, 1, 2, 3]
+
+    def test_05_close_quits_drivers(self):
+        """
+        Closing pool should quit idle drivers now and busy drivers on checkin
+        :return:
+        """
+        pool = DriverPool(factory=FakeDriver, size=2)
+        idle, busy = pool.checkout(), pool.checkout()
+        pool.checkin(idle)
+        pool.close()
+        assert idle.quit_count == 1
+        pool.checkin(busy)
+        assert busy.quit_count == 1
+        with pytest.raises(Exception, match="closed"):
+            pool.checkout()
+
+    def test_06_worker_path_isolated(self, tmp_path, monkeypatch):
+        """
+        Each xdist worker and slot should get its own folder
+        :param tmp_path
+        :param monkeypatch
+        :return:
+        """
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw1")
+        path = get_worker_path("downloaded_files", slot=3)
+        assert path == str(tmp_path / "downloaded_files" / "gw1" / "slot_3")
+
+    def test_07_warm_pool_refills(self, tmp_path):
+        """
+        Warm pool should keep its drivers started and replace every checked out one in background
+        :param tmp_path
+        :return:
+        """
+        pool = WarmDriverPool(factory=lambda number, user_data_dir: FakeDriver(number), size=2,
+                              work_dir=tmp_path).start()
+        first = pool.checkout(timeout=5)
+        deadline = time.monotonic() + 5
+        while pool.ready_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.ready_count == 2
+        pool.release(first, wait=True)
+        assert first.quit_count == 1
+        pool.close()
+        assert pool.ready_count == 0
+
+    def test_08_warm_pool_profile_template(self, tmp_path):
+        """
+        Template should be built once from a browser quit before any test used it, state of released drivers should
+        never get into it nor into later drivers
+        :param tmp_path
+        :return:
+        """
+        def _factory(number, user_data_dir):
+            driver = FakeDriver(number)
+            driver.profile = Path(user_data_dir)
+            (driver.profile / "SingletonLock").write_text("locked")
+            if not (driver.profile / "Local State").exists():
+                (driver.profile / "Local State").write_text(f"created by {number}")
+            return driver
+
+        template = tmp_path / "template"
+        pool = WarmDriverPool(factory=_factory, size=1, work_dir=tmp_path / "work", template_dir=template).start()
+        first = pool.checkout(timeout=5)
+        assert (first.profile / "Local State").read_text() == "created by template"
+        (first.profile / "Cookies").write_text("logged in")
+        pool.release(first, wait=True)
+        assert not first.profile.exists()
+        assert sorted(path.name for path in template.iterdir()) == ["Local State"]
+        assert not (pool.checkout(timeout=5).profile / "Cookies").exists()
+        pool.close()
+        pool = WarmDriverPool(factory=_factory, size=1, work_dir=tmp_path / "next", template_dir=template).start()
+        assert (pool.checkout(timeout=5).profile / "Local State").read_text() == "created by template"
+        pool.close()
+
+    def test_09_warm_pool_startup_error(self, tmp_path):
+        """
+        Failure to start a browser should be raised to the one waiting for it
+        :param tmp_path
+        :return:
+        """
+        def _factory(number, user_data_dir):
+            raise Exception("no browser")
+
+        pool = WarmDriverPool(factory=_factory, size=1, work_dir=tmp_path).start()
+        with pytest.raises(Exception, match="no browser"):
+            pool.checkout(timeout=5)
+        pool.close()
+
+    def test_10_pool_releases_warm_drivers(self, tmp_path):
+        """
+        Drivers of a pool fed by warm pool should be released to it, removing their profiles
+        :param tmp_path
+        :return:
+        """
+        warm_pool = WarmDriverPool(factory=lambda number, user_data_dir: FakeDriver(number), size=1,
+                                   work_dir=tmp_path / "work", template_dir=tmp_path / "template").start()
+        pool = DriverPool(factory=lambda slot: warm_pool.checkout(timeout=5), size=1,
+                          destroy=lambda driver: warm_pool.release(driver, wait=True))
+        driver = pool.checkout()
+        pool.checkin(driver, discard=True)
+        assert driver.quit_count == 1 and warm_pool._checked_out == {}
+        pool.checkin(pool.checkout())
+        pool.close()
+        warm_pool.close()
+        assert warm_pool._checked_out == {} and list((tmp_path / "work").iterdir()) == []
+
+    def test_11_warm_pool_reuses_numbers(self, tmp_path):
+        """
+        Numbers (and so profile folders) of released drivers should be reused instead of growing with every driver
+        :param tmp_path
+        :return:
+        """
+        numbers = []
+
+        def _factory(number, user_data_dir):
+            numbers.append(number)
+            return FakeDriver(number)
+
+        pool = WarmDriverPool(factory=_factory, size=1, work_dir=tmp_path / "work",
+                              template_dir=tmp_path / "template").start()
+        for _ in range(5):
+            pool.release(pool.checkout(timeout=5), wait=True)
+        deadline = time.monotonic() + 5
+        while pool.ready_count < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.close()
+        assert len(numbers) >= 6 and set(numbers) <= {"template", 1, 2}
+        assert list((tmp_path / "work").iterdir()) == []
@@ -0,0 +1,125 @@
+__author__ = "sarvesh.singh"
+
+import time
+from itertools import islice
+import pytest
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
+from base.waits import WaitPolicy, network_idle, element_stable
+from base.web_drivers import WebDriver
+
+
+@pytest.mark.WAITS
+class TestWaitPolicy:
+    """
+    This suite is created to test the condition based wait engine
+    """
+
+    def test_01_returns_as_soon_as_condition_holds(self):
+        """
+        Wait should return the condition's value on the poll it becomes truthy
+        :return:
+        """
+        calls = []
+
+        def _condition(_):
+            calls.append(1)
+            return len(calls) == 3 and "done"
+
+        start = time.monotonic()
+        assert WaitPolicy(timeout=5, poll=0.01).until(_condition) == "done"
+        assert len(calls) == 3
+        assert time.monotonic() - start < 1
+
+    def test_02_intervals_back_off_and_respect_budget(self):
+        """
+        Polling interval should grow by backoff factor, stay capped and never sleep past the timeout
+        :return:
+        """
+        policy = WaitPolicy(timeout=5, poll=0.01, max_poll=0.04, backoff=2)
+        assert list(islice(policy.intervals(), 5)) == [0.01, 0.02, 0.04, 0.04, 0.04]
+        intervals = WaitPolicy(timeout=0.05, poll=1).intervals()
+        assert next(intervals) <= 0.05
+        time.sleep(0.05)
+        assert next(intervals, None) is None
+
+    def test_03_timeout_and_transient_exceptions(self):
+        """
+        Transient exceptions should be retried, timeout should raise or return False with holds
+        :return:
+        """
+
+        def _condition(_):
+            raise StaleElementReferenceException("stale")
+
+        policy = WaitPolicy(timeout=0.05, poll=0.01)
+        with pytest.raises(TimeoutException, match="never"):
+            policy.until(_condition, message="never")
+        assert policy.holds(_condition) is False
+        assert policy.budget(None) is policy
+        assert policy.budget(1).timeout == 1
+
+    def test_04_network_idle(self):
+        """
+        Network idle should hold only once resource count stayed same for idle time
+        :return:
+        """
+
+        class FakeDriver:
+            counts = iter([1, 2, 2, 2, 2, 2, 2, 2])
+
+            def execute_script(self, _):
+                return ["complete", next(self.counts)]
+
+        assert WaitPolicy(timeout=2, poll=0.01, max_poll=0.01).until(network_idle(0.02), driver=FakeDriver())
+
+    def test_05_element_stable(self):
+        """
+        Element should be returned only once it is at the same position on two polls, and enabled when clickable
+        :return:
+        """
+
+        class FakeElement:
+            enabled = iter([False, True])
+
+            def is_displayed(self):
+                return True
+
+            def is_enabled(self):
+                return next(self.enabled)
+
+        class FakeDriver:
+            element = FakeElement()
+            rects = iter([[0, 100, 10, 10], [0, 50, 10, 10], [0, 0, 10, 10], [0, 0, 10, 10], [0, 0, 10, 10]])
+            polls = 0
+
+            def find_element(self, *_):
+                self.polls += 1
+                return self.element
+
+            def execute_script(self, *_):
+                return next(self.rects)
+
+        driver = FakeDriver()
+        policy = WaitPolicy(timeout=2, poll=0.01, max_poll=0.01)
+        assert policy.until(element_stable(("xpath", "//a"), clickable=True), driver=driver) is driver.element
+        assert driver.polls == 5
+
+    def test_06_short_timeout_with_absent_element(self, stub):
+        """
+        Element waits should poll without implicit wait, so a short timeout is honoured when element never appears
+        :param stub
+        :return:
+        """
+        stub.state.absent.add("//missing")
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        driver.set_implicit_wait(1)
+        start = time.monotonic()
+        with pytest.raises(TimeoutException):
+            driver.explicit_visibility_of_element("//missing", "xpath", time_out=0.2)
+        with pytest.raises(TimeoutException):
+            driver.explicit_check_element_is_clickable("//missing", "xpath", time_out=0.2)
+        assert not driver.wait_till_element_appear_on_screen("//missing", "xpath", timeout=0.2)
+        assert time.monotonic() - start < 1
+        assert stub.state.sessions[driver.driver.session_id]["implicit"] == 1
+        stub.state.absent.clear()
+        driver.quit()
@@ -0,0 +1,174 @@
+__author__ = "sarvesh.singh"
+
+import os
+import hashlib
+import pytest
+from base import instrumentation
+from base.web_drivers import WebDriver
+from pages.search_results import SearchResults
+from base.transport import get_transport_stats
+from benchmarks.bench_webdriver import compare
+
+
+@pytest.mark.STUB
+class TestWebDriverStub:
+    """
+    This suite is created to test the web driver wrapper against the local stub endpoint
+    """
+
+    def test_01_actions_round_trips(self, stub):
+        """
+        Wrapper actions should work over the wire and send the expected number of commands
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        driver.open_website("http://stub.local/")
+        commands = stub.state.commands
+        driver.set_text("//input", "xpath", "apple")
+        assert driver.get_value_from_textbox("//input", "xpath") == ""
+        assert driver.get_text("//span", "xpath") == "text of //span"
+        assert stub.state.commands - commands == 6
+        driver.quit()
+
+    def test_02_session_profile_capabilities(self, stub):
+        """
+        Remote session should be requested with the profile's options and page should be ready once DOM is parsed
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port,
+                           profile={"extends": "headless", "disk_cache_dir": "/tmp/cache"})
+        requested = stub.state.sessions[driver.driver.session_id]["requested"]["desiredCapabilities"]
+        assert requested["pageLoadStrategy"] == "eager" and requested["acceptInsecureCerts"] is True
+        assert {"--headless", "--disk-cache-dir=/tmp/cache"} <= set(requested["goog:chromeOptions"]["args"])
+        assert requested["goog:chromeOptions"]["prefs"] == {
+            "download.default_directory": driver.download_path, "profile.managed_default_content_settings.images": 2}
+        commands = stub.state.commands
+        driver.open_website("http://stub.local/")
+        assert stub.state.commands - commands == 2
+        driver.quit()
+
+    def test_03_reattach_saved_session(self, stub, tmp_path):
+        """
+        Session saved on quit should be reattached by next driver, a dead one should be replaced by a new session
+        :param stub
+        :param tmp_path
+        :return:
+        """
+        state_file = tmp_path / "session.json"
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, reuse_session=state_file)
+        session_id = driver.driver.session_id
+        driver.quit()
+        assert session_id in stub.state.sessions and state_file.is_file()
+
+        sessions = len(stub.state.sessions)
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, reuse_session=state_file)
+        assert driver.driver.session_id == session_id and len(stub.state.sessions) == sessions
+        driver.quit()
+
+        stub.state.sessions.pop(session_id)
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, reuse_session=state_file)
+        assert driver.driver.session_id != session_id
+        driver.session_store = None
+        driver.quit()
+        assert driver.driver.session_id not in stub.state.sessions
+
+    def test_04_pooled_transport(self, stub):
+        """
+        Sessions should share keep-alive connections and pipelined operations should return in order, accounted to
+        the calling test under the pipeline call
+        :param stub
+        :return:
+        """
+        transport = {"pool_maxsize": 3, "pipelining": True}
+        before = get_transport_stats().get(f"{stub.host}:{stub.port}", {"connections": 0, "requests": 0})
+        drivers = [WebDriver(browser="chrome", remote=stub.host, port=stub.port, transport=transport)
+                   for _ in range(2)]
+        for driver in drivers:
+            for _ in range(10):
+                driver.get_text("//span", "xpath")
+        instrumentation.start_test()
+        texts = drivers[0].pipeline(*[lambda d, n=n: d.get_text(f"//span[{n}]", "xpath") for n in range(6)])
+        assert texts == [f"text of //span[{n}]" for n in range(6)]
+        summary = instrumentation.get_test_metrics().summary()
+        assert set(summary["method"]) == {"pipeline"} and summary["method"]["pipeline"]["count"] == 1
+        assert summary["command"]["getElementText"]["count"] == 6
+        stats = get_transport_stats()[f"{stub.host}:{stub.port}"]
+        assert stats["requests"] - before["requests"] > 50 and stats["connections"] - before["connections"] <= 3
+        for driver in drivers:
+            driver.quit()
+
+    def test_05_chunked_grid_download(self, stub, tmp_path):
+        """
+        Grid download should be streamed in chunks to disk and checked for size and hash
+        :param stub
+        :param tmp_path
+        :return:
+        """
+        content = os.urandom(250000)
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, download_path="/node/downloads")
+        stub.state.files["/node/downloads/report.csv"] = content
+        assert driver.grid_download_verification("report.csv") and not driver.grid_download_verification("x.csv")
+        commands = stub.state.commands
+        result = driver.download_file("report.csv", str(tmp_path / "report.csv"), chunk_size=100000,
+                                      expected_sha256=hashlib.sha256(content).hexdigest())
+        assert (tmp_path / "report.csv").read_bytes() == content and result.size == len(content)
+        assert stub.state.commands - commands == 7
+        with pytest.raises(Exception, match="Checksum"):
+            driver.download_file("report.csv", str(tmp_path / "bad.csv"), expected_sha256="0" * 64)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["report.csv"]
+        driver.quit()
+
+    def test_06_compare_flags_regressions(self):
+        """
+        Benchmark comparison should flag slower operations and extra commands
+        :return:
+        """
+        baseline = {"results": {"click": {"mean_us": 100, "commands_per_op": 2},
+                                "get_text": {"mean_us": 100, "commands_per_op": 2}}}
+        current = {"results": {"click": {"mean_us": 150, "commands_per_op": 2},
+                               "get_text": {"mean_us": 100, "commands_per_op": 3}}}
+        _, regressions = compare(current, baseline, threshold=0.2)
+        assert regressions == ["click", "get_text"]
+
+    def test_07_harvest_streams_batches(self, stub):
+        """
+        Lazy loaded listing should be streamed in batches, one round trip per batch, collector removed at the end
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        commands = stub.state.commands
+        results = list(SearchResults(driver).stream_search_results())
+        assert results == [{"name": f"name {row}", "price": f"price {row}"} for row in range(9)]
+        # visibility wait (implicit wait off, find, displayed, implicit wait back on), install, 4 batches, removal
+        assert stub.state.commands - commands == 10 and stub.state.harvests == {}
+        batches = list(driver.harvest("//li", "xpath", fields={"name": "."}, key="name", max_items=4))
+        assert batches == [[{"name": "name 0"}, {"name": "name 1"}, {"name": "name 2"}], [{"name": "name 3"}]]
+        assert stub.state.harvests == {}
+        driver.quit()
+
+    def test_08_crawl_prefetches_pages(self, stub):
+        """
+        Result pages should be read in page order, first one from current tab and next ones from background tabs,
+        stopping at first empty page
+        :param stub
+        :return:
+        """
+        stub.state.result_pages = 4
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        driver.open_website("http://stub.local/search?q=apple")
+        session = stub.state.sessions[driver.driver.session_id]
+        results = list(SearchResults(driver).crawl(prefetch=2))
+        assert [(result.page, result.position, result.name) for result in results] == [
+            (page, row + 1, f"name {page}-{row}") for page in range(1, 5) for row in range(3)]
+        # tabs opened for pages 2 to 5 (empty) and the 3 loading after it when it was read, none for page 1
+        assert session["opened"] == 1 + 7
+        assert driver.driver.window_handles == ["window-1"] and driver.get_current_window() == "window-1"
+        results = SearchResults(driver).crawl(prefetch=3)
+        assert next(results).page == 1
+        results.close()
+        assert driver.driver.window_handles == ["window-1"]
+        stub.state.result_pages = None
+        driver.quit()
@@ -0,0 +1,65 @@
+__author__ = "sarvesh.singh"
+
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pytest
+import requests
+from base.recorder import PageRecorder, ReplayServer
+
+PAGE = """<html><head><link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script></head>
+<body><img src="/static/logo.png?v=1&amp;s=2"><a href="/search?q=apple">Search</a></body></html>"""
+
+
+@pytest.fixture(scope="module")
+def origin(tmp_path_factory):
+    """
+    Fixture to serve a small site (stylesheet with a font, image) as the recorded origin
+    :param tmp_path_factory
+    :return:
+    """
+    site = tmp_path_factory.mktemp("site")
+    (site / "static").mkdir()
+    (site / "static" / "site.css").write_text("body { background: url('bg.png'); }")
+    (site / "static" / "bg.png").write_bytes(b"background")
+    (site / "static" / "logo.png").write_bytes(b"logo")
+    handler = functools.partial(type("Quiet", (SimpleHTTPRequestHandler,), {"log_message": lambda *args: None}),
+                                directory=str(site))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.RECORDER
+class TestRecorder:
+    """
+    This suite is created to test recording of pages and serving them back offline
+    """
+
+    def test_01_record_and_replay(self, origin, tmp_path):
+        """
+        Recorded page and its assets should be served by replay server without the origin
+        :param origin
+        :param tmp_path
+        :return:
+        """
+        recorder = PageRecorder(tmp_path)
+        recorder.save_page(f"{origin}/", PAGE)
+        recorder.save_page(f"{origin}/search?q=apple", "<html><body>results</body></html>")
+        assert len(recorder.manifest["assets"]) == 3
+
+        server = ReplayServer(tmp_path).start()
+        try:
+            home = requests.get(server.url_for(f"{origin}/"))
+            assert home.status_code == 200 and "<script" not in home.text and "/static/" not in home.text
+            css_path = home.text.split('href="')[1].split('"')[0]
+            css = requests.get(server.url_for(origin) + css_path).text
+            background = css.split("url(")[1].split(")")[0]
+            assert requests.get(server.url_for(origin) + background).content == b"background"
+            assert requests.get(server.url_for(f"{origin}/search?q=apple&page=1")).text.endswith("results</body></html>")
+            assert requests.get(server.url_for(f"{origin}/cart")).status_code == 404
+            assert server.url_for("https://elsewhere.example/") == "https://elsewhere.example/"
+        finally:
+            server.stop()
@@ -0,0 +1,73 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from json import dumps as json_dumps
+from base.sharding import DurationHistory, partition, select_shard
+
+
+class FakeItem:
+    """
+    Stand-in for a collected pytest item
+    """
+
+    def __init__(self, node_id, ordered=False):
+        self.nodeid = node_id
+        self.cls = object if "::Test" in node_id else None
+        self.ordered = ordered
+
+    def get_closest_marker(self, name):
+        return self.ordered if name == "run" and self.ordered else None
+
+
+@pytest.mark.SHARDING
+class TestSharding:
+    """
+    This suite is created to test duration balanced sharding of tests
+    """
+
+    def test_01_longest_first_packing(self):
+        """
+        Groups should be packed so that shard loads are balanced
+        :return:
+        """
+        weights = {"a": 8, "b": 7, "c": 6, "d": 5, "e": 4}
+        shards, loads = partition(list(weights), weights, 2)
+        assert shards == [{"a", "d", "e"}, {"b", "c"}]
+        assert loads == [17, 13]
+
+    def test_02_history_from_report(self, tmp_path):
+        """
+        Durations of all stages should be read from json report, keeping only latest runs
+        :param tmp_path
+        :return:
+        """
+        report = tmp_path / "report.json"
+        report.write_text(json_dumps({"tests": [
+            {"nodeid": "t::a", "outcome": "passed", "setup": {"duration": 1}, "call": {"duration": 2},
+             "teardown": {"duration": 0.5}},
+            {"nodeid": "t::b", "outcome": "skipped", "setup": {"duration": 0.1}},
+        ]}))
+        history = DurationHistory(str(tmp_path / "history.json"), window=2)
+        for _ in range(3):
+            assert history.update_from_report(str(report)) == 1
+        history.save()
+        history = DurationHistory(str(tmp_path / "history.json"))
+        assert history.durations == {"t::a": [3.5, 3.5]}
+        assert history.estimate("t::unknown") == 3.5
+
+    def test_03_ordered_class_kept_together(self, tmp_path):
+        """
+        Tests of an ordered class should land in one shard and every test should run in exactly one shard
+        :param tmp_path
+        :return:
+        """
+        history = DurationHistory(str(tmp_path / "history.json"))
+        for node_id, seconds in {"f.py::TestFlow::test_01": 5, "f.py::TestFlow::test_02": 5, "u.py::test_a": 6,
+                                 "u.py::test_b": 3, "u.py::test_c": 1}.items():
+            history.add(node_id, seconds)
+        items = [FakeItem("f.py::TestFlow::test_01", ordered=True), FakeItem("f.py::TestFlow::test_02", ordered=True),
+                 FakeItem("u.py::test_a"), FakeItem("u.py::test_b"), FakeItem("u.py::test_c")]
+        first, second, loads = select_shard(items, history, 0, 2)
+        assert [item.nodeid for item in first] == ["f.py::TestFlow::test_01", "f.py::TestFlow::test_02"]
+        assert [item.nodeid for item in second] == ["u.py::test_a", "u.py::test_b", "u.py::test_c"]
+        assert loads == [10, 10]
@@ -0,0 +1,88 @@
+__author__ = "sarvesh.singh"
+
+import asyncio
+import pytest
+from selenium.common.exceptions import WebDriverException
+from benchmarks.webdriver_stub import WebDriverStub
+
+aiohttp = pytest.importorskip("aiohttp")
+from base.async_web_driver import AsyncWebDriver  # noqa: E402
+
+
+@pytest.mark.ASYNC
+class TestAsyncWebDriver:
+    """
+    This suite is created to test the asyncio web driver against the local stub endpoint
+    """
+
+    def test_01_concurrent_sessions(self, tmp_path):
+        """
+        Many sessions should be driven concurrently over one shared HTTP client
+        :param tmp_path
+        :return:
+        """
+
+        async def _flow(http, stub, number):
+            async with AsyncWebDriver("chrome", remote=stub.host, port=stub.port, http=http,
+                                      screenshot_path=str(tmp_path)) as driver:
+                await driver.open_website(f"http://stub.local/{number}")
+                await driver.set_text("searchBox", "name", "apple")
+                await driver.click("//button", "xpath")
+                elements = await driver.get_elements("//span", "xpath")
+                text = await driver.get_text("//span", "xpath")
+                attribute = await driver.execute_script("return (function(){})", elements[0], "text")
+                await driver.screen_shot(f"shot_{number}")
+                return await driver.current_url(), len(elements), text, attribute
+
+        async def _run():
+            with WebDriverStub(elements_per_find=3) as stub:
+                async with aiohttp.ClientSession() as http:
+                    results = await asyncio.gather(*(_flow(http, stub, number) for number in range(10)))
+                return results, stub.state.sessions
+
+        results, sessions = asyncio.run(_run())
+        assert results == [(f"http://stub.local/{number}", 3, "text of //span", "text of //span")
+                           for number in range(10)]
+        assert sessions == {} and len(list(tmp_path.iterdir())) == 10
+
+    def test_02_failed_start_cleans_up(self, monkeypatch):
+        """
+        A start failing after the session, or after the driver server, was started should end them and close the
+        private HTTP client before raising
+        :param monkeypatch
+        :return:
+        """
+
+        class FakeService:
+            returncode = None
+            terminated = False
+
+            def terminate(self):
+                self.terminated = True
+
+            async def wait(self):
+                return 0
+
+        service = FakeService()
+
+        async def _no_cdp(self, cmd, params):
+            raise WebDriverException("no devtools")
+
+        async def _no_service(self):
+            self._service = service
+            raise Exception("driver server did not start listening !!")
+
+        async def _run():
+            with WebDriverStub() as stub:
+                driver = AsyncWebDriver("chrome", remote=stub.host, port=stub.port, profile="fast")
+                with pytest.raises(WebDriverException, match="no devtools"):
+                    await driver.start()
+                sessions, http = dict(stub.state.sessions), driver.http
+            local = AsyncWebDriver("chrome")
+            with pytest.raises(Exception, match="did not start listening"):
+                await local.start()
+            return sessions, http, local.http
+
+        monkeypatch.setattr(AsyncWebDriver, "execute_cdp", _no_cdp)
+        monkeypatch.setattr(AsyncWebDriver, "_start_service", _no_service)
+        assert asyncio.run(_run()) == ({}, None, None) and service.terminated
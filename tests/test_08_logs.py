@@ -0,0 +1,41 @@
+__author__ = "sarvesh.singh"
+
+import threading
+import pytest
+from json import loads as json_loads
+from base import logs
+from base.common import basic_logging
+
+
+@pytest.mark.LOGS
+class TestLogs:
+    """
+    This suite is created to test the queued, per test structured logging
+    """
+
+    def test_01_handler_added_once(self):
+        """
+        Calling basic_logging again should not add another handler
+        :return:
+        """
+        logger = basic_logging(name="LOGS_TEST")
+        basic_logging(name="LOGS_TEST", level="DEBUG")
+        assert len(logger.handlers) == 1 and logger.level == 10
+
+    def test_02_records_in_test_file(self, request):
+        """
+        Records of test, also from other threads, should be JSON lines in its own file with its node id
+        :param request
+        :return:
+        """
+        logger = basic_logging(name="LOGS_TEST")
+        logger.info("from test")
+        thread = threading.Thread(target=logger.warning, args=("from thread %s", 1))
+        thread.start()
+        thread.join()
+        logs.flush_logs()
+        with open(logs.get_test_log_path(request.node.nodeid), "r") as _fp:
+            lines = [json_loads(line) for line in _fp]
+        assert [(line["level"], line["message"]) for line in lines] == [("INFO", "from test"),
+                                                                          ("WARNING", "from thread 1")]
+        assert {line["nodeid"] for line in lines} == {request.node.nodeid}
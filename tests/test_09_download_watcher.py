@@ -0,0 +1,99 @@
+__author__ = "sarvesh.singh"
+
+import os
+import time
+import threading
+import pytest
+from base.download_watcher import DownloadWatcher
+
+
+def _download(directory, name, chunks, delay=0.05):
+    """
+    Write a file the way chrome does: into a .crdownload partial renamed once complete
+    """
+    partial = os.path.join(directory, f"{name}.crdownload")
+    with open(partial, "wb") as _fp:
+        for _ in range(chunks):
+            _fp.write(b"x" * 1024)
+            _fp.flush()
+            time.sleep(delay)
+    os.rename(partial, os.path.join(directory, name))
+
+
+@pytest.mark.DOWNLOADS
+class TestDownloadWatcher:
+    """
+    This suite is created to test detection of completed downloads
+    """
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_01_concurrent_downloads(self, tmp_path, use_inotify):
+        """
+        Waiting on several downloads should return once all partials are renamed, not while they are written
+        :param tmp_path
+        :param use_inotify
+        :return:
+        """
+        with DownloadWatcher(tmp_path, use_inotify=use_inotify) as watcher:
+            threads = [threading.Thread(target=_download, args=(str(tmp_path), name, chunks))
+                       for name, chunks in (("a.csv", 4), ("b.pdf", 8))]
+            for thread in threads:
+                thread.start()
+            assert watcher.wait_for("a.csv", "b.pdf", timeout=0.1) is None
+            paths = watcher.wait_for("a.csv", "b.pdf", timeout=5)
+            assert os.path.getsize(paths["b.pdf"]) == 8 * 1024 and watcher.completed() == {"a.csv", "b.pdf"}
+            for thread in threads:
+                thread.join()
+
+    def test_02_stable_size_without_partial(self, tmp_path):
+        """
+        File written in place should only be complete after its size stopped changing
+        :param tmp_path
+        :return:
+        """
+        with DownloadWatcher(tmp_path, stable_time=0.3) as watcher:
+            with open(tmp_path / "report.txt", "wb") as _fp:
+                for _ in range(4):
+                    _fp.write(b"x")
+                    _fp.flush()
+                    time.sleep(0.1)
+                    assert "report.txt" not in watcher.completed()
+            assert watcher.wait_for("report.txt", timeout=3)
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_03_stale_files(self, tmp_path, use_inotify):
+        """
+        Files left from before watching should only be complete once written again, unless written since `since`
+        :param tmp_path
+        :param use_inotify
+        :return:
+        """
+        started = time.time()
+        (tmp_path / "new.csv").write_text("downloaded before watching started")
+        (tmp_path / "report.csv").write_text("left by an earlier run")
+        os.utime(tmp_path / "report.csv", (started - 3600, started - 3600))
+        with DownloadWatcher(tmp_path, stable_time=0.1, use_inotify=use_inotify, since=started) as watcher:
+            assert watcher.completed() == {"new.csv"} and watcher.wait_for("report.csv", timeout=0.3) is None
+            (tmp_path / "report.csv").write_text("downloaded again")
+            assert watcher.wait_for("report.csv", timeout=3)
+        assert watcher.mode == ("inotify" if use_inotify else "polling")
+
+    @pytest.mark.parametrize("use_inotify", [True, False])
+    def test_04_renamed_download(self, tmp_path, use_inotify):
+        """
+        Download saved as 'name (N).ext' because an earlier run left name in the folder should satisfy waiting for
+        name, while stale renamed copies should not
+        :param tmp_path
+        :param use_inotify
+        :return:
+        """
+        started = time.time()
+        for name in ("report.csv", "report (1).csv", "other (2).csv"):
+            (tmp_path / name).write_text("left by an earlier run")
+            os.utime(tmp_path / name, (started - 3600, started - 3600))
+        with DownloadWatcher(tmp_path, stable_time=0.1, use_inotify=use_inotify, since=started) as watcher:
+            assert watcher.wait_for("report.csv", timeout=0.3) is None
+            _download(str(tmp_path), "report (2).csv", 3, delay=0.01)
+            paths = watcher.wait_for("report.csv", timeout=3)
+            assert paths == {"report.csv": str(tmp_path / "report (2).csv")}
+            assert watcher.wait_for("other.csv", timeout=0.1) is None
@@ -0,0 +1,95 @@
+__author__ = "sarvesh.singh"
+
+import os
+import sys
+import time
+import signal
+import subprocess
+import socket
+import pytest
+from pathlib import Path
+from base import processes
+from base.processes import ProcessManager, http_ready
+
+PYTHON = sys.executable
+
+
+@pytest.mark.PROCESSES
+class TestProcesses:
+    """
+    This suite is created to test the managed subprocess layer
+    """
+
+    def test_01_run_many_concurrently(self):
+        """
+        Independent commands should run concurrently without a shell, hung ones killed on timeout
+        :return:
+        """
+        manager = ProcessManager()
+        start = time.monotonic()
+        results = manager.run_many({
+            number: [PYTHON, "-c", f"import time; time.sleep(0.5); print('done $HOME {number}')"]
+            for number in range(4)})
+        assert time.monotonic() - start < 1.5
+        assert [result.output for result in results.values()] == [f"done $HOME {number}" for number in range(4)]
+        with pytest.raises(Exception, match="did not finish"):
+            manager.run([PYTHON, "-c", "import time; time.sleep(30)"], timeout=0.5)
+        assert manager.run(["no-such-command"]).status == 127
+
+    def test_02_readiness_probe(self):
+        """
+        Server process should be used as soon as its status endpoint answers and stopped with the manager
+        :return:
+        """
+        with socket.socket() as _socket:
+            _socket.bind(("127.0.0.1", 0))
+            port = _socket.getsockname()[1]
+        manager = ProcessManager()
+        server = manager.start([PYTHON, "-m", "benchmarks.webdriver_stub", "--port", port], name="stub",
+                               cwd=str(Path(__file__).parent.parent))
+        status = http_ready(f"http://127.0.0.1:{port}/wd/hub/status", timeout=20, process=server)
+        assert status["value"]["ready"] and server.is_running()
+        manager.stop(name="stub")
+        assert not server.is_running() and "serving on" in server.result().output
+
+    def test_03_stop_process_tree_on_windows(self, monkeypatch):
+        """
+        On Windows the process tree should be ended with taskkill, forced only when it does not exit in time
+        :param monkeypatch
+        :return:
+        """
+        calls = []
+        run = subprocess.run
+
+        def _taskkill(cmd, **kwargs):
+            if cmd[0] != "taskkill":
+                return run(cmd, **kwargs)
+            calls.append(cmd)
+            if "/F" in cmd:
+                os.kill(int(cmd[-1]), signal.SIGKILL)
+
+        process = ProcessManager().start([PYTHON, "-c", "import time; time.sleep(30)"])
+        monkeypatch.setattr(processes, "WINDOWS", True)
+        monkeypatch.setattr(subprocess, "run", _taskkill)
+        process.stop(timeout=0.2)
+        assert not process.is_running()
+        pid = str(process.pid)
+        assert calls == [["taskkill", "/T", "/PID", pid], ["taskkill", "/T", "/F", "/PID", pid]]
+
+    def test_04_run_cmd_through_shell(self, tmp_path, monkeypatch):
+        """
+        String commands should run through the shell like before, lists without one
+        :param tmp_path
+        :param monkeypatch
+        :return:
+        """
+        from base.common import run_cmd
+
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "b.txt").write_text("b")
+        monkeypatch.setenv("RUN_CMD_VALUE", "expanded")
+        cmd = f"cd {tmp_path} && ls *.txt | sort -r && echo $RUN_CMD_VALUE"
+        response = run_cmd(cmd)
+        assert (response.cmd, response.status, response.output.split()) == (cmd, 0, ["b.txt", "a.txt", "expanded"])
+        response = run_cmd([PYTHON, "-c", "import sys; print(sys.argv[1])", "a && b | c"])
+        assert (response.status, response.output) == (0, "a && b | c")
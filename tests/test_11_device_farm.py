@@ -0,0 +1,115 @@
+__author__ = "sarvesh.singh"
+
+import sys
+import stat
+import socket
+import pytest
+from pathlib import Path
+from base.device_farm import DeviceFarm
+from base.web_drivers import WebDriver
+
+ROOT = str(Path(__file__).parent.parent)
+
+FAKE_ADB = """#!{python}
+import os
+import sys
+with open({log!r}, "a") as _fp:
+    _fp.write(" ".join(sys.argv[1:]) + "\\n")
+build = os.environ.get("BUILD", "1")
+if sys.argv[1:] == ["devices"]:
+    print("List of devices attached\\nemulator-5556\\tdevice\\nemulator-5554\\tdevice\\nZX1\\toffline\\n")
+elif sys.argv[-1] == "ro.build.fingerprint":
+    print("google/" + sys.argv[2] + "/" + (build if sys.argv[2] == "emulator-5554" else "1"))
+elif sys.argv[-1] == "ro.build.version.release":
+    print(("11" if build == "1" else "13") if sys.argv[2] == "emulator-5554" else "12")
+else:
+    print("Pixel " + sys.argv[2][-1])
+"""
+
+
+def _free_base_port():
+    """
+    Port free together with port + 2, appium ports of two devices
+    """
+    while True:
+        with socket.socket() as _socket, socket.socket() as _next:
+            _socket.bind(("127.0.0.1", 0))
+            port = _socket.getsockname()[1]
+            try:
+                _next.bind(("127.0.0.1", port + 2))
+            except OSError:
+                continue
+            return port
+
+
+@pytest.fixture
+def fake_adb(tmp_path):
+    """
+    Fixture to write an adb stand-in reporting two ready devices and one offline device
+    :param tmp_path
+    :return: (adb path, invocation log path)
+    """
+    adb, log = tmp_path / "adb", tmp_path / "adb.log"
+    adb.write_text(FAKE_ADB.format(python=sys.executable, log=str(log)))
+    adb.chmod(adb.stat().st_mode | stat.S_IEXEC)
+    return str(adb), log
+
+
+@pytest.mark.DEVICE_FARM
+class TestDeviceFarm:
+    """
+    This suite is created to test the multi-device Android launcher against a fake adb and stub Appium servers
+    """
+
+    def test_01_discover_and_cache(self, fake_adb, tmp_path):
+        """
+        Every ready device should get its own ports, properties should be queried once per device build
+        :param fake_adb
+        :param tmp_path
+        :return:
+        """
+        adb, log = fake_adb
+        cache_file = tmp_path / "devices.json"
+
+        def _queries():
+            return sum("getprop ro.build.fingerprint" not in line and "getprop" in line
+                       for line in log.read_text().splitlines())
+
+        devices = DeviceFarm(adb=adb, cache_file=cache_file).discover()
+        assert [(device.serial, device.platform_version, device.model) for device in devices] == [
+            ("emulator-5554", "11", "Pixel 4"), ("emulator-5556", "12", "Pixel 6")]
+        assert len({port for device in devices for port in device[3:]}) == 6
+        DeviceFarm(adb=adb, cache_file=cache_file).discover()
+        assert _queries() == 4
+        devices = DeviceFarm(adb=adb, cache_file=cache_file, env={"BUILD": "2"}).discover()
+        assert [device.platform_version for device in devices] == ["13", "12"] and _queries() == 6
+        farm = DeviceFarm(adb=adb, cache_file=cache_file)
+        assert farm.get_device("gw1").serial == "emulator-5556" and farm.get_device(None).serial == "emulator-5554"
+        with pytest.raises(Exception, match="no device of its own"):
+            farm.get_device("gw2")
+
+    def test_02_sessions_on_all_devices(self, fake_adb, tmp_path):
+        """
+        Appium servers of all devices should be started concurrently and a session created on each of them
+        :param fake_adb
+        :param tmp_path
+        :return:
+        """
+        farm = DeviceFarm(adb=fake_adb[0], appium=[sys.executable, "-m", "benchmarks.webdriver_stub"],
+                          base_port=_free_base_port(), cache_file=tmp_path / "devices.json", env={"PYTHONPATH": ROOT})
+        base_port = farm.base_port
+
+        def _session(device):
+            driver = WebDriver(browser="android", device=device)
+            driver.driver.get("http://stub.local/")
+            url = driver.driver.current_url
+            driver.quit()
+            return device.appium_port, url
+
+        try:
+            results = farm.run(_session)
+        finally:
+            farm.stop()
+        assert results == {"emulator-5554": (base_port, "http://stub.local/"),
+                           "emulator-5556": (base_port + 2, "http://stub.local/")}
+        assert all(not server.is_running() for server in farm.servers.values())
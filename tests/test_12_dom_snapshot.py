@@ -0,0 +1,65 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from base.locators import Locator
+from base.dom_snapshot import DomSnapshot
+from benchmarks.webdriver_stub import WebDriverStub
+from base.web_drivers import WebDriver
+
+PAGE = """
+<html><head><script>var hidden = 'script text';</script><style>.x {}</style></head>
+<body>
+  <input id="searchBox" name="q" value="apple">
+  <span>Showing 1 - 3 of 3 results</span>
+  <div class="_2cLu-l row" title="Apple iPhone 11">Apple   iPhone
+     11</div>
+  <div class="_2cLu-l row" title="Apple iPhone 12">Apple iPhone 12 <b>new</b></div>
+  <a href="/next">Next Page</a>
+</body></html>
+"""
+
+
+@pytest.mark.SNAPSHOT
+class TestDomSnapshot:
+    """
+    This suite is created to test read-only locator queries answered from a DOM snapshot
+    """
+
+    def test_01_locator_strategies(self):
+        """
+        Every locator type should be answered from the parsed page, absent elements reported right away
+        :return:
+        """
+        snapshot = DomSnapshot(PAGE)
+        assert snapshot.get_texts("//*[@class='_2cLu-l row']") == ["Apple iPhone 11", "Apple iPhone 12 new"]
+        assert snapshot.count(Locator("div._2cLu-l", "css")) == 2 and snapshot.count("row", "class") == 2
+        assert snapshot.get_attribute("value", "searchBox", "id") == "apple"
+        assert snapshot.get_attribute("id", Locator("q", "name")) == "searchBox"
+        assert snapshot.get_text("Next Page", "link") == "Next Page"
+        assert snapshot.is_element_present("Next", "partial_link")
+        assert snapshot.is_element_present("//span[contains(text(), 'Showing ')]")
+        assert not snapshot.is_element_present("//div[@id='missing']") and "script text" not in snapshot.text
+        row = snapshot.find_element("row", "class")
+        assert row.find_element("./following-sibling::div/b").text == "new"
+        with pytest.raises(NoSuchElementException):
+            snapshot.get_text("//table")
+
+    def test_02_snapshot_mode_single_round_trip(self):
+        """
+        Reads in snapshot mode should cost one page source fetch, navigation should drop the snapshot
+        :return:
+        """
+        with WebDriverStub() as stub:
+            stub.state.page_source = PAGE
+            driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+            commands = stub.state.commands
+            with driver.snapshot_mode():
+                for _ in range(50):
+                    assert driver.get_text("//span") == "Showing 1 - 3 of 3 results"
+                    assert not driver.is_element_present("//div[@id='missing']")
+                assert driver.get_texts("row", "class")[1] == "Apple iPhone 12 new"
+            assert stub.state.commands - commands == 1
+            driver.open_website("http://stub.local/")
+            assert driver.dom_snapshot is None and not driver.use_snapshot
+            driver.quit()
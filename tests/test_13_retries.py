@@ -0,0 +1,112 @@
+__author__ = "sarvesh.singh"
+
+import time
+import threading
+import pytest
+from selenium.common.exceptions import (
+    TimeoutException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    NoSuchElementException,
+    WebDriverException,
+)
+from base import retries
+from base.retries import RetryPolicy, RetryConfig, classify
+from base.web_drivers import WebDriver
+from benchmarks.webdriver_stub import WebDriverStub
+
+
+def _flaky(*exceptions, value="done"):
+    """
+    Operation raising given exceptions one per call, then returning value
+    """
+    pending = list(exceptions)
+    calls = []
+
+    def _operation():
+        calls.append(1)
+        if pending:
+            raise pending.pop(0)
+        return value
+
+    return _operation, calls
+
+
+@pytest.mark.RETRIES
+class TestRetries:
+    """
+    This suite is created to test the classified retry policy of web driver actions
+    """
+
+    def test_01_classified_backoff(self):
+        """
+        Transient exceptions should be retried with capped jittered backoff, fatal ones raised right away
+        :return:
+        """
+        assert [classify(exp) for exp in (StaleElementReferenceException(), ElementClickInterceptedException(),
+                                          NoSuchElementException(), WebDriverException())] == [
+            "stale", "intercepted", "not_found", "fatal"]
+        policy = RetryPolicy(RetryConfig(max_attempts=3, base_delay=0.01, max_delay=0.02))
+        assert all(0 <= policy.delay(attempt) <= 0.02 for attempt in range(1, 20))
+        operation, calls = _flaky(StaleElementReferenceException(), ElementClickInterceptedException())
+        assert policy.call(operation, locator="//button") == "done" and len(calls) == 3
+        operation, calls = _flaky(WebDriverException("session deleted"))
+        with pytest.raises(WebDriverException):
+            policy.call(operation, locator="//button")
+        assert len(calls) == 1
+        operation, calls = _flaky(*[StaleElementReferenceException()] * 5)
+        with pytest.raises(StaleElementReferenceException):
+            policy.call(operation, locator="//button")
+        assert len(calls) == 3
+        assert retries.get_test_stats().summary()["//button"]["classes"] == {"stale": 3, "intercepted": 1}
+
+    def test_02_test_budget(self):
+        """
+        Retries should stop once the test's budget is spent and start again with the next test
+        :return:
+        """
+        policy = RetryPolicy(RetryConfig(max_attempts=10, base_delay=0.001, test_budget=3))
+        operation, calls = _flaky(*[StaleElementReferenceException()] * 5)
+        with pytest.raises(StaleElementReferenceException):
+            policy.call(operation)
+        assert len(calls) == 4
+        retries.start_test()
+        operation, calls = _flaky(StaleElementReferenceException())
+        assert policy.call(operation) == "done" and retries.get_test_stats().summary()["None"]["retries"] == 1
+
+    def test_03_actions_use_policy(self):
+        """
+        Stale element during an action should be found again and retried, reported under its locator
+        :return:
+        """
+        with WebDriverStub() as stub:
+            driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, cache_elements=True,
+                               retry_policy=RetryPolicy(RetryConfig(base_delay=0.001)))
+            action, calls = _flaky(StaleElementReferenceException(), value="text")
+            commands = stub.state.commands
+            assert driver.on_element("//span", "xpath", lambda web_element: action()) == "text"
+            assert stub.state.commands - commands == 2 and len(calls) == 2  # a find per attempt
+            assert retries.get_test_stats().summary()["//span"]["classes"] == {"stale": 1}
+            driver.quit()
+
+    def test_04_click_waits_for_element(self):
+        """
+        Click should wait for an absent element within its timeout without implicit wait, and without taking any
+        retry from the test's budget
+        :return:
+        """
+        retries.start_test()
+        with WebDriverStub() as stub:
+            driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+            stub.state.absent.add("//late")
+            timer = threading.Timer(0.2, stub.state.absent.clear)
+            timer.start()
+            driver.click("//late", "xpath", timeout=5)
+            start = time.monotonic()
+            stub.state.absent.add("//missing")
+            with pytest.raises(TimeoutException):
+                driver.click("//missing", "xpath", timeout=0.3)
+            assert time.monotonic() - start < 1
+            assert retries.get_test_stats().summary() == {} and retries._budget["retries"] == 0
+            stub.state.absent.clear()
+            driver.quit()
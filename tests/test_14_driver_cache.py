@@ -0,0 +1,129 @@
+__author__ = "sarvesh.singh"
+
+import time
+import zipfile
+import threading
+import pytest
+from base.driver_cache import DriverResolver
+
+
+def _zip(path, name, content):
+    """
+    Write a driver archive having one binary
+    """
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        zip_ref.writestr(name, content)
+
+
+class FakeUpstream:
+    """
+    Stand in for upstream version check and download, counting calls
+    """
+
+    def __init__(self, version="2.0", fail_download=False):
+        self.version = version
+        self.fail_download = fail_download
+        self.checks = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def patch(self, resolver):
+        resolver._latest_version = self._latest_version
+        resolver._download = lambda source, entry, version: self._download(resolver, source, entry, version)
+        return resolver
+
+    def _latest_version(self, browser):
+        with self._lock:
+            self.checks += 1
+        if self.version is None:
+            raise Exception("network unreachable")
+        return self.version
+
+    def _download(self, resolver, source, entry, version):
+        if self.fail_download:
+            raise Exception("download failed")
+        with self._lock:
+            self.downloads += 1
+        time.sleep(0.05)
+        return resolver._add_to_store(entry, source["name"], version, f"binary {version}".encode())
+
+
+@pytest.mark.DRIVER_CACHE
+class TestDriverCache:
+    """
+    This suite is created to test resolution of driver binaries from the local cache
+    """
+
+    def test_01_manifest_ttl(self, tmp_path):
+        """
+        Upstream should be checked once per TTL, a new version downloaded once it is released
+        :param tmp_path
+        :return:
+        """
+        upstream = FakeUpstream()
+        resolver = upstream.patch(DriverResolver("linux", cache_dir=tmp_path, ttl=60, offline=False))
+        binary = resolver.resolve("chrome")
+        assert resolver.resolve("chrome") == binary and (upstream.checks, upstream.downloads) == (1, 1)
+        with open(binary, "rb") as _fp:
+            assert _fp.read() == b"binary 2.0"
+
+        resolver.ttl = 0
+        upstream.version = "3.0"
+        assert resolver.resolve("chrome") != binary and (upstream.checks, upstream.downloads) == (2, 2)
+        assert sorted(resolver.read_manifest()["chromedriver-linux"]["versions"]) == ["2.0", "3.0"]
+
+    def test_02_offline_and_failed_download(self, tmp_path):
+        """
+        Offline or when download fails, newest cached binary should be used without touching upstream again
+        :param tmp_path
+        :return:
+        """
+        upstream = FakeUpstream()
+        resolver = upstream.patch(DriverResolver("linux", cache_dir=tmp_path, ttl=0, offline=False))
+        binary = resolver.resolve("chrome")
+
+        upstream.version, upstream.fail_download = "3.0", True
+        assert resolver.resolve("chrome") == binary and upstream.checks == 2
+
+        offline = upstream.patch(DriverResolver("linux", cache_dir=tmp_path, ttl=0, offline=True))
+        assert offline.resolve("chrome") == binary and upstream.checks == 2
+        with pytest.raises(Exception, match="No cached or mirrored geckodriver"):
+            offline.resolve("firefox")
+
+    def test_03_mirror_of_platform(self, tmp_path):
+        """
+        Mirror holding archives of several platforms should resolve the one of this platform, newest version first
+        :param tmp_path
+        :return:
+        """
+        mirror = tmp_path / "mirror"
+        for version in ("1.0", "1.1"):
+            (mirror / version).mkdir(parents=True)
+            for platform in ("linux64", "mac64"):
+                _zip(mirror / version / f"chromedriver_{platform}.zip", "chromedriver", f"{platform} {version}")
+        for os_name, expected in (("darwin", b"mac64 1.1"), ("Linux", b"linux64 1.1")):
+            resolver = DriverResolver(os_name, cache_dir=tmp_path / os_name, offline=True, mirror=str(mirror))
+            with open(resolver.resolve("chrome"), "rb") as _fp:
+                assert _fp.read() == expected
+            assert list(resolver.read_manifest()["chromedriver-" + resolver.platform]["versions"]) == ["1.1"]
+
+    def test_04_lock_serialises_workers(self, tmp_path):
+        """
+        Workers resolving at the same time should download the driver only once
+        :param tmp_path
+        :return:
+        """
+        upstream = FakeUpstream()
+        binaries = []
+
+        def _resolve():
+            resolver = upstream.patch(DriverResolver("linux", cache_dir=tmp_path, ttl=60, offline=False))
+            binaries.append(resolver.resolve("chrome"))
+
+        threads = [threading.Thread(target=_resolve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(binaries)) == 1 and len(binaries) == 4
+        assert (upstream.checks, upstream.downloads) == (1, 1)
@@ -0,0 +1,55 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from base.web_drivers import WebDriver
+from pages.search_results import SearchResults
+
+
+@pytest.mark.BULK_EXTRACT
+class TestBulkExtract:
+    """
+    This suite is created to test reading listing pages with a single extraction script
+    """
+
+    def test_01_search_results_single_round_trip(self, stub):
+        """
+        Listing page should be read in one script call after waiting for the page
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        commands = stub.state.commands
+        results = SearchResults(driver).get_search_results()
+        assert results == [{"name": f"name {row}", "price": f"price {row}"} for row in range(3)]
+        # visibility wait (implicit wait off, find, displayed, implicit wait back on) and the script
+        assert stub.state.commands - commands == 5
+        driver.quit()
+
+    def test_02_script_locators(self):
+        """
+        Locator types should be converted to xpath or css understood by the in-page script
+        :return:
+        """
+        assert WebDriver.get_script_locator("//li", "xpath") == ["xpath", "//li"]
+        assert WebDriver.get_script_locator("main", "id") == ["css", '[id="main"]']
+        assert WebDriver.get_script_locator("q", "name") == ["css", '[name="q"]']
+        assert WebDriver.get_script_locator("row", "class") == ["css", ".row"]
+        with pytest.raises(Exception, match="not supported in scripts"):
+            WebDriver.get_script_locator("Next", "link")
+
+    def test_03_records_have_every_field(self, stub):
+        """
+        Every row should give one record with all field names, fields may have own attribute and locator type
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        fields = {"name": "./a", "link": ("./a", "href"), "price": ("price", "text", "class")}
+        assert driver.get_script_fields("//li", "xpath", fields) == [
+            ["name", ["xpath", "./a"], "text"], ["link", ["xpath", "./a"], "href"],
+            ["price", ["css", ".price"], "text"]]
+        commands = stub.state.commands
+        records = driver.extract_records("//li", "xpath", fields=fields)
+        assert records == [{name: f"{name} {row}" for name in fields} for row in range(3)]
+        assert stub.state.commands - commands == 1
+        driver.quit()
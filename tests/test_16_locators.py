@@ -0,0 +1,72 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from selenium.webdriver.common.by import By
+from base.locators import (
+    Locator,
+    Locators,
+    LOCATOR_TYPES,
+    SCRIPT_LOCATOR_TYPES,
+    get_by_strategy,
+    get_script_locator,
+    to_by,
+)
+from base.web_drivers import WebDriver
+
+
+@pytest.mark.LOCATORS
+class TestLocators:
+    """
+    This suite is created to test precompiled locators
+    """
+
+    def test_01_resolved_once_and_immutable(self):
+        """
+        Locator should carry selenium's (By, value) tuple, compare by it and refuse changes
+        :return:
+        """
+        locator = Locator("main", "id")
+        assert locator.by == (By.ID, "main") and tuple(locator) == (By.ID, "main") and str(locator) == "main"
+        assert locator == Locator("main", "id") and locator != Locator("main", "name")
+        assert len({locator, Locator("main", "id")}) == 1
+        with pytest.raises(AttributeError):
+            locator.value = "other"
+        with pytest.raises(Exception, match="not supported"):
+            Locator("//a", "xpath2")
+        assert get_by_strategy("css") == By.CSS_SELECTOR
+
+    def test_02_templates_and_registry(self):
+        """
+        Templated locators should be filled keeping their strategy, registry should default plain strings
+        :return:
+        """
+        template = Locator("//li[%s]/a", "xpath")
+        assert template.format(2) == Locator("//li[2]/a") and template % "last()" == Locator("//li[last()]/a")
+        locators = Locators(strategy="css", row=".row", link=Locator("//a"))
+        assert dict(locators) == {"row": Locator(".row", "css"), "link": Locator("//a", "xpath")}
+        assert to_by(locators.row) == (By.CSS_SELECTOR, ".row") and to_by("q", "name") == (By.NAME, "q")
+
+    def test_03_script_locators_from_table(self):
+        """
+        Script locators should be looked up in their table, for Locators and plain values alike
+        :return:
+        """
+        assert set(SCRIPT_LOCATOR_TYPES) <= set(LOCATOR_TYPES)
+        assert get_script_locator(Locator("row", "class")) == ["css", ".row"]
+        assert get_script_locator("a{1}", "css") == ["css", "a{1}"]
+        with pytest.raises(Exception, match="not supported in scripts"):
+            get_script_locator("Next", "partial_link")
+
+    def test_04_fields_inherit_strategy_of_row_locator(self, stub):
+        """
+        Plain string fields of a Locator row should use the row's strategy, not the unset locator type
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        fields = {"name": ".name", "price": Locator("./span")}
+        assert driver.get_script_fields(Locator(".row", "css"), None, fields) == [
+            ["name", ["css", ".name"], "text"], ["price", ["xpath", "./span"], "text"]]
+        assert driver.extract_records(Locator(".row", "css"), fields=fields) == [
+            {"name": f"name {row}", "price": f"price {row}"} for row in range(3)]
+        driver.quit()
@@ -0,0 +1,77 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from base import retries
+from base.element_cache import ElementCache
+from base.web_drivers import WebDriver
+
+
+@pytest.mark.ELEMENT_CACHE
+class TestElementCache:
+    """
+    This suite is created to test the element handle cache and its invalidation
+    """
+
+    def test_01_cache_and_invalidate(self):
+        """
+        Handles should be kept per locator till they are invalidated one by one or all together
+        :return:
+        """
+        cache = ElementCache()
+        by = ("xpath", "//span")
+        assert cache.get(by) is None and by not in cache
+        cache.put(by, "element")
+        assert cache.get(by) == "element" and (cache.hits, cache.misses) == (1, 1)
+        cache.invalidate(by)
+        assert len(cache) == 0
+        cache.put(by, "element")
+        cache.put(("css", "a"), "link")
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_02_cached_elements_skip_find(self, stub):
+        """
+        With element cache, repeated actions on same locator should find the element only once
+        :param stub
+        :return:
+        """
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, cache_elements=True)
+        driver.open_website("http://stub.local/")
+        driver.get_text("//span", "xpath")
+        commands = stub.state.commands
+        for _ in range(3):
+            driver.get_text("//span", "xpath")
+        assert stub.state.commands - commands == 3
+        driver.quit()
+
+    def test_03_clicks_and_navigation(self, stub):
+        """
+        Clicks should use cached handles without any extra command, navigation should drop them and a handle made
+        stale by a page change should be found again at once
+        :param stub
+        :return:
+        """
+        retries.start_test()
+        driver = WebDriver(browser="chrome", remote=stub.host, port=stub.port, cache_elements=True)
+        uncached = WebDriver(browser="chrome", remote=stub.host, port=stub.port)
+        driver.open_website("http://stub.local/")
+        driver.click("//span", "xpath")
+        commands = stub.state.commands
+        for _ in range(3):
+            driver.click("//span", "xpath")
+        cached_commands, commands = stub.state.commands - commands, stub.state.commands
+        for _ in range(3):
+            uncached.click("//span", "xpath")
+        # uncached click waits for the element (implicit wait off, find, implicit wait back on) and clicks
+        assert cached_commands == 3 and stub.state.commands - commands == 12
+        driver.open_website("http://stub.local/next")
+        assert len(driver.element_cache) == 0
+        driver.get_text("//span", "xpath")
+        stub.state.stale.update(stub.state.elements)
+        commands = stub.state.commands
+        assert driver.get_text("//span", "xpath") == "text of //span"
+        assert stub.state.commands - commands == 3 and "//span" not in retries.get_test_stats().summary()
+        assert (driver.element_cache.hits, driver.element_cache.misses) == (4, 2)
+        stub.state.stale.clear()
+        uncached.quit()
+        driver.quit()
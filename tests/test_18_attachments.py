@@ -0,0 +1,86 @@
+__author__ = "sarvesh.singh"
+
+import os
+import sys
+import subprocess
+import pytest
+from pathlib import Path
+from json import load as json_load
+
+ROOT = str(Path(__file__).parent.parent)
+
+SUITE = """
+import pytest
+from base.attachments import get_attachment_pipeline
+from benchmarks.webdriver_stub import TINY_PNG
+
+pipeline = get_attachment_pipeline()
+
+
+@pytest.fixture(autouse=True)
+def as_png(attachment_pipeline):
+    attachment_pipeline.configure(image_format="png", max_width=0)
+
+
+@pytest.fixture
+def page():
+    pipeline.attach_screenshot(TINY_PNG, name="setup")
+    yield
+    pipeline.attach_screenshot(TINY_PNG, name="teardown")
+
+
+def _screenshots(name):
+    for number in range(2):
+        pipeline.attach_screenshot(TINY_PNG, name=f"{name}_{number}")
+    pipeline.flush()
+
+
+def test_a():
+    _screenshots("a")
+
+
+def test_b():
+    _screenshots("b")
+
+
+def test_c():
+    _screenshots("c")
+
+
+def test_d(page):
+    pass
+
+
+def test_e():
+    pass
+"""
+
+
+@pytest.mark.ATTACHMENTS
+class TestAttachments:
+    """
+    This suite is created to test the background screenshot pipeline
+    """
+
+    def test_01_attachments_stay_on_their_test(self, tmp_path):
+        """
+        Screenshots encoded in background should be attached to the test which took them in allure results, also
+        when taken by its fixtures (flushed by the hooks of conftest.py, loaded as a plugin)
+        :param tmp_path
+        :return:
+        """
+        (tmp_path / "test_suite.py").write_text(SUITE)
+        results = tmp_path / "allure-results"
+        process = subprocess.run(
+            [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "-p", "conftest",
+             f"--alluredir={results}", "test_suite.py"], cwd=tmp_path, env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True)
+        assert process.returncode == 0, process.stdout.decode()
+        attachments = {}
+        for result in results.glob("*-result.json"):
+            with open(result, "r") as _fp:
+                data = json_load(_fp)
+            attachments[data["name"]] = sorted(
+                item["name"] for item in data.get("attachments", []) if item["name"].endswith(".png"))
+        assert attachments == {**{name: [f"{name[-1]}_0.png", f"{name[-1]}_1.png"]
+                                  for name in ("test_a", "test_b", "test_c")},
+                               "test_d": ["setup.png", "teardown.png"], "test_e": []}
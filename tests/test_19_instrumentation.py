@@ -0,0 +1,103 @@
+__author__ = "sarvesh.singh"
+
+import threading
+import pytest
+from base import instrumentation
+from base.instrumentation import CommandMetrics, percentile, instrument_class, instrument_driver
+
+
+@instrument_class
+class FakeDriver:
+    """
+    Class with an outer method calling an inner one, both instrumented
+    """
+
+    def outer(self, element):
+        return self.inner(element)
+
+    def inner(self, element):
+        return element
+
+    def execute(self, driver_command, params=None):
+        return driver_command
+
+
+@pytest.mark.INSTRUMENTATION
+class TestInstrumentation:
+    """
+    This suite is created to test the web driver latency metrics
+    """
+
+    def test_01_nearest_rank_percentile(self):
+        """
+        Percentile should be the smallest sample having at least pct percent of samples at or below it
+        :return:
+        """
+        assert percentile([1, 2], 50) == 1
+        assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 75) == 3
+        assert percentile(list(range(1, 101)), 7) == 7 and percentile(list(range(1, 101)), 95) == 95
+        assert percentile(list(range(1, 21)), 99) == 20 and percentile([5], 0) == 5 and percentile([], 50) == 0.0
+
+    def test_02_merge_worker_samples(self):
+        """
+        Samples exported by workers should be merged so percentiles cover all of them
+        :return:
+        """
+        workers = [CommandMetrics(), CommandMetrics()]
+        for number in range(1, 101):
+            workers[number % 2].record("command", "click", number / 1000)
+        controller = CommandMetrics()
+        for worker in workers:
+            controller.merge(worker.export())
+        assert controller.summary() == {"command": {"click": {
+            "count": 100, "total_ms": 5050.0, "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0}}}
+
+    def test_03_outermost_call_and_commands(self):
+        """
+        Nested instrumented calls should be accounted to the outermost one, commands recorded per name
+        :return:
+        """
+        instrumentation.start_test()
+        driver = instrument_driver(FakeDriver())
+        assert driver.outer("//a") == "//a" and driver.execute("findElement") == "findElement"
+        summary = instrumentation.get_test_metrics().summary()
+        assert set(summary["method"]) == {"outer", "execute"} and set(summary["locator"]) == {"//a"}
+        assert summary["command"]["findElement"]["count"] == 1
+
+    def test_04_bounded_samples(self):
+        """
+        Kept samples should stop growing at max_samples while count and total stay exact, also when merged
+        :return:
+        """
+        metrics = CommandMetrics(max_samples=100)
+        for number in range(1, 10001):
+            metrics.record("command", "click", number / 1000)
+        (kind, name, count, total, samples), = metrics.export()
+        assert (count, round(total, 3), len(samples)) == (10000, 50005.0, 100)
+        metrics.merge(CommandMetrics(max_samples=100).export() + [["command", "click", 10000, 1.0, [0.0001] * 100]])
+        stats = metrics.summary()["command"]["click"]
+        assert (stats["count"], stats["total_ms"], len(metrics.export()[0][4])) == (20000, 50006000.0, 100)
+        assert sum(sample == 0.0001 for sample in metrics.export()[0][4]) == 50
+
+    def test_05_test_metrics_per_thread(self):
+        """
+        Threads collecting their own per test breakdown should not see each other's samples
+        :return:
+        """
+        barrier = threading.Barrier(2)
+        summaries = {}
+
+        def _test(name):
+            instrumentation.start_test()
+            barrier.wait()
+            instrumentation.record("command", name, 0.001)
+            barrier.wait()
+            summaries[name] = instrumentation.get_test_metrics().summary()
+
+        threads = [threading.Thread(target=_test, args=(name,)) for name in ("first", "second")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert {name: set(summary["command"]) for name, summary in summaries.items()} == {
+            "first": {"first"}, "second": {"second"}}
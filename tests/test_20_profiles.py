@@ -0,0 +1,46 @@
+__author__ = "sarvesh.singh"
+
+import pytest
+from base import profiles
+from base.common import dict_to_ns
+from base.profiles import get_profile, HEAVY_RESOURCES
+
+
+@pytest.mark.PROFILES
+class TestProfiles:
+    """
+    This suite is created to test session profiles defined in config.json
+    """
+
+    def test_01_extends_chain(self, monkeypatch):
+        """
+        Profile should take settings left out from the profile it extends, through config.json profiles too
+        :param monkeypatch
+        :return:
+        """
+        monkeypatch.setattr(profiles, "get_resource_config", lambda: dict_to_ns({"profiles": {
+            "ci": {"extends": "cached", "headless": True},
+            "cached": {"extends": "fast", "disk_cache_dir": "cache"},
+        }}))
+        profile = get_profile("ci")
+        assert (profile.name, profile.headless, profile.disk_cache_dir, profile.page_load_strategy) == (
+            "ci", True, "cache", "eager")
+        assert profile.block_urls == tuple(HEAVY_RESOURCES)
+
+    def test_02_cyclic_extends(self, monkeypatch):
+        """
+        Profiles extending each other in a cycle should raise instead of recursing forever
+        :param monkeypatch
+        :return:
+        """
+        monkeypatch.setattr(profiles, "get_resource_config", lambda: dict_to_ns({"profiles": {
+            "a": {"extends": "b"},
+            "b": {"extends": "a"},
+            "self": {"extends": "self"},
+        }}))
+        with pytest.raises(Exception, match="cycle: a -> b -> a"):
+            get_profile("a")
+        with pytest.raises(Exception, match="cycle: self -> self"):
+            get_profile("self")
+        with pytest.raises(Exception, match="cycle: custom -> a -> b -> a"):
+            get_profile({"extends": "a"})